@@ -1,13 +1,17 @@
 import streamlit as st
 import requests
+import json
 import time
 
 from pathlib import Path
 
+from storage import list_files
+
 st.title("Document Management Dashboard")
 
 st.set_page_config(layout="wide", page_icon=":material/document_search:", page_title="Document processing",)
 
+
 # --- Expander 1: Upload to Supabase ---
 with st.expander("Upload New PDF Document"):
     with st.form("upload_form", clear_on_submit=True):
@@ -34,6 +38,7 @@ with st.expander("Upload New PDF Document"):
                             "http://python-api:8000/supabase/storage/upload-file/pdf-files", params={"path": full_path}, files=files)
 
                         if res.status_code == 200:
+                            list_files.clear()
                             st.success(
                                 f"Successfully uploaded to: {full_path}")
                         else:
@@ -49,11 +54,8 @@ with st.expander("Convert PDF to markdown"):
         "Filter by Category", ["tender", "exam", "answer_sheet"])
 
     try:
-        response = requests.get(
-            "http://python-api:8000/supabase/storage/pdf-files", params={"path": f"{selected_category}s"})
-        files_list = response.json()
         file_names = [f['name']
-                      for f in files_list if f['name'] != '.emptyFolderPlaceholder']
+                      for f in list_files("pdf-files", f"{selected_category}s")]
     except:
         file_names = []
 
@@ -65,14 +67,13 @@ with st.expander("Convert PDF to markdown"):
     if target_file:
         target_file_path = Path(target_file)
 
-        md_file_res = requests.get(
-            "http://python-api:8000/supabase/storage/processed-files", params={"path": f'{selected_category}_{target_file_path.stem}/'})
-
-        if md_file_res.status_code == 200:
-            files_list = md_file_res.json()
-            options = [f
-                       for f in files_list if f['name'] != '.emptyFolderPlaceholder']
+        try:
+            options = list_files(
+                "processed-files", f'{selected_category}_{target_file_path.stem}/')
+        except Exception:
+            options = None
 
+        if options is not None:
             md_path = options[0].get("name") if len(options) > 0 else None
 
             if md_path is not None:
@@ -114,18 +115,56 @@ with st.expander("Convert PDF to markdown"):
 
     interval_is_valid = end_page is None if start_page is None else end_page is not None
 
+    profile = st.selectbox(
+        "Pipeline profile", ["auto", "text", "tables", "digital", "full"],
+        help="`auto` skips OCR on pages that already have a text layer")
+
     submit_convert_file = st.button(
         "Convert file to markdown", type="primary", width="stretch", disabled=(target_file is None or not interval_is_valid or md_path is not None))
 
     if submit_convert_file:
         if interval_is_valid:
-            with st.spinner(text="Convertendo arquivo para markdown", show_time=False, width="content"):
-                convert_file_res = requests.post(
-                    "http://python-api:8000/document-processing/process-pdf", params={"file_path": f"{selected_category}s/{target_file}", "start_page": start_page, "end_page": end_page})
-
-            json_res = convert_file_res.json()
+            progress = st.progress(0.0, text="Convertendo arquivo para markdown")
+            stage_timings = {}
+            json_res = {}
+            event_type = None
+
+            with requests.post(
+                "http://python-api:8000/document-processing/process-pdf/stream",
+                params={"file_path": f"{selected_category}s/{target_file}", "start_page": start_page, "end_page": end_page, "profile": profile},
+                stream=True
+            ) as convert_file_res:
+                for line in convert_file_res.iter_lines(decode_unicode=True):
+                    if line.startswith("event: "):
+                        event_type = line[len("event: "):]
+                        continue
+
+                    if not line.startswith("data: "):
+                        continue
+
+                    data = json.loads(line[len("data: "):])
+
+                    if event_type == "progress":
+                        if data["status"] == "progress" and data.get("total"):
+                            progress.progress(
+                                min(data["current"] / data["total"], 1.0),
+                                text=f"{data['stage']}: {data['current']}/{data['total']} ({data['elapsed']:.0f}s)")
+                        elif data["status"] == "started":
+                            progress.progress(0.0, text=f"{data['stage']}... ({data['elapsed']:.0f}s)")
+                        elif data["status"] == "finished":
+                            stage_timings[data["stage"]] = stage_timings.get(data["stage"], 0) + data["duration"]
+                    elif event_type == "result":
+                        json_res = data
+                    elif event_type == "error":
+                        json_res = {"status": "error", "message": data["message"]}
+
+            progress.empty()
+
+            if stage_timings:
+                st.bar_chart(stage_timings, horizontal=True, x_label="seconds")
 
             if json_res.get("status") == "success":
+                list_files.clear()
                 st.success("Arquivo convertido com sucesso!")
 
             st.json(json_res)
@@ -134,6 +173,47 @@ with st.expander("Convert PDF to markdown"):
         else:
             st.error("Page interval is not valid")
 
+with st.expander("Batch convert a folder"):
+    batch_category = st.selectbox(
+        "Folder", ["tender", "exam", "answer_sheet"], key="batch_category")
+    batch_profile = st.selectbox(
+        "Pipeline profile", ["auto", "text", "tables", "digital", "full"], key="batch_profile")
+    batch_force = st.checkbox(
+        "Convert again documents that were already converted", key="batch_force")
+
+    if st.button("Convert every PDF of the folder", type="primary", width="stretch"):
+        progress = st.progress(0.0, text="Scheduling documents...")
+        events = st.container(height=300, border=True)
+        finished = 0
+        total = 0
+
+        with requests.post(
+            "http://python-api:8000/document-processing/process-batch",
+            json={"prefix": f"{batch_category}s", "profile": batch_profile, "force": batch_force},
+            stream=True
+        ) as batch_res:
+            for line in batch_res.iter_lines():
+                if not line:
+                    continue
+
+                event = json.loads(line)
+
+                if event["event"] == "scheduled":
+                    total = event["documents"]
+                elif event["event"] == "done":
+                    finished += 1
+                    list_files.clear()
+                    events.success(
+                        f"{event['file_path']} → {event['result'].get('markdown_path')}")
+                elif event["event"] == "failed":
+                    finished += 1
+                    events.error(f"{event['file_path']}: {event['error']}")
+                elif event["event"] == "summary":
+                    st.info(f"{event['done']} converted, {event['failed']} failed")
+
+                if total:
+                    progress.progress(finished / total, text=f"{finished}/{total} documents")
+
 with st.expander("Preview converted markdown file"):
     rendered_tab, raw_tab = st.tabs(["Rendered", "Raw"])
 
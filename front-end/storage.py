@@ -0,0 +1,14 @@
+import streamlit as st
+import requests
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def list_files(bucket, path):
+    """Lists a storage folder, reusing the listing on the reruns of the next seconds.
+
+    Shared by the pages, call `list_files.clear()` after changing a bucket.
+    """
+    response = requests.get(
+        f"http://python-api:8000/supabase/storage/{bucket}", params={"path": path})
+    response.raise_for_status()
+    return [f for f in response.json() if f['name'] != '.emptyFolderPlaceholder']
@@ -9,15 +9,35 @@ st.set_page_config(layout="wide", page_title="Extraction results",
 API_BASE_URL = "http://python-api:8000/supabase"
 
 
-def fetch_data(endpoint, params=None):
-    """Generic helper to fetch data from your local API."""
+def fetch_offer_tree(offer_id, refresh=False):
+    """Fetches the offer with its exams, job roles and offices in one request.
+
+    The previous response is kept in the session and revalidated with its
+    ETag, so unchanged results are not downloaded again on every rerun.
+    """
+    cached = st.session_state.get("offer_tree")
+    if cached and cached["offer_id"] != offer_id:
+        cached = None
+
+    headers = {"If-None-Match": cached["etag"]} if cached and not refresh else {}
+
     try:
-        response = requests.get(f"{API_BASE_URL}/{endpoint}", params=params)
+        response = requests.get(
+            f"{API_BASE_URL}/recruitment-offers/{offer_id}/tree",
+            params={"refresh": "true"} if refresh else None, headers=headers)
+
+        if response.status_code == 304:
+            return cached["data"]
+
         response.raise_for_status()
-        return response.json()
     except Exception as e:
-        st.error(f"Error fetching {endpoint}: {e}")
-        return []
+        st.error(f"Error fetching recruitment offer {offer_id}: {e}")
+        return {}
+
+    st.session_state.offer_tree = {"offer_id": offer_id,
+                                   "etag": response.headers.get("ETag"),
+                                   "data": response.json()}
+    return st.session_state.offer_tree["data"]
 
 
 # --- 1. URL & SESSION STATE ---
@@ -36,7 +56,9 @@ if "selected_topic_id" not in st.session_state:
     st.session_state.selected_topic_id = None
 
 # --- ROW 1: HEADER METRICS ---
-offer_data = fetch_data(f"recruitment-offers/{offer_id}")
+# The refresh buttons read the results from the database again
+offer_data = fetch_offer_tree(
+    offer_id, refresh=st.session_state.pop("refresh_results", False))
 
 if offer_data:
     st.title(f"{offer_data.get('name', 'Process')}")
@@ -57,12 +79,15 @@ with col_exam_header:
     st.subheader("Exams")
 with col_exam_refresh:
     if st.button(":material/refresh:", key="refresh_exams"):
+        st.session_state.refresh_results = True
         st.rerun()
 
-exams_list = fetch_data("exams", params={"offer_id": offer_id})
+exams_list = offer_data.get("exams", []) if offer_data else []
+exams_by_id = {exam["id"]: exam for exam in exams_list}
 if exams_list:
     df_exams = pd.DataFrame(exams_list)
-    df_exams.drop('recruitment_offer_id', axis=1, inplace=True)
+    df_exams.drop(['recruitment_offer_id', 'job_roles', 'offices', 'topics'],
+                  axis=1, inplace=True, errors='ignore')
 
     event_exam = st.dataframe(
         df_exams,
@@ -95,17 +120,19 @@ if exams_list:
 else:
     st.info("No exams found.")
 
-if st.session_state.selected_exam_id:
+selected_exam = exams_by_id.get(st.session_state.selected_exam_id)
+
+if selected_exam:
     # --- ROW 4: JOB ROLES ---
     st.divider()
 
     c1, c2 = st.columns([0.9, 0.1])
     c1.subheader("Job Roles")
     if c2.button(":material/refresh:", key="ref_roles"):
+        st.session_state.refresh_results = True
         st.rerun()
 
-    roles = fetch_data(
-        "job-roles", params={"exam_id": st.session_state.selected_exam_id})
+    roles = selected_exam.get("job_roles", [])
     st.dataframe(roles, use_container_width=True, hide_index=True, column_config={
         "id": st.column_config.TextColumn(
             "ID",
@@ -126,10 +153,10 @@ if st.session_state.selected_exam_id:
     c1, c2 = st.columns([0.9, 0.1])
     c1.subheader("Offices")
     if c2.button(":material/refresh:", key="ref_off"):
+        st.session_state.refresh_results = True
         st.rerun()
 
-    offices = fetch_data("offices", params={
-                         "exam_id": st.session_state.selected_exam_id})
+    offices = selected_exam.get("offices", [])
     st.dataframe(offices, use_container_width=True, hide_index=True, column_config={
         "id": st.column_config.TextColumn(
             "ID",
@@ -3,21 +3,20 @@ from pathlib import Path
 import streamlit as st
 import requests
 
+from storage import list_files
+
 # def workflow_trigger():
 st.set_page_config(page_title="Pipeline Trigger",
                    page_icon=":material/home:", layout="wide")
 
+
 st.title("n8n Workflow Trigger")
 
 if "pdf_url" not in st.session_state:
     st.session_state.pdf_url = None
 
 with st.expander("Select file"):
-    response = requests.get(
-        "http://python-api:8000/supabase/storage/pdf-files", params={"path": "tenders"})
-    files_list = response.json()
-    options = [f['name']
-               for f in files_list if f['name'] != '.emptyFolderPlaceholder']
+    options = [f['name'] for f in list_files("pdf-files", "tenders")]
 
     pdf_name = st.selectbox(
         "Select the .pdf file to work with",
@@ -32,10 +31,12 @@ with st.expander("Select file"):
         prefix = pdf_path.parent.name[:-1]
         md_path = f'{prefix}_{pdf_path.stem}/{prefix}_{pdf_path.stem}.md'
 
-        md_file_res = requests.get(
-            "http://python-api:8000/supabase/storage/processed-files", params={"path": f'{prefix}_{pdf_path.stem}/'})
+        try:
+            md_files = list_files("processed-files", f'{prefix}_{pdf_path.stem}/')
+        except Exception:
+            md_files = []
 
-        if md_file_res.status_code == 200 and len(md_file_res.json()) > 0:
+        if len(md_files) > 0:
             st.success(f'`{md_path}` OK')
         else:
             st.warning(f'`{md_path}` not found')
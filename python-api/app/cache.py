@@ -0,0 +1,97 @@
+import json
+import time
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+from app.metrics import record_cache_lookups
+
+
+class TTLCache:
+    """Thread-safe in-process cache whose entries expire `ttl` seconds after being set.
+
+    Holds at most `max_entries` entries, the least recently used one is evicted
+    first. Each entry keeps the ETag of its value (see `etag`), so a response
+    can be revalidated without being serialized again. Lookups are counted in
+    the cache metrics under `name`.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 256):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()  # key -> (expires_at, value, etag)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the (value, etag) of `key`, or None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        record_cache_lookups(self.name, hits=int(entry is not None), misses=int(entry is None))
+
+        return entry[1:] if entry is not None else None
+
+    def set(self, key, value) -> str:
+        """Stores `value` (JSON serializable) and returns its ETag."""
+        value_etag = etag(value)
+
+        if self.ttl <= 0:
+            return value_etag
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value, value_etag)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return value_etag
+
+    def get_or_set(self, key, load, refresh: bool = False) -> tuple:
+        """Returns the cached (value, etag) of `key`, calling `load()` on a miss
+        (or when `refresh` is set)."""
+        cached = None if refresh else self.get(key)
+
+        if cached is not None:
+            return cached
+
+        value = load()
+
+        return value, self.set(key, value)
+
+    def invalidate(self, key=None, prefix: tuple = None):
+        """Drops `key`, every tuple key starting with `prefix`, or everything."""
+        with self._lock:
+            if key is not None:
+                self._entries.pop(key, None)
+            elif prefix is not None:
+                for cached_key in [k for k in self._entries if isinstance(k, tuple) and k[:len(prefix)] == prefix]:
+                    del self._entries[cached_key]
+            else:
+                self._entries.clear()
+
+
+def etag(value) -> str:
+    """Strong ETag of a JSON serializable value."""
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+    return f'"{hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str, value_etag: str) -> bool:
+    """Whether an `If-None-Match` request header matches `value_etag`."""
+    if not if_none_match:
+        return False
+
+    return if_none_match.strip() == '*' or value_etag in [
+        tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
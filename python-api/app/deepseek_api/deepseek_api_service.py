@@ -3,15 +3,21 @@ import logging
 import json
 
 from openai import OpenAI
+from openai.types.chat import ChatCompletion
 from fastapi import HTTPException
 
+from app.metrics import llm_call
+from app.llm_cassette import get_cassette
+
 
 class DeepSeekApiService:
     def __init__(self):
         self.client = OpenAI(
-            api_key=os.getenv("DEEPSEEK_API_KEY"), base_url="https://api.deepseek.com"
+            api_key=os.getenv("DEEPSEEK_API_KEY"),
+            base_url=os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
         )
 
+        self.cassette = get_cassette("deepseek")
         self.logger = logging.getLogger(__name__)
 
     def chat_completion(
@@ -21,14 +27,24 @@ class DeepSeekApiService:
         model: str = "deepseek-chat",
         response_format: str = "json_object",
     ):
-        response = self.client.chat.completions.create(
-            model=model,
-            messages=[
+        request = {
+            "model": model,
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
-            response_format={"type": response_format},
-        )
+            "response_format": {"type": response_format},
+        }
+
+        def send():
+            with llm_call("deepseek", model) as call:
+                response = self.client.chat.completions.create(**request)
+                call.set_usage(response.usage.prompt_tokens,
+                               response.usage.completion_tokens)
+
+            return response
+
+        response = self.cassette.call(request, send, ChatCompletion)
 
         self.logger.info(
             f"{response.usage.completion_tokens=} {response.usage.total_tokens=}"
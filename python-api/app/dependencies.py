@@ -14,6 +14,75 @@ class Settings(BaseSettings):
     SUPABASE_URL: str = os.getenv("SUPABASE_URL")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY")
 
+    # Image post-processing (caption input sent to the vision model)
+    IMAGE_CAPTION_MAX_EDGE: int = int(os.getenv("IMAGE_CAPTION_MAX_EDGE", 1024))
+    IMAGE_CAPTION_FORMAT: str = os.getenv("IMAGE_CAPTION_FORMAT", "WEBP")
+    IMAGE_CAPTION_QUALITY: int = int(os.getenv("IMAGE_CAPTION_QUALITY", 80))
+
+    # Image post-processing (artifact stored in the output bucket)
+    IMAGE_ARTIFACT_MAX_EDGE: int = int(os.getenv("IMAGE_ARTIFACT_MAX_EDGE", 1600))
+    IMAGE_ARTIFACT_FORMAT: str = os.getenv("IMAGE_ARTIFACT_FORMAT", "PNG")
+    IMAGE_ARTIFACT_QUALITY: int = int(os.getenv("IMAGE_ARTIFACT_QUALITY", 90))
+
+    IMAGE_PROCESSING_WORKERS: int = int(os.getenv("IMAGE_PROCESSING_WORKERS", 4))
+
+    # Decorative image pre-filter ("drop" removes the image, "tag" keeps it uncaptioned)
+    DECORATIVE_IMAGE_ACTION: str = os.getenv("DECORATIVE_IMAGE_ACTION", "drop")
+    DECORATIVE_MIN_EDGE: int = int(os.getenv("DECORATIVE_MIN_EDGE", 24))
+    DECORATIVE_MAX_ASPECT_RATIO: float = float(os.getenv("DECORATIVE_MAX_ASPECT_RATIO", 12))
+    DECORATIVE_MIN_ENTROPY: float = float(os.getenv("DECORATIVE_MIN_ENTROPY", 1.0))
+    DECORATIVE_PHASH_BLACKLIST: str = os.getenv("DECORATIVE_PHASH_BLACKLIST", "")
+
+    # Bounded-memory conversion: pages converted per Docling call, halved while
+    # the process RSS stays above the budget (0 disables the budget)
+    CONVERSION_PAGE_WINDOW: int = int(os.getenv("CONVERSION_PAGE_WINDOW", 10))
+    CONVERSION_MEMORY_BUDGET_MB: int = int(os.getenv("CONVERSION_MEMORY_BUDGET_MB", 0))
+
+    # Conversion worker processes (0 runs the conversions inside the API process),
+    # each recycled after CONVERSION_WORKER_MAX_JOBS jobs (0 never recycles them)
+    CONVERSION_WORKERS: int = int(os.getenv("CONVERSION_WORKERS", 1))
+    CONVERSION_WORKER_MAX_JOBS: int = int(os.getenv("CONVERSION_WORKER_MAX_JOBS", 0))
+    CONVERSION_WARM_PROFILES: str = os.getenv("CONVERSION_WARM_PROFILES", "digital,full")
+
+    # Distributed conversion: when a queue URL is set (sqlite:///<path> or
+    # redis://...), jobs are enqueued for `python -m app.worker` processes on any
+    # node instead of the local worker pool
+    CONVERSION_QUEUE_URL: str = os.getenv("CONVERSION_QUEUE_URL", "")
+    CONVERSION_LEASE_SECONDS: int = int(os.getenv("CONVERSION_LEASE_SECONDS", 120))
+    CONVERSION_MAX_ATTEMPTS: int = int(os.getenv("CONVERSION_MAX_ATTEMPTS", 3))
+    CONVERSION_RETRY_BACKOFF: float = float(os.getenv("CONVERSION_RETRY_BACKOFF", 30))
+    CONVERSION_POLL_INTERVAL: float = float(os.getenv("CONVERSION_POLL_INTERVAL", 2))
+    WORKER_METRICS_PORT: int = int(os.getenv("WORKER_METRICS_PORT", 9100))
+
+    # Heavy modules (Docling, imagehash, PIL, OpenAI) are imported on first use;
+    # when enabled they are imported in the background right after startup instead
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+
+    # Bucket receiving the traces of profiled runs (`profiling=true`)
+    PROFILING_BUCKET: str = os.getenv("PROFILING_BUCKET", "processed-files")
+
+    # Record/replay of the LLM responses (see app/llm_cassette.py):
+    # "off", "record", "replay" or "auto" (replays what was recorded, records the rest)
+    LLM_CASSETTE_MODE: str = os.getenv("LLM_CASSETTE_MODE", "off")
+    LLM_CASSETTE_DIR: str = os.getenv("LLM_CASSETTE_DIR", "cassettes")
+
+    # Topics, offices and examining boards resolved in memory (see
+    # app/supabase/entity_dictionary.py): new rows are read every REFRESH
+    # seconds, the whole tables every FULL_RELOAD seconds. Fuzzy matching only
+    # serves lookups (/supabase/entities/{table}/match), 0 disables it
+    ENTITY_CACHE_REFRESH_SECONDS: float = float(os.getenv("ENTITY_CACHE_REFRESH_SECONDS", 60))
+    ENTITY_CACHE_FULL_RELOAD_SECONDS: float = float(os.getenv("ENTITY_CACHE_FULL_RELOAD_SECONDS", 900))
+    ENTITY_FUZZY_CUTOFF: float = float(os.getenv("ENTITY_FUZZY_CUTOFF", 0))
+
+    # Responses of the results endpoints cached in memory (0 disables the cache)
+    RESULTS_CACHE_TTL_SECONDS: float = float(os.getenv("RESULTS_CACHE_TTL_SECONDS", 30))
+
+    # Bucket folder listings cached in memory, dropped on uploads through the API
+    STORAGE_LISTING_TTL_SECONDS: float = float(os.getenv("STORAGE_LISTING_TTL_SECONDS", 15))
+
+    # When set, each processed document is also written to this folder
+    DOCUMENT_PROCESSING_DEBUG_DIR: str = os.getenv("DOCUMENT_PROCESSING_DEBUG_DIR", "")
+
     # LLM API Key (Example for Gemini)
     # GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
 
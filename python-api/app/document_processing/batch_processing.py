@@ -0,0 +1,165 @@
+import sys
+import json
+import asyncio
+import logging
+
+from pathlib import PurePosixPath
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+
+def resolve_batch_documents(supabase_service, bucket: str, paths: list = None, prefix: str = None) -> list:
+    """Lists the PDFs of a batch with their storage metadata.
+
+    Args:
+        supabase_service (SupabaseService): The storage client.
+        bucket (str): The source bucket.
+        paths (list, optional): The PDF paths, relative to the bucket root.
+        prefix (str, optional): A folder whose PDFs (subfolders included) are added.
+
+    Returns:
+        list: {'file_path', 'content_id'} for every distinct path, in order.
+        `content_id` (ETag and size) is the same for byte-identical files, or
+        None when storage did not report it.
+    """
+    entries = {}
+    batch_paths = []
+
+    if prefix is not None:
+        for entry in supabase_service.list_files_recursive(bucket, prefix):
+            if entry['name'].lower().endswith('.pdf'):
+                entries[entry['path']] = entry
+                batch_paths.append(entry['path'])
+
+    if paths:
+        folders = {str(PurePosixPath(path).parent) for path in paths if path not in entries}
+
+        for folder in folders:
+            for entry in supabase_service.get_files_from_bucket(bucket, '' if folder == '.' else folder):
+                path = entry['name'] if folder == '.' else f"{folder}/{entry['name']}"
+                entries.setdefault(path, entry)
+
+        batch_paths.extend(paths)
+
+    documents = []
+
+    for path in dict.fromkeys(batch_paths):
+        metadata = (entries.get(path) or {}).get('metadata') or {}
+        etag = metadata.get('eTag')
+
+        documents.append({
+            'file_path': path,
+            'content_id': f"{etag}:{metadata.get('size')}" if etag else None,
+        })
+
+    return documents
+
+
+def group_duplicates(documents: list) -> tuple:
+    """Splits a batch into the documents to convert and the byte-identical copies.
+
+    Returns:
+        tuple: (the documents to convert, {copy path: path of the converted original}).
+    """
+    originals = {}
+    unique = []
+    duplicates = {}
+
+    for document in documents:
+        content_id = document['content_id']
+
+        if content_id is not None and content_id in originals:
+            duplicates[document['file_path']] = originals[content_id]
+            continue
+
+        if content_id is not None:
+            originals[content_id] = document['file_path']
+
+        unique.append(document)
+
+    return unique, duplicates
+
+
+def format_event(event: str, **fields) -> str:
+    """Formats a batch progress event as a NDJSON line."""
+    return json.dumps({'event': event, **fields}, default=str) + '\n'
+
+
+async def run_batch(documents: list, run_job, job_options: dict):
+    """Converts the documents of a batch concurrently and yields progress events.
+
+    Every distinct document is submitted at once, so the worker pool (or the
+    job queue) decides how many run in parallel. A byte-identical copy is
+    submitted only after its original is done, so it resolves to the
+    conversion cache instead of being converted twice.
+
+    Args:
+        documents (list): The `resolve_batch_documents` result.
+        run_job (Callable): Coroutine running one conversion job (the
+            `process_pdf_to_markdown_and_upload` keyword arguments).
+        job_options (dict): The job arguments shared by every document.
+
+    Yields:
+        str: NDJSON events: 'scheduled', 'duplicate', 'done', 'failed' and a
+        final 'summary'.
+    """
+    logger = logging.getLogger(__name__)
+    unique, duplicates = group_duplicates(documents)
+    copies = {}
+
+    for copy_path, original_path in duplicates.items():
+        copies.setdefault(original_path, []).append(copy_path)
+
+    async def convert(file_path: str, **overrides):
+        try:
+            result = await run_job(file_path=file_path, **{**job_options, **overrides})
+        except Exception as e:
+            logger.error(f'Batch conversion of {file_path} failed: {e}')
+            return file_path, None, e
+
+        # The conversion reports its own errors instead of raising them
+        if isinstance(result, dict) and result.get('status') == 'error':
+            logger.error(f'Batch conversion of {file_path} failed: {result.get("message")}')
+            return file_path, None, result.get('message') or 'conversion failed'
+
+        return file_path, result, None
+
+    yield format_event('scheduled', documents=len(documents), conversions=len(unique),
+                       duplicates=len(duplicates))
+
+    for copy_path, original_path in duplicates.items():
+        yield format_event('duplicate', file_path=copy_path, duplicate_of=original_path)
+
+    pending = {asyncio.create_task(convert(document['file_path'])) for document in unique}
+    counts = {'done': 0, 'failed': 0}
+
+    while pending:
+        finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+        for task in finished:
+            file_path, result, error = task.result()
+
+            if error is None:
+                counts['done'] += 1
+                yield format_event('done', file_path=file_path, result=result)
+
+                # The copies now hit the conversion cache of this document
+                # (even when the batch forces a new conversion)
+                pending |= {asyncio.create_task(convert(copy_path, force=False))
+                            for copy_path in copies.pop(file_path, [])}
+            else:
+                counts['failed'] += 1
+                yield format_event('failed', file_path=file_path, error=str(error))
+
+                # Same bytes, same failure: report the copies without retrying them
+                for copy_path in copies.pop(file_path, []):
+                    counts['failed'] += 1
+                    yield format_event('failed', file_path=copy_path,
+                                       error=f'duplicate of {file_path}, which failed')
+
+    yield format_event('summary', **counts)
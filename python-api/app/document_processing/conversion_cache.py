@@ -0,0 +1,85 @@
+import sys
+import json
+import hashlib
+import logging
+
+from pathlib import Path
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+
+class ConversionCache:
+    """Whole-document result cache keyed by the source PDF content.
+
+    A conversion manifest is stored in the output bucket under
+    `_conversions/<key>.json`, where the key hashes the PDF bytes, the pipeline
+    signature (options and model versions) and the page range. A byte-identical
+    PDF uploaded under another name resolves to the same manifest.
+
+    Every range of a document is uploaded to the same markdown path, so the
+    manifest keeps the SHA-256 of the markdown it produced: a manifest whose
+    markdown was since overwritten (by another range) or deleted is a miss.
+    """
+
+    manifests_folder = '_conversions'
+
+    def __init__(self, supabase_service, bucket: str):
+        self.supabase_service = supabase_service
+        self.bucket = bucket
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def get_key(pdf_path: Path, pipeline_signature: str, start_page: int = None, end_page: int = None) -> str:
+        with open(pdf_path, 'rb') as f:
+            pdf_digest = hashlib.file_digest(f, 'sha256')
+
+        digest = hashlib.sha256()
+        digest.update(pdf_digest.digest())
+        digest.update(pipeline_signature.encode())
+        digest.update(f'{start_page}-{end_page}'.encode())
+
+        return digest.hexdigest()
+
+    def lookup(self, key: str) -> dict | None:
+        """Returns the cached result of a conversion, if the bucket still holds its markdown."""
+        try:
+            manifest = json.loads(self.supabase_service.download_file_from_s3(
+                self.bucket, f'{self.manifests_folder}/{key}.json'))
+        except Exception:
+            return None
+
+        markdown_path = manifest['result']['markdown_path']
+
+        try:
+            markdown = self.supabase_service.download_file_from_s3(self.bucket, markdown_path)
+        except Exception:
+            self.logger.info(f'Cached conversion {key} points to a deleted file, ignoring it')
+            return None
+
+        # Manifests saved before the hash was recorded cannot be checked
+        if hashlib.sha256(markdown).hexdigest() != manifest.get('markdown_sha256'):
+            self.logger.info(f'The markdown of cached conversion {key} was overwritten, ignoring it')
+            return None
+
+        return manifest
+
+    def save(self, key: str, source_path: str, result: dict, markdown: bytes):
+        manifest = {
+            'key': key,
+            'source_path': source_path,
+            'markdown_sha256': hashlib.sha256(markdown).hexdigest(),
+            'result': result,
+        }
+
+        self.supabase_service.client.storage.from_(self.bucket).upload(
+            path=f'{self.manifests_folder}/{key}.json',
+            file=json.dumps(manifest).encode('utf-8'),
+            file_options={"content-type": "application/json", "upsert": "true"}
+        )
+
+        self.logger.info(f'Conversion manifest saved for {source_path} ({key})')
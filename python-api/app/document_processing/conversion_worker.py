@@ -0,0 +1,148 @@
+import sys
+import queue
+import asyncio
+import logging
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.dependencies import settings
+from app.document_processing.pipeline_profiles import PipelineProfile
+from app.document_processing.progress import ProgressReporter
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+# The service of the current worker process, created by `_init_worker`
+_service = None
+
+
+def _init_worker(warm_profiles: list):
+    global _service
+
+    from app.document_processing.document_processing_service import DocumentProcessingService
+
+    _service = DocumentProcessingService()
+    _service.warm_up(warm_profiles)
+
+
+def _run_job(job: dict, events=None) -> dict:
+    progress = ProgressReporter(events.put if events is not None else None)
+
+    return _service.process_pdf_to_markdown_and_upload(**job, progress=progress)
+
+
+class ConversionWorkerPool:
+    """Long-lived worker processes that own the warm Docling converters.
+
+    Conversion jobs (the keyword arguments of
+    `process_pdf_to_markdown_and_upload`) are sent to the workers over the
+    executor's call queue, so the API process never runs Docling and stays
+    responsive while documents are converted. Each worker creates its
+    DocumentProcessingService once and loads the models of the
+    `CONVERSION_WARM_PROFILES` before taking its first job.
+
+    Workers are started with `spawn`: forking a process that already holds
+    PyTorch/ONNX thread pools is not safe. Progress events travel back through
+    a queue of a multiprocessing manager, started with the first job that asks
+    for them.
+    """
+
+    def __init__(self, workers: int = None, max_jobs_per_worker: int = None, warm_profiles: list = None):
+        self.workers = workers or max(settings.CONVERSION_WORKERS, 1)
+        self.max_jobs_per_worker = max_jobs_per_worker if max_jobs_per_worker is not None \
+            else settings.CONVERSION_WORKER_MAX_JOBS
+        self.warm_profiles = warm_profiles if warm_profiles is not None else [
+            PipelineProfile(p.strip()) for p in settings.CONVERSION_WARM_PROFILES.split(',') if p.strip()]
+
+        self._executor = None
+        self._manager = None
+        self.logger = logging.getLogger(__name__)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.warm_profiles,),
+                # Recycling a worker after N jobs returns its memory to the OS
+                max_tasks_per_child=self.max_jobs_per_worker or None
+            )
+
+            self.logger.info(f'Started {self.workers} conversion worker(s)')
+
+        return self._executor
+
+    def _get_manager(self):
+        if self._manager is None:
+            self._manager = multiprocessing.get_context('spawn').Manager()
+
+        return self._manager
+
+    def _forward_events(self, events, future, on_progress):
+        while True:
+            try:
+                on_progress(events.get(timeout=0.2))
+            except queue.Empty:
+                if future.done():
+                    break
+
+    async def run(self, on_progress=None, **job) -> dict:
+        """Runs a conversion job in a worker and waits for its result.
+
+        `on_progress` (optional) is called, from a helper thread, with every
+        ProgressReporter event of the job.
+        """
+        events = self._get_manager().Queue() if on_progress is not None else None
+
+        try:
+            future = self._get_executor().submit(_run_job, job, events)
+
+            if events is None:
+                return await asyncio.wrap_future(future)
+
+            forwarding = asyncio.create_task(asyncio.to_thread(
+                self._forward_events, events, future, on_progress))
+            result = await asyncio.wrap_future(future)
+            await forwarding
+
+            return result
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OOM killer): start a fresh pool
+            # for the next jobs and report the failure of this one
+            self.logger.error('A conversion worker died, restarting the pool')
+            self.shutdown(wait=False)
+            raise
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+_pool = None
+
+
+def get_conversion_pool() -> ConversionWorkerPool:
+    """Provides the ConversionWorkerPool shared by the API process."""
+    global _pool
+
+    if _pool is None:
+        _pool = ConversionWorkerPool()
+
+    return _pool
+
+
+def shutdown_conversion_pool():
+    if _pool is not None:
+        _pool.shutdown()
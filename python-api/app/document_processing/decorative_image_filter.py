@@ -0,0 +1,95 @@
+import sys
+import logging
+import imagehash
+
+from pathlib import Path
+from PIL import Image
+
+from app.dependencies import settings
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+
+class DecorativeImageFilter:
+    """CPU-only pre-filter that spots decorative images before they are captioned.
+
+    An image is considered decorative when any of these rules match:
+    1. Its smallest side is below `DECORATIVE_MIN_EDGE` (bullets, icons, specks).
+    2. Its aspect ratio is above `DECORATIVE_MAX_ASPECT_RATIO` (rules, borders).
+    3. Its grayscale entropy is below `DECORATIVE_MIN_ENTROPY` bits (blank or
+       flat colour blocks).
+    4. Its pHash is within `blacklist_threshold` of a hash listed in the
+       `DECORATIVE_PHASH_BLACKLIST` file (known logos, letterheads, stamps).
+    """
+
+    blacklist_threshold = 6
+
+    def __init__(self):
+        self.action = settings.DECORATIVE_IMAGE_ACTION
+        self.min_edge = settings.DECORATIVE_MIN_EDGE
+        self.max_aspect_ratio = settings.DECORATIVE_MAX_ASPECT_RATIO
+        self.min_entropy = settings.DECORATIVE_MIN_ENTROPY
+        self.logger = logging.getLogger(__name__)
+
+        self.blacklist = self._load_blacklist(settings.DECORATIVE_PHASH_BLACKLIST)
+
+    def _load_blacklist(self, blacklist_path: str) -> list:
+        if not blacklist_path or not Path(blacklist_path).exists():
+            return []
+
+        with open(blacklist_path, 'r') as f:
+            return [imagehash.hex_to_hash(line.split()[0])
+                    for line in f if line.strip() and not line.startswith('#')]
+
+    def classify(self, image: Image.Image) -> str | None:
+        """Returns the reason an image is decorative, or None if it should be captioned."""
+        width, height = image.size
+
+        if min(width, height) < self.min_edge:
+            return 'too small'
+
+        if max(width, height) / max(min(width, height), 1) > self.max_aspect_ratio:
+            return 'extreme aspect ratio'
+
+        if image.convert('L').entropy() < self.min_entropy:
+            return 'low grayscale entropy'
+
+        if self.blacklist:
+            image_hash = imagehash.phash(image)
+
+            if any(image_hash - h < self.blacklist_threshold for h in self.blacklist):
+                return 'blacklisted'
+
+        return None
+
+    def filter_images(self, images: dict) -> dict:
+        """Classifies in-memory images.
+
+        With the "drop" action the caller removes the decorative images from
+        the document, with "tag" they are kept (and still uploaded) but never
+        captioned.
+
+        Args:
+            images (dict): PIL images keyed by file name.
+
+        Returns:
+            dict: The decorative images, mapping each file name to the reason
+            it was flagged.
+        """
+        decorative_images = {}
+
+        for image_name, image in images.items():
+            reason = self.classify(image)
+
+            if reason is not None:
+                decorative_images[image_name] = reason
+
+        self.logger.info(
+            f'{len(decorative_images)} decorative image(s) found ({self.action}), caption calls saved: {len(decorative_images)}')
+
+        return decorative_images
@@ -1,31 +1,139 @@
-from fastapi import APIRouter
-from .document_processing_service import DocumentProcessingService
+import json
+import asyncio
+
+from typing import TYPE_CHECKING
+from functools import lru_cache
+from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from app.dependencies import settings
+from app.job_queue import JobQueue, get_job_queue
+from app.metrics import JOBS_IN_PROGRESS
+from app.supabase.supabase_service import SupabaseService, invalidate_storage_listings
+from .pipeline_profiles import PipelineProfile
+from .conversion_worker import get_conversion_pool
+from .batch_processing import resolve_batch_documents, run_batch
+from .progress import ProgressReporter
+
+if TYPE_CHECKING:
+    from .document_processing_service import DocumentProcessingService
 
 router = APIRouter(
     prefix="/document-processing",
     tags=["Document Processing"]
 )
 
+inline_conversion_slot = asyncio.Semaphore(1)
+
+# Streamed jobs, referenced until they finish even if their client went away
+streamed_jobs = set()
+
 
 def get_document_processing_service():
-    """Provides the DocumentProcessingService instance."""
+    """Provides the DocumentProcessingService instance.
+
+    The service module (Docling, imagehash, PIL, the OpenAI client) is imported
+    on the first request instead of at application start.
+    """
+    from .document_processing_service import DocumentProcessingService
+
     return DocumentProcessingService()
 
 
+@lru_cache(maxsize=1)
+def get_conversion_queue() -> JobQueue:
+    """Provides the shared job queue of `CONVERSION_QUEUE_URL`."""
+    return get_job_queue(settings.CONVERSION_QUEUE_URL)
+
+
+async def wait_for_job(queue: JobQueue, job_id: str, on_progress=None) -> dict:
+    """Polls a queued job until it is done or dead-lettered."""
+    reported_events = 0
+
+    while True:
+        job = await run_in_threadpool(queue.get, job_id)
+
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+        if on_progress is not None:
+            for event in await run_in_threadpool(queue.get_progress, job_id, reported_events):
+                on_progress(event)
+                reported_events += 1
+
+        if job['status'] == 'done':
+            return job['result']
+
+        if job['status'] == 'dead':
+            raise HTTPException(
+                status_code=500, detail=f"Job {job_id} failed after {job['attempts']} attempt(s): {job['error']}")
+
+        await asyncio.sleep(settings.CONVERSION_POLL_INTERVAL)
+
+
+async def run_conversion_job(wait: bool = True, on_progress=None, **job) -> dict:
+    """Runs a `process_pdf_to_markdown_and_upload` job where it is configured to run.
+
+    With `CONVERSION_QUEUE_URL` the job is enqueued for the worker nodes,
+    otherwise it runs in the local worker pool, or in this process when
+    `CONVERSION_WORKERS` is 0. `on_progress` (optional) receives the
+    ProgressReporter events of the job, possibly from another thread.
+    """
+    with JOBS_IN_PROGRESS.track_inprogress():
+        result = await _run_conversion_job(wait, on_progress, **job)
+
+    # The outputs were uploaded, possibly by another process
+    invalidate_storage_listings(job.get('output_bucket'))
+
+    return result
+
+
+async def _run_conversion_job(wait: bool, on_progress, **job) -> dict:
+    if settings.CONVERSION_QUEUE_URL:
+        queue = get_conversion_queue()
+        job_id = await run_in_threadpool(queue.enqueue, job)
+
+        if not wait:
+            return {'status': 'queued', 'job_id': job_id}
+
+        return await wait_for_job(queue, job_id, on_progress)
+
+    # The conversion runs in a worker process, so this process keeps serving
+    # other requests while Docling is busy
+    if settings.CONVERSION_WORKERS > 0:
+        return await get_conversion_pool().run(on_progress=on_progress, **job)
+
+    # In-process conversions run one at a time, as a batch would start them all
+    async with inline_conversion_slot:
+        service: 'DocumentProcessingService' = get_document_processing_service()
+
+        return await run_in_threadpool(
+            service.process_pdf_to_markdown_and_upload, **job, progress=ProgressReporter(on_progress))
+
+
 @router.post("/process-pdf")
-def process_pdf(
+async def process_pdf(
     file_path: str,
     start_page: int = None,
     end_page: int = None,
     bucket: str = 'pdf-files',
-    output_bucket: str = 'processed-files'
+    output_bucket: str = 'processed-files',
+    force: bool = False,
+    profile: PipelineProfile = PipelineProfile.AUTO,
+    wait: bool = True,
+    profiling: bool = False
 ):
     """Endpoint to process a PDF from Supabase, convert to markdown, add image descriptions, and upload results.
 
-    This endpoint orchestrates the complete document processing pipeline:
-    1. Downloads and converts PDF to Markdown with optional page range
-    2. Handles image references (removes duplicates, converts to relative paths)
-    3. Adds AI-generated descriptions for all images
+    The job runs in one of the `CONVERSION_WORKERS` worker processes, which keep
+    the Docling models loaded between jobs, or, when `CONVERSION_QUEUE_URL` is
+    set, is enqueued for the `app.worker` nodes sharing that queue. This endpoint orchestrates the
+    complete document processing pipeline:
+    1. Downloads and converts PDF to Markdown with optional page range, unless a
+    byte-identical PDF was already converted with the same options and range
+    2. Removes repeated images and filters decorative ones
+    3. Adds AI-generated descriptions for the remaining images
     4. Uploads the resulting markdown file to Supabase
     5. Uploads all artifact images to a dedicated artifacts folder in Supabase
 
@@ -35,6 +143,15 @@ def process_pdf(
         end_page (int, optional): The ending page number for conversion (inclusive). Defaults to None.
         bucket (str, optional): The name of the source storage bucket. Defaults to 'pdf-files'.
         output_bucket (str, optional): The name of the destination storage bucket. Defaults to 'processed-files'.
+        force (bool, optional): Convert again even if a matching conversion exists. Defaults to False.
+        profile (PipelineProfile, optional): The Docling pipeline profile ('text', 'tables',
+            'digital', 'full' or 'auto'). 'auto' skips OCR on pages with an embedded text layer.
+            Defaults to 'auto'.
+        wait (bool, optional): With a job queue, wait for the result instead of returning
+            the job id right away (see GET /jobs/{job_id}). Defaults to True.
+        profiling (bool, optional): Capture a cProfile trace and a tracemalloc snapshot of
+            this run, uploaded to `PROFILING_BUCKET` (paths in the result's 'profiling').
+            Defaults to False.
 
     Returns:
         dict: A dictionary containing the processing status and paths to uploaded files.
@@ -43,23 +160,154 @@ def process_pdf(
         start_page = None
         end_page = None
 
-    service: DocumentProcessingService = get_document_processing_service()
-
-    return service.process_pdf_to_markdown_and_upload(
+    return await run_conversion_job(
+        wait=wait,
         file_path=file_path,
         start_page=start_page,
         end_page=end_page,
         bucket=bucket,
-        output_bucket=output_bucket
+        output_bucket=output_bucket,
+        force=force,
+        profile=profile,
+        profiling=profiling
     )
 
 
+@router.post("/process-pdf/stream")
+async def process_pdf_stream(
+    file_path: str,
+    start_page: int = None,
+    end_page: int = None,
+    bucket: str = 'pdf-files',
+    output_bucket: str = 'processed-files',
+    force: bool = False,
+    profile: PipelineProfile = PipelineProfile.AUTO,
+    profiling: bool = False
+):
+    """Same as /process-pdf, streaming the progress of the job as server-sent events.
+
+    - `event: progress`: a stage event, e.g. {"stage": "convert", "status": "progress",
+      "current": 10, "total": 42, "elapsed": 31.2}. Stages: download, cache_lookup,
+      fingerprint, convert, dedup, filter, process_images, caption, assemble, upload;
+      'finished' events carry the stage `duration` in seconds.
+    - `event: result`: the /process-pdf result (with the per-stage `timings`), last event.
+    - `event: error`: {"message"} when the job could not run, last event.
+    """
+    if start_page == 0 and end_page == 0:
+        start_page = None
+        end_page = None
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_progress(event: dict):
+        loop.call_soon_threadsafe(events.put_nowait, ('progress', event))
+
+    async def run():
+        try:
+            result = await run_conversion_job(
+                on_progress=on_progress,
+                file_path=file_path,
+                start_page=start_page,
+                end_page=end_page,
+                bucket=bucket,
+                output_bucket=output_bucket,
+                force=force,
+                profile=profile,
+                profiling=profiling
+            )
+            loop.call_soon_threadsafe(events.put_nowait, ('result', result))
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, ('error', {'message': str(e)}))
+
+    async def stream():
+        # The job goes on if the client disconnects
+        job = asyncio.create_task(run())
+        streamed_jobs.add(job)
+        job.add_done_callback(streamed_jobs.discard)
+
+        while True:
+            kind, data = await events.get()
+            yield f"event: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
+
+            if kind != 'progress':
+                break
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+class BatchRequest(BaseModel):
+    paths: list[str] = []
+    prefix: str | None = None
+    start_page: int | None = None
+    end_page: int | None = None
+    bucket: str = 'pdf-files'
+    output_bucket: str = 'processed-files'
+    force: bool = False
+    profile: PipelineProfile = PipelineProfile.AUTO
+
+
+@router.post("/process-batch")
+async def process_batch(request: BatchRequest):
+    """Endpoint to process many PDFs in one call, streaming a NDJSON event per document.
+
+    The documents are the given `paths` plus every PDF under `prefix`
+    (subfolders included). All of them are scheduled at once across the
+    conversion workers (or the job queue); byte-identical files are converted
+    only once, their copies resolve to the conversion cache afterwards.
+
+    Events, one JSON object per line:
+    - {"event": "scheduled", "documents", "conversions", "duplicates"}
+    - {"event": "duplicate", "file_path", "duplicate_of"}
+    - {"event": "done", "file_path", "result"}: `result` as returned by /process-pdf
+    - {"event": "failed", "file_path", "error"}
+    - {"event": "summary", "done", "failed"}
+    """
+    if not request.paths and request.prefix is None:
+        raise HTTPException(status_code=422, detail="Give a list of paths or a prefix")
+
+    documents = await run_in_threadpool(
+        resolve_batch_documents, SupabaseService(), request.bucket, request.paths, request.prefix)
+
+    job_options = dict(
+        start_page=request.start_page or None,
+        end_page=request.end_page or None,
+        bucket=request.bucket,
+        output_bucket=request.output_bucket,
+        force=request.force,
+        profile=request.profile
+    )
+
+    return StreamingResponse(
+        run_batch(documents, run_conversion_job, job_options),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Returns the state of a queued conversion job (and its result once done)."""
+    if not settings.CONVERSION_QUEUE_URL:
+        raise HTTPException(status_code=404, detail="No job queue configured")
+
+    job = get_conversion_queue().get(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
+
+
 @router.get("/file-headers")
 def process_pdf(
     file_path: str,
     bucket: str,
 ):
-    service: DocumentProcessingService = get_document_processing_service()
+    service: 'DocumentProcessingService' = get_document_processing_service()
 
     return service.get_markdown_headers(
         bucket, file_path,
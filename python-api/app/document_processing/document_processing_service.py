@@ -1,21 +1,33 @@
 import io
-import os
-import shutil
+import gc
+import hashlib
+import importlib.metadata
+import json
 import logging
 import imagehash
 import re
 import sys
+import time
 
-from docling.datamodel.pipeline_options import PdfPipelineOptions
 from docling.datamodel.base_models import InputFormat, DocumentStream
 from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling_core.types.doc import ImageRefMode
+from docling_core.types.doc import ImageRefMode, PictureItem
 from collections import Counter
+from contextlib import nullcontext
 from pathlib import Path
-from PIL import Image
 
+from app.dependencies import settings
+from app.memory_monitor import MemoryMonitor, get_rss_mb
 from app.supabase.supabase_service import SupabaseService
 from app.qwen_api.qwen_api_service import QwenApiService 
+from app.document_processing.image_processor import ImageProcessor
+from app.document_processing.decorative_image_filter import DecorativeImageFilter
+from app.document_processing.page_cache import PageCache
+from app.document_processing.conversion_cache import ConversionCache
+from app.document_processing.pipeline_profiles import PipelineProfile, get_pipeline_options, resolve_page_profiles
+from app.document_processing.progress import ProgressReporter
+from app.metrics import collect_job_metrics, observe_job, record_cache_lookups
+from app.profiling import RunProfiler
 
 logging.basicConfig(
     stream=sys.stdout,
@@ -24,168 +36,292 @@ logging.basicConfig(
     level=logging.INFO 
 )
 
+# Emitted by Docling once per picture, in reading order
+IMAGE_PLACEHOLDER = '<!-- docling-picture -->'
+
+
 class DocumentProcessingService:
     def __init__(self):
         self.supabase_service = SupabaseService()
         self.qwen_service = QwenApiService()
+        self.image_processor = ImageProcessor()
+        self.decorative_filter = DecorativeImageFilter()
+        self._converters = {}
         self.logger = logging.getLogger(__name__)
 
-    def append_image_description(self, md_file_path: Path):
-        if (not md_file_path.exists()):
-            raise FileNotFoundError(f"File not found: {md_file_path}")
+    def get_image_descriptions(self, processed_images: dict, decorative_images: dict = None, progress: ProgressReporter = None) -> dict:
+        """Generates an AI description for every image that is kept in the markdown.
 
-        with open(md_file_path, 'r') as f:
-            content = f.read()
+        All images are captioned up front, before the markdown is streamed, so
+        they can share batched requests.
 
-        image_tag_pattern = r'!\[.*?\]\((.*?)\)'
-
-        def handle_image_reference(match):
-            image_tag = match.group(0)
-            image_path = Path('temp') / Path(match.group(1))
+        Args:
+            processed_images (dict): The `ImageProcessor.process_images` result.
+                The downscaled caption inputs are sent to the vision model.
+            decorative_images (dict, optional): The `DecorativeImageFilter.filter_images`
+                result. These images are not captioned.
+            progress (ProgressReporter, optional): Receives a 'caption' update per batch.
 
-            image_description = self.qwen_service.get_image_caption(
-                image_path)
-            
-            image_tag_with_description = f'{image_tag}\n<!-- {image_description} -->'
+        Returns:
+            dict: The descriptions keyed by image file name.
+        """
+        decorative_images = decorative_images or {}
 
-            return image_tag_with_description
+        caption_inputs = {
+            image_name: (processed_image['caption_input'],
+                         processed_image['caption_media_type'])
+            for image_name, processed_image in processed_images.items()
+            if image_name not in decorative_images
+        }
 
-        updated_content = re.sub(
-            image_tag_pattern, handle_image_reference, content)
-        
-        with open(md_file_path, 'w') as f:
-            f.write(updated_content)
+        on_progress = (lambda done, total: progress.update('caption', done, total)) if progress else None
+        image_descriptions = self.qwen_service.get_image_captions(
+            caption_inputs, on_progress=on_progress)
 
         self.logger.info(
-            f'Image descriptions have been generated and added to the markdown file.')
-        
+            f'{len(image_descriptions)} image descriptions have been generated.')
 
-    def handle_image_references(self, artifacts_folder_path: Path, md_file_path: Path):
-        """Updates markdown image links and cleans up redundant image files.
+        return image_descriptions
 
-        This method first identifies visually similar (repeated) images in the 
-        artifacts folder. It then parses the Markdown file to:
-        1. Remove any image tags (`![]()`) that reference these repeated images.
-        2. Convert valid image references from absolute paths to relative paths
-        (preserving only the last two path segments, e.g., './parent/image.png').
+    def handle_image_references(self, lines, image_names: list, artifacts_folder: str, repeated_filenames: list = None, processed_images: dict = None, decorative_images: dict = None, image_descriptions: dict = None):
+        """Resolves the picture placeholders of a markdown stream, one line at a time.
 
-        After updating the Markdown content, it permanently deletes the detected 
-        repeated image files from the filesystem.
+        Every picture placeholder goes through the same line-level transform:
+        1. Placeholders of repeated images (or pictures without an image) are removed.
+        2. Decorative images are removed, or kept with a decorative marker,
+        depending on the filter action.
+        3. The remaining ones become an image tag with a relative path to the
+        processed artifact (e.g., './doc_artifacts/image.png').
+        4. The image description is appended below the tag as a comment.
 
         Args:
-            artifacts_folder_path (Path): The directory containing the images to analyze.
-            md_file_path (Path): The Markdown file to read and modify.
-
-        Raises:
-            FileNotFoundError: If the md_file_path does not exist.
+            lines (Iterable[str]): The markdown lines.
+            image_names (list[str | None]): The image file name of each picture,
+                in the order of the placeholders.
+            artifacts_folder (str): The artifacts folder, relative to the markdown file.
+            repeated_filenames (list[str], optional): File names returned by `get_repeated_images`.
+            processed_images (dict, optional): The `ImageProcessor.process_images` result.
+            decorative_images (dict, optional): The `DecorativeImageFilter.filter_images` result.
+            image_descriptions (dict, optional): The `get_image_descriptions` result.
+
+        Yields:
+            str: The transformed markdown lines.
         """
-        repeated_images = self.get_repeated_images(artifacts_folder_path)
+        repeated_filenames = set(repeated_filenames or [])
+        processed_images = processed_images or {}
+        decorative_images = decorative_images or {}
+        image_descriptions = image_descriptions or {}
 
-        repeated_filenames = [path.name for path in repeated_images]
+        pictures = iter(image_names)
 
-        if (not md_file_path.exists()):
-            raise FileNotFoundError(f"File not found: {md_file_path}")
+        def handle_image_reference(match):
+            filename = next(pictures, None)
 
-        with open(md_file_path, 'r') as f:
-            content = f.read()
+            if filename is None or filename in repeated_filenames:  # remove image
+                return ''
 
-        image_tag_pattern = r'!\[.*?\]\((.*?)\)'
+            if filename in decorative_images and self.decorative_filter.action == 'drop':
+                return ''
 
-        def handle_image_reference(match):
-            image_path = match.group(1)
-            filename = image_path.split('/')[-1]
+            artifact_name = processed_images[filename]['artifact_name'] \
+                if filename in processed_images else filename
+            image_tag = f'![Image](./{artifacts_folder}/{artifact_name})'
 
-            if filename in repeated_filenames:  # remove image
-                return ''
-            else:  # update to relative path
-                relative_path = "/".join(match.group(1).split('/')[-2:])
-                image_tag = f'![Image](./{relative_path})'
-                self.logger.info(f'Update imgage tag to ${image_tag}')
-                return image_tag
+            if filename in decorative_images:
+                return f'{image_tag}\n<!-- decorative image ({decorative_images[filename]}) -->'
 
-        updated_content = re.sub(
-            image_tag_pattern, handle_image_reference, content)
+            if filename in image_descriptions:
+                return f'{image_tag}\n<!-- {image_descriptions[filename]} -->'
 
-        self.logger.info(
-            f'References to repeated images removed from .md file.')
+            return image_tag
 
-        with open(md_file_path, 'w') as f:
-            f.write(updated_content)
+        image_placeholder_pattern = re.compile(re.escape(IMAGE_PLACEHOLDER))
 
-        for repeated_image in repeated_images:
-            Path(repeated_image).unlink()
-            self.logger.info(f'Deleted {repeated_image}')
+        for line in lines:
+            yield image_placeholder_pattern.sub(handle_image_reference, line)
 
-    def get_repeated_images(self, target_path: Path):
-        """Scans a directory for visually similar PNG images using perceptual hashing.
+    def post_process_markdown(self, markdown: str, **image_references) -> bytes:
+        """Streams the exported markdown once and returns the upload bytes.
+
+        Args:
+            markdown (str): The markdown exported by `parse_pdf_to_markdown`.
+            **image_references: Keyword arguments forwarded to `handle_image_references`.
+
+        Returns:
+            bytes: The UTF-8 encoded markdown, ready to upload.
+        """
+        buffer = io.BytesIO()
 
-        This method recursively searches the target path for .png files and groups
-        them based on visual similarity (pHash Hamming distance < 10). It identifies
-        clusters of duplicates and returns a flattened list of all images involved
-        in these clusters.
+        for line in self.handle_image_references(io.StringIO(markdown), **image_references):
+            buffer.write(line.encode('utf-8'))
+
+        return buffer.getvalue()
+
+    def get_repeated_images(self, images: dict):
+        """Finds visually similar images using perceptual hashing.
+
+        This method groups the images based on visual similarity (pHash Hamming
+        distance < 10). It identifies clusters of duplicates and returns a
+        flattened list of all images involved in these clusters. Each image is
+        hashed once.
 
         Args:
-            target_path (Path): The root directory to recursively search for images.
+            images (dict): PIL images (or their precomputed `imagehash.ImageHash`)
+                keyed by file name.
 
         Returns:
-            list[Path]: A flat list containing all file paths that are part of a 
+            list[str]: A flat list containing all file names that are part of a
             similarity cluster. This includes both the "originals" and their 
             duplicates.
-
-        Raises:
-            FileNotFoundError: If the provided target_path does not exist.
         """
         similarity_threshold = 10
 
-        if not target_path.exists():
-            raise FileNotFoundError(f"Folder not found: {target_path}")
+        unique_images = []  # [(hash of the first image, [file names])]
 
-        images = sorted(target_path.rglob("*.png"))
-        unique_images = []
+        for image_name, image in sorted(images.items()):
+            image_hash = image if isinstance(
+                image, imagehash.ImageHash) else imagehash.phash(image)
 
-        for image in images:
-            if (len(unique_images) == 0):
-                unique_images.append([image])
-                continue
+            for unique_hash, cluster in unique_images:
+                hamming_distance = unique_hash - image_hash
 
-            has_similar = False
+                if hamming_distance < similarity_threshold:
+                    cluster.append(image_name)
+                    break
+            else:
+                unique_images.append((image_hash, [image_name]))
 
-            for unique_image in unique_images:
-                img_a = unique_image[0]
-                img_b = image
+        repeated_images = [
+            s for _, sub in unique_images if len(sub) > 1 for s in sub]  # flat list
 
-                hash_a = imagehash.phash(Image.open(img_a))
-                hash_b = imagehash.phash(Image.open(img_b))
+        unique_count = len([u for _, u in unique_images if len(u) == 1])
 
-                hamming_distance = hash_a - hash_b
+        self.logger.info(
+            f'{len(repeated_images)} repeated images have been found ({unique_count} unique image(s) to keep).')
 
-                are_images_similar = hamming_distance < similarity_threshold
+        return repeated_images
 
-                if (are_images_similar):
-                    unique_image.append(img_b)
-                    has_similar = True
-                    break
+    def get_pipeline_signature(self, profile: PipelineProfile = PipelineProfile.AUTO) -> str:
+        """Hashes every option that changes the processed output of a page."""
+        signature = {
+            'profile': profile.value,
+            'pipeline_options': {
+                p.value: get_pipeline_options(p).model_dump(mode='json', include={
+                    'do_ocr', 'do_table_structure', 'generate_picture_images', 'images_scale'})
+                for p in PipelineProfile if p != PipelineProfile.AUTO
+            },
+            'caption_model': self.qwen_service.model,
+            'caption_options': self.image_processor.caption_options,
+            'artifact_options': self.image_processor.artifact_options,
+            'decorative_action': self.decorative_filter.action,
+            'docling_version': importlib.metadata.version('docling'),
+            'docling_core_version': importlib.metadata.version('docling-core'),
+        }
+
+        return hashlib.sha256(json.dumps(signature, sort_keys=True).encode()).hexdigest()
+
+    def get_converter(self, profile: PipelineProfile) -> DocumentConverter:
+        """Returns the converter of a concrete profile, creating it on first use."""
+        if profile not in self._converters:
+            self._converters[profile] = DocumentConverter(format_options={
+                InputFormat.PDF: PdfFormatOption(pipeline_options=get_pipeline_options(profile)),
+            })
 
-            if (not has_similar):
-                unique_images.append([image])
+        return self._converters[profile]
 
-        repeated_images = [r for r in unique_images if len(r) > 1]
-        repeated_images = [
-            s for sub in repeated_images for s in sub]  # flat list
+    def warm_up(self, profiles: list):
+        """Creates the converters of the given profiles and loads their models."""
+        for profile in profiles:
+            self.get_converter(profile).initialize_pipeline(InputFormat.PDF)
 
-        unique_images = [u for u in unique_images if len(u) == 1]
+        self.logger.info(f'Converters ready: {", ".join(p.value for p in profiles)}')
 
-        self.logger.info(
-            f'{len(repeated_images)} repeated images have been found ({len(unique_images)} unique image(s) to keep).')
+    def convert_pdf(self, file, file_name: str, page_range: tuple = None, profile: PipelineProfile = PipelineProfile.FULL):
+        """Runs Docling on a PDF, optionally restricted to a page range.
 
-        return repeated_images
+        One converter is kept per profile, so its models are loaded only once.
+
+        Args:
+            file (Path | bytes): The spooled PDF file, or its content.
+            file_name (str): The PDF file name.
+            page_range (tuple, optional): The (start, end) pages, inclusive.
+            profile (PipelineProfile, optional): A concrete pipeline profile.
+        """
+        converter = self.get_converter(profile)
+        input_source = DocumentStream(name=file_name, stream=io.BytesIO(
+            file)) if isinstance(file, bytes) else Path(file)
+
+        res = converter.convert(
+            input_source, page_range=page_range) if page_range is not None else converter.convert(input_source)
+
+        return res.document
+
+    def convert_pages(self, file, file_name: str, page_profiles: dict, progress: ProgressReporter = None) -> dict:
+        """Converts only the given pages in bounded windows.
+
+        Docling runs once per window: a contiguous run of pages sharing a
+        profile, at most `CONVERSION_PAGE_WINDOW` pages long. The Docling
+        document of a window is released before the next one starts, so only
+        the exported markdown and pictures are kept. When the process RSS goes
+        above `CONVERSION_MEMORY_BUDGET_MB` the window size is halved.
+
+        Args:
+            file (Path | bytes): The spooled PDF file, or its content.
+            file_name (str): The PDF file name.
+            page_profiles (dict): The PipelineProfile of each page to convert.
+            progress (ProgressReporter, optional): Receives a 'convert' update per window.
+
+        Returns:
+            dict: The `export_pages` result of every converted page.
+        """
+        pages = {}
+        runs = []
+
+        for page_no in sorted(page_profiles):
+            profile = page_profiles[page_no]
+
+            if runs and runs[-1][1] == page_no - 1 and runs[-1][2] == profile:
+                runs[-1][1] = page_no
+            else:
+                runs.append([page_no, page_no, profile])
 
-    def parse_pdf_to_markdown(self, path: str, start_page: int = None, end_page: int = None, bucket: str = 'pdf-files'):
-        """Downloads a PDF from storage and converts it to a Markdown file.
+        window = settings.CONVERSION_PAGE_WINDOW
 
-        This method retrieves a PDF file from the specified Supabase S3 bucket,
-        configures the pipeline to handle image extraction and scaling, and 
-        saves the resulting Markdown content to a local temporary directory.
+        for run_start, run_end, profile in runs:
+            start_page = run_start
+
+            while start_page <= run_end:
+                end_page = min(start_page + window - 1, run_end)
+
+                self.logger.info(
+                    f'Converting pages {start_page}-{end_page} of {file_name} ({profile.value} profile)')
+                document = self.convert_pdf(
+                    file, file_name, (start_page, end_page), profile)
+                pages.update(self.export_pages(document))
+
+                if progress is not None:
+                    progress.update('convert', len(pages), len(page_profiles),
+                                    pages=[start_page, end_page], profile=profile.value)
+
+                del document
+                gc.collect()
+
+                rss_mb = get_rss_mb()
+                if settings.CONVERSION_MEMORY_BUDGET_MB and rss_mb > settings.CONVERSION_MEMORY_BUDGET_MB and window > 1:
+                    window = max(1, window // 2)
+                    self.logger.info(
+                        f'RSS {rss_mb:.0f} MB above the {settings.CONVERSION_MEMORY_BUDGET_MB} MB budget, page window reduced to {window}')
+
+                start_page = end_page + 1
+
+        return pages
+
+    def parse_pdf_to_markdown(self, path: str, start_page: int = None, end_page: int = None, bucket: str = 'pdf-files', profile: PipelineProfile = PipelineProfile.AUTO):
+        """Downloads a PDF from storage and converts it to Markdown in memory.
+
+        This method streams a PDF file from the specified Supabase S3 bucket to
+        a temporary file, picks the pipeline profile of each page, converts it
+        in bounded page windows and exports the converted document in memory.
 
         Args:
             path (str): The file path relative to the root of the S3 bucket.
@@ -195,54 +331,122 @@ class DocumentProcessingService:
                 (inclusive). Defaults to None.
             bucket (str, optional): The name of the storage bucket to download 
                 from. Defaults to 'pdf-files'.
+            profile (PipelineProfile, optional): The Docling pipeline profile.
+                Defaults to 'auto'.
 
         Returns:
-            Path: A pathlib object pointing to the generated local Markdown file.
+            dict: The `assemble_pages` result for the converted document.
         """
-        output_dir = Path("temp/").resolve()
-        output_dir.mkdir(parents=True, exist_ok=True)
+        file = self.supabase_service.download_file_to_temp(bucket, path)
+        file_name = path.split('/')[-1]
 
-        file = self.supabase_service.download_file_from_s3(bucket, path)
+        try:
+            page_profiles = resolve_page_profiles(
+                file, profile, start_page, end_page)
 
-        file_stream = io.BytesIO(file)
-        file_name = path.split('/')[-1]
+            return self.assemble_pages(
+                Path(file_name).stem, self.convert_pages(file, file_name, page_profiles))
+        finally:
+            file.unlink(missing_ok=True)
 
-        custom_range = (
-            start_page,
-            end_page
-        ) if start_page is not None and end_page is not None else None
+    def export_pages(self, document) -> dict:
+        """Exports each page of a Docling document to markdown and walks its pictures in memory.
 
-        input_source = DocumentStream(name=file_name, stream=file_stream)
+        Args:
+            document (DoclingDocument): The converted document.
 
-        options = PdfPipelineOptions()
-        options.images_scale = 2.0
-        options.generate_picture_images = True
+        Returns:
+            dict: Keyed by page number, each page containing:
+                - 'markdown': The page markdown, with an `IMAGE_PLACEHOLDER` per picture
+                - 'image_names': The image file name of each placeholder, in
+                  order (None for pictures without an image)
+                - 'images': The PIL images keyed by file name
+        """
+        pages = {}
 
-        converter = DocumentConverter(format_options={
-            InputFormat.PDF: PdfFormatOption(pipeline_options=options),
-        })
+        for page_no in sorted(document.pages.keys()):
+            image_names = []
+            images = {}
 
-        res = converter.convert(
-            input_source, page_range=custom_range) if custom_range is not None else converter.convert(input_source)
+            pictures = [item for item, _ in document.iterate_items(page_no=page_no)
+                        if isinstance(item, PictureItem)]
+
+            for index, picture in enumerate(pictures):
+                image = picture.get_image(document)
 
-        doc_filename = res.input.file.stem
+                if image is None:
+                    image_names.append(None)
+                    continue
 
-        md_path = output_dir / f"{doc_filename}.md"
+                digest = hashlib.sha1(image.tobytes()).hexdigest()[:16]
+                image_name = f'image_{page_no:04d}_{index:03d}_{digest}.png'
 
-        res.document.save_as_markdown(
-            str(md_path), image_mode=ImageRefMode.REFERENCED)
+                image_names.append(image_name)
+                images[image_name] = image
+
+            markdown = document.export_to_markdown(
+                page_no=page_no, image_mode=ImageRefMode.PLACEHOLDER, image_placeholder=IMAGE_PLACEHOLDER)
+
+            pages[page_no] = {
+                'markdown': markdown,
+                'image_names': image_names,
+                'images': images,
+            }
+
+        return pages
+
+    def assemble_pages(self, name: str, pages: dict) -> dict:
+        """Joins exported pages into a single document, in page order.
+
+        Returns:
+            dict: A dictionary containing:
+                - 'name': The document name
+                - 'markdown': The markdown, with an `IMAGE_PLACEHOLDER` per picture
+                - 'image_names': The image file name of each placeholder, in order
+                - 'images': The PIL images keyed by file name (fresh pages only)
+        """
+        ordered_pages = [pages[page_no] for page_no in sorted(pages)]
 
-        return md_path
+        return {
+            'name': name,
+            'markdown': '\n\n'.join(page['markdown'] for page in ordered_pages),
+            'image_names': [n for page in ordered_pages for n in page['image_names']],
+            'images': {n: i for page in ordered_pages for n, i in page.get('images', {}).items()},
+        }
 
-    def process_pdf_to_markdown_and_upload(self, file_path: str, start_page: int = None, end_page: int = None, bucket: str = 'pdf-files', output_bucket: str = 'processed-files'):
+    def _needs_new_output(self, image_info: dict, repeated_filenames: list, image_name: str) -> bool:
+        """Whether a cached image is kept in the markdown but was never processed or captioned."""
+        if image_name in repeated_filenames:
+            return False
+
+        if image_info['decorative'] and self.decorative_filter.action == 'drop':
+            return False
+
+        if image_info['artifact_name'] is None:
+            return True
+
+        return not image_info['decorative'] and image_info['description'] is None
+
+    def process_pdf_to_markdown_and_upload(self, file_path: str, start_page: int = None, end_page: int = None, bucket: str = 'pdf-files', output_bucket: str = 'processed-files', force: bool = False, profile: PipelineProfile = PipelineProfile.AUTO, progress: ProgressReporter = None, profiling: bool = False):
         """Processes a PDF file from Supabase, converts to markdown, adds image descriptions, and uploads results.
 
         This method orchestrates the complete document processing pipeline:
-        1. Downloads and converts PDF to Markdown with optional page range
-        2. Handles image references (removes duplicates, converts to relative paths)
-        3. Adds AI-generated descriptions for all images
-        4. Uploads the resulting markdown file to Supabase
-        5. Uploads all artifact images to a dedicated artifacts folder in Supabase
+        1. Downloads the PDF and looks up a previous conversion of the same
+        content, options and page range; when found, returns its outputs
+        2. Fingerprints the pages of the requested range and picks the
+        pipeline profile of each one
+        3. Converts to Markdown only the pages whose fingerprint changed since
+        the last run, reusing the cached markdown and artifacts of the others
+        4. Removes repeated images and filters decorative ones
+        5. Downscales the new images and generates AI descriptions for them
+        6. Streams the markdown once to resolve image references and insert
+        the descriptions, and uploads the result to Supabase
+        7. Uploads the new artifact images to a dedicated artifacts folder in
+        Supabase, along with the updated page manifest
+
+        The PDF is spooled to a temporary file and converted in bounded page
+        windows (see `convert_pages`); everything else happens in memory and
+        nothing else is written to disk unless `DOCUMENT_PROCESSING_DEBUG_DIR` is set.
 
         Args:
             file_path (str): The file path relative to the root of the S3 bucket (without file extension).
@@ -250,112 +454,283 @@ class DocumentProcessingService:
             end_page (int, optional): The ending page number for conversion (inclusive). Defaults to None.
             bucket (str, optional): The name of the source storage bucket. Defaults to 'pdf-files'.
             output_bucket (str, optional): The name of the destination storage bucket. Defaults to 'processed-files'.
+            force (bool, optional): Skip the conversion cache lookup. Defaults to False.
+            profile (PipelineProfile, optional): The Docling pipeline profile. With 'auto',
+                pages with an embedded text layer skip OCR. Defaults to 'auto'.
+            progress (ProgressReporter, optional): Receives the stage events of the job
+                (download, fingerprint, convert, dedup, filter, process_images, caption,
+                assemble, upload).
+            profiling (bool, optional): Profile this run (see RunProfiler). Defaults to False.
 
         Returns:
             dict: A dictionary containing:
                 - 'markdown_path': The path to the uploaded markdown file in Supabase
                 - 'artifacts_path': The path to the uploaded artifacts folder in Supabase
+                - 'decorative_images': The decorative image report (action, detected,
+                  captions_skipped and the reason for each image)
+                - 'converted_pages': The pages converted by Docling in this run
+                - 'reused_pages': The unchanged pages taken from the page manifest
+                - 'page_profiles': The number of converted pages per pipeline profile
+                - 'cached': Whether the outputs of a previous conversion were returned
+                - 'peak_rss_mb': The peak resident memory of the process during the job
+                - 'timings': The seconds spent in each stage
+                - 'metrics': The LLM calls (count, latency, tokens) per provider/model
+                  and the cache hits and misses of the job
+                - 'profiling': With `profiling`, the bucket and paths of the uploaded
+                  profile.prof, profile.txt and memory.txt
                 - 'status': 'success' or 'error'
                 - 'message': A descriptive message about the operation
 
         Raises:
-            FileNotFoundError: If the markdown file or artifacts folder is not created properly.
             Exception: For any errors during file processing or upload operations.
         """
+        progress = progress or ProgressReporter()
+        start = time.perf_counter()
+
+        profiler = RunProfiler(
+            f'process-pdf_{Path(file_path).stem}', self.supabase_service) if profiling else nullcontext()
+
+        with profiler, collect_job_metrics() as job_metrics:
+            result = self._process_pdf(
+                file_path, start_page, end_page, bucket, output_bucket, force, profile, progress)
+
+        result['metrics'] = job_metrics.to_dict()
+
+        if profiling:
+            result['profiling'] = profiler.artifacts
+        observe_job(time.perf_counter() - start, result['status'], result.get('cached', False))
+
+        return result
+
+    def _process_pdf(self, file_path: str, start_page: int, end_page: int, bucket: str, output_bucket: str, force: bool, profile: PipelineProfile, progress: ProgressReporter) -> dict:
+        file = None
+        memory_monitor = MemoryMonitor()
+
         try:
-            md_file_path = self.parse_pdf_to_markdown(
-                file_path, start_page=start_page, end_page=end_page, bucket=bucket
-            )
-            
-            pdf_path = Path(file_path)
-            artifacts_folder_path = Path("temp") / f"{md_file_path.stem}_artifacts"
-            doc_filename = f"{pdf_path.parent.name[:-1]}_{md_file_path.stem}"
-            
-            if artifacts_folder_path.exists():
-                self.logger.info(f'Handling image references for {doc_filename}')
-                self.handle_image_references(artifacts_folder_path, md_file_path)
-            
+            with memory_monitor:
+                pdf_path = Path(file_path)
+                doc_filename = f"{pdf_path.parent.name[:-1]}_{pdf_path.stem}"
+                artifacts_folder = f"{doc_filename}_artifacts"
+
+                with progress.stage('download'):
+                    file = self.supabase_service.download_file_to_temp(bucket, file_path)
+
+                pipeline_signature = self.get_pipeline_signature(profile)
+
+                with progress.stage('cache_lookup'):
+                    conversion_cache = ConversionCache(self.supabase_service, output_bucket)
+                    conversion_key = ConversionCache.get_key(
+                        file, pipeline_signature, start_page, end_page)
+
+                    cached_conversion = None if force else conversion_cache.lookup(conversion_key)
+
+                if not force:
+                    record_cache_lookups('conversion', hits=int(cached_conversion is not None),
+                                         misses=int(cached_conversion is None))
+
+                if cached_conversion is not None:
+                    self.logger.info(
+                        f'{file_path} matches the conversion of {cached_conversion["source_path"]}, reusing its outputs')
+
+                    return {
+                        **cached_conversion['result'],
+                        'cached': True,
+                        'peak_rss_mb': round(memory_monitor.sample()),
+                        'timings': progress.get_timings(),
+                        'message': f'Reused the conversion of {cached_conversion["source_path"]}',
+                    }
+
+                with progress.stage('fingerprint'):
+                    page_cache = PageCache(
+                        self.supabase_service, output_bucket, doc_filename, pipeline_signature)
+                    fingerprints = page_cache.fingerprint_pages(file, start_page, end_page)
+                    page_profiles = resolve_page_profiles(file, profile, start_page, end_page)
+                    cached_pages = page_cache.load()
+
+                fresh_pages = {}
+                fresh_hashes = {}
+                pages_to_convert = [p for p, fingerprint in fingerprints.items()
+                                    if cached_pages.get(p, {}).get('fingerprint') != fingerprint]
+
+                # A cached image can become needed again (e.g. its duplicate changed),
+                # in which case its page is converted too
+                while True:
+                    with progress.stage('convert', pages=len(pages_to_convert)):
+                        fresh_pages.update(self.convert_pages(
+                            file, pdf_path.name, {p: page_profiles[p] for p in pages_to_convert}, progress))
+
+                    reused_pages = {p: cached_pages[p] for p in fingerprints if p not in fresh_pages}
+                    cached_images = {n: info for page in reused_pages.values()
+                                     for n, info in page['images'].items()}
+
+                    self.logger.info(f'Removing repeated images for {doc_filename}')
+                    with progress.stage('dedup'):
+                        for page in fresh_pages.values():
+                            for image_name, image in page['images'].items():
+                                if image_name not in fresh_hashes:
+                                    fresh_hashes[image_name] = imagehash.phash(image)
+
+                        repeated_filenames = self.get_repeated_images({
+                            **fresh_hashes,
+                            **{n: imagehash.hex_to_hash(info['phash']) for n, info in cached_images.items()},
+                        })
+
+                    pages_to_convert = sorted({
+                        p for p, page in reused_pages.items()
+                        for n, info in page['images'].items()
+                        if self._needs_new_output(info, repeated_filenames, n)
+                    })
+
+                    if not pages_to_convert:
+                        break
+
+                self.logger.info(
+                    f'{len(fresh_pages)} page(s) converted, {len(reused_pages)} page(s) reused for {doc_filename}')
+                record_cache_lookups('page', hits=len(reused_pages), misses=len(fresh_pages))
+
+                images = {n: i for page in fresh_pages.values()
+                          for n, i in page['images'].items() if n not in repeated_filenames}
+
+                self.logger.info(f'Filtering decorative images for {doc_filename}')
+                with progress.stage('filter', images=len(images)):
+                    decorative_images = self.decorative_filter.filter_images(images)
+
+                decorative_report = {
+                    'action': self.decorative_filter.action,
+                    'detected': len(decorative_images),
+                    # Images kept out of captioning, several of them may have shared a batched call
+                    'captions_skipped': len(decorative_images),
+                    'images': decorative_images,
+                }
+
+                if self.decorative_filter.action == 'drop':
+                    images = {n: i for n, i in images.items() if n not in decorative_images}
+
+                self.logger.info(f'Downscaling and recompressing images for {doc_filename}')
+                with progress.stage('process_images', images=len(images)):
+                    processed_images = self.image_processor.process_images(images)
+
                 self.logger.info(f'Adding image descriptions for {doc_filename}')
-                self.append_image_description(md_file_path)
-                
-            self.logger.info(f'Uploading markdown file to Supabase')
-            markdown_upload_path = f"{doc_filename}/{doc_filename}.md"
-            with open(md_file_path, 'rb') as f:
-                markdown_content = f.read()
-            
-            self.supabase_service.client.storage.from_(output_bucket).upload(
-                path=markdown_upload_path,
-                file=markdown_content,
-                file_options={"content-type": "text/markdown"}
-            )
-            self.logger.info(f'Markdown file uploaded to {markdown_upload_path}')
-            
-            artifacts_uploaded = False
-            if artifacts_folder_path.exists() and artifacts_folder_path.is_dir():
-                self.logger.info(f'Uploading artifacts for {doc_filename}')
-                artifacts_upload_path = f"{doc_filename}/{doc_filename}_artifacts"
-                
-                for image_file in artifacts_folder_path.iterdir():
-                    if image_file.is_file():
-                        with open(image_file, 'rb') as f:
-                            image_content = f.read()
-                        
-                        upload_path = f"{artifacts_upload_path}/{image_file.name}"
+                with progress.stage('caption'):
+                    image_descriptions = self.get_image_descriptions(
+                        processed_images, decorative_images, progress)
+
+                # Cached images keep their uploaded artifact and description
+                artifact_references = dict(processed_images)
+                for image_name, info in cached_images.items():
+                    if info['decorative']:
+                        decorative_images.setdefault(image_name, info['decorative'])
+                    if info['artifact_name']:
+                        artifact_references[image_name] = {'artifact_name': info['artifact_name']}
+                    if info['description']:
+                        image_descriptions.setdefault(image_name, info['description'])
+
+                with progress.stage('assemble'):
+                    document = self.assemble_pages(pdf_path.stem, {
+                        **{p: {**page, 'images': {}} for p, page in reused_pages.items()},
+                        **fresh_pages,
+                    })
+
+                    markdown_content = self.post_process_markdown(
+                        document['markdown'],
+                        image_names=document['image_names'],
+                        artifacts_folder=artifacts_folder,
+                        repeated_filenames=repeated_filenames,
+                        processed_images=artifact_references,
+                        decorative_images=decorative_images,
+                        image_descriptions=image_descriptions,
+                    )
+
+                with progress.stage('upload', files=len(processed_images) + 1):
+                    self.logger.info(f'Uploading markdown file to Supabase')
+                    markdown_upload_path = f"{doc_filename}/{doc_filename}.md"
+
+                    self.supabase_service.client.storage.from_(output_bucket).upload(
+                        path=markdown_upload_path,
+                        file=markdown_content,
+                        file_options={"content-type": "text/markdown", "upsert": "true"}
+                    )
+                    self.logger.info(f'Markdown file uploaded to {markdown_upload_path}')
+
+                    artifacts_upload_path = f"{doc_filename}/{artifacts_folder}"
+
+                    if processed_images:
+                        self.logger.info(f'Uploading artifacts for {doc_filename}')
+
+                    for uploaded_artifacts, processed_image in enumerate(processed_images.values()):
+                        upload_path = f"{artifacts_upload_path}/{processed_image['artifact_name']}"
                         self.supabase_service.client.storage.from_(output_bucket).upload(
                             path=upload_path,
-                            file=image_content,
-                            file_options={"content-type": "image/png"}
+                            file=processed_image['artifact'],
+                            file_options={"content-type": processed_image['artifact_media_type'], "upsert": "true"}
                         )
                         self.logger.info(f'Artifact uploaded to {upload_path}')
-                
-                artifacts_uploaded = True
-            
-            self.flush_temp()
-            
-            result = {
-                'status': 'success',
-                'markdown_path': markdown_upload_path,
-                'artifacts_path': f"{doc_filename}/{doc_filename}_artifacts" if artifacts_uploaded else None,
-                'message': f'Successfully processed and uploaded {doc_filename}'
-            }
-            
-            self.logger.info(result['message'])
-            return result
+                        progress.update('upload', uploaded_artifacts + 1, len(processed_images))
+
+                for page_no, page in fresh_pages.items():
+                    cached_pages[page_no] = {
+                        'fingerprint': fingerprints[page_no],
+                        'markdown': page['markdown'],
+                        'image_names': page['image_names'],
+                        'images': {
+                            n: {
+                                'phash': str(fresh_hashes[n]),
+                                'decorative': decorative_images.get(n),
+                                'artifact_name': processed_images[n]['artifact_name'] if n in processed_images else None,
+                                'description': image_descriptions.get(n),
+                            } for n in page['images']
+                        },
+                    }
+
+                page_cache.save(cached_pages)
+
+                if settings.DOCUMENT_PROCESSING_DEBUG_DIR:
+                    self.dump_debug_output(
+                        doc_filename, markdown_content, processed_images)
+
+                result = {
+                    'status': 'success',
+                    'markdown_path': markdown_upload_path,
+                    'artifacts_path': artifacts_upload_path if artifact_references else None,
+                    'decorative_images': decorative_report,
+                    'converted_pages': sorted(fresh_pages),
+                    'reused_pages': sorted(reused_pages),
+                    'page_profiles': dict(Counter(page_profiles[p].value for p in fresh_pages)),
+                    'cached': False,
+                    'peak_rss_mb': round(max(memory_monitor.sample(), memory_monitor.peak_rss_mb)),
+                    'timings': progress.get_timings(),
+                    'message': f'Successfully processed and uploaded {doc_filename}'
+                }
+
+                conversion_cache.save(conversion_key, file_path, result, markdown_content)
+
+                self.logger.info(result['message'])
+                return result
             
         except Exception as e:
             self.logger.error(f'Error during PDF processing and upload: {str(e)}')
-            self.flush_temp()
             return {
                 'status': 'error',
                 'message': f'Failed to process PDF: {str(e)}'
             }
+        finally:
+            if file is not None:
+                file.unlink(missing_ok=True)
 
-    def flush_temp(self):
-        """
-        Deletes all files and subdirectories within a specific folder.
-        """
-        folder_path = "temp/"
-
-        if not os.path.exists(folder_path):
-            self.logger.error(f"The folder '{folder_path}' does not exist.")
-            return
-
-        for item in os.listdir(folder_path):
-            item_path = os.path.join(folder_path, item)
-
-            try:
-                if os.path.isfile(item_path) or os.path.islink(item_path):
-                    os.unlink(item_path)
+    def dump_debug_output(self, doc_filename: str, markdown_content: bytes, processed_images: dict):
+        """Writes the markdown and artifacts of a run to `DOCUMENT_PROCESSING_DEBUG_DIR`."""
+        output_dir = Path(settings.DOCUMENT_PROCESSING_DEBUG_DIR) / doc_filename
+        artifacts_dir = output_dir / f"{doc_filename}_artifacts"
+        artifacts_dir.mkdir(parents=True, exist_ok=True)
 
-                elif os.path.isdir(item_path):
-                    shutil.rmtree(item_path)
+        (output_dir / f"{doc_filename}.md").write_bytes(markdown_content)
 
-            except Exception as e:
-                self.logger.error(f"Failed to delete {item_path}. Reason: {e}")
+        for processed_image in processed_images.values():
+            (artifacts_dir / processed_image['artifact_name']).write_bytes(
+                processed_image['artifact'])
 
-        self.logger.info(f'{folder_path} folder has been flushed')
+        self.logger.info(f'Debug output written to {output_dir}')
 
-    
     def get_markdown_headers(self, bucket: str, path: str):
         file = self.supabase_service.download_file_from_s3(bucket, path)
         file_content = file.decode()
@@ -0,0 +1,137 @@
+import io
+import sys
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from PIL import Image
+
+from app.dependencies import settings
+from app.profiling import profile_in_worker
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+FORMAT_SUFFIXES = {
+    'PNG': '.png',
+    'WEBP': '.webp',
+    'JPEG': '.jpg',
+}
+
+FORMAT_MEDIA_TYPES = {
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+
+class ImageProcessor:
+    """Downscales and recompresses extracted images before captioning and upload.
+
+    Two variants are produced from every image: the caption input sent to the
+    vision model and the artifact stored next to the markdown file. Each one
+    has its own max edge, format and quality settings. Re-encoding through
+    Pillow without passing `exif`/`pnginfo` also strips the image metadata.
+    """
+
+    def __init__(self):
+        self.caption_options = {
+            'max_edge': settings.IMAGE_CAPTION_MAX_EDGE,
+            'format': settings.IMAGE_CAPTION_FORMAT.upper(),
+            'quality': settings.IMAGE_CAPTION_QUALITY,
+        }
+        self.artifact_options = {
+            'max_edge': settings.IMAGE_ARTIFACT_MAX_EDGE,
+            'format': settings.IMAGE_ARTIFACT_FORMAT.upper(),
+            'quality': settings.IMAGE_ARTIFACT_QUALITY,
+        }
+        self.max_workers = settings.IMAGE_PROCESSING_WORKERS
+
+        self.logger = logging.getLogger(__name__)
+
+    def encode(self, image: Image.Image, options: dict) -> bytes:
+        """Resizes an image to the configured max edge and encodes it.
+
+        Args:
+            image (Image.Image): The source image. It is not modified.
+            options (dict): `max_edge`, `format` and `quality` of the variant.
+
+        Returns:
+            bytes: The encoded image.
+        """
+        image = image.copy()
+        image.thumbnail((options['max_edge'], options['max_edge']),
+                        Image.Resampling.LANCZOS)
+
+        image_format = options['format']
+
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            image = image.convert('RGBA')
+
+        buffer = io.BytesIO()
+
+        if image_format == 'PNG':
+            save_options = {'optimize': True}
+        elif image_format == 'WEBP':
+            save_options = {'quality': options['quality'], 'method': 4}
+        else:
+            save_options = {'quality': options['quality'], 'optimize': True}
+
+        image.save(buffer, format=image_format, **save_options)
+
+        return buffer.getvalue()
+
+    def process_image(self, image_name: str, image: Image.Image) -> dict:
+        """Produces the caption input and the stored artifact of a single image.
+
+        Args:
+            image_name (str): The image file name. Its suffix follows the artifact format.
+            image (Image.Image): The extracted image.
+
+        Returns:
+            dict: The processed image, with the keys:
+                - 'artifact_name': The artifact file name
+                - 'artifact': The encoded artifact variant
+                - 'artifact_media_type': The media type of the artifact variant
+                - 'caption_input': The encoded caption variant
+                - 'caption_media_type': The media type of the caption variant
+        """
+        artifact_bytes = self.encode(image, self.artifact_options)
+        caption_bytes = self.encode(image, self.caption_options)
+
+        artifact_name = str(Path(image_name).with_suffix(
+            FORMAT_SUFFIXES[self.artifact_options['format']]))
+
+        self.logger.info(
+            f'{image_name} ({image.width}x{image.height}): artifact {len(artifact_bytes)} bytes, caption input {len(caption_bytes)} bytes')
+
+        return {
+            'artifact_name': artifact_name,
+            'artifact': artifact_bytes,
+            'artifact_media_type': FORMAT_MEDIA_TYPES[self.artifact_options['format']],
+            'caption_input': caption_bytes,
+            'caption_media_type': FORMAT_MEDIA_TYPES[self.caption_options['format']],
+        }
+
+    def process_images(self, images: dict) -> dict:
+        """Processes in-memory images in a thread pool.
+
+        Args:
+            images (dict): PIL images keyed by file name.
+
+        Returns:
+            dict: The `process_image` result of each image, keyed by the
+            original file name.
+        """
+        # Pillow releases the GIL while encoding, so threads scale here
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(
+                profile_in_worker(self.process_image), images.keys(), images.values()))
+
+        return dict(zip(images.keys(), results))
@@ -0,0 +1,107 @@
+import sys
+import json
+import hashlib
+import logging
+import pypdfium2 as pdfium
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+
+class PageCache:
+    """Per-page fingerprints and cached conversion output of a processed document.
+
+    The cache is a JSON manifest stored next to the processed markdown
+    (`<doc>/<doc>_pages.json`). For every converted page it keeps the content
+    fingerprint, the page markdown (with picture placeholders) and, for each
+    picture, its pHash, decorative flag, uploaded artifact name and description.
+    A manifest written with a different pipeline `signature` is ignored.
+    """
+
+    def __init__(self, supabase_service, bucket: str, doc_filename: str, signature: str):
+        self.supabase_service = supabase_service
+        self.bucket = bucket
+        self.manifest_path = f"{doc_filename}/{doc_filename}_pages.json"
+        self.signature = signature
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def fingerprint_pages(pdf_source, start_page: int = None, end_page: int = None) -> dict:
+        """Computes a content fingerprint for each page of a PDF.
+
+        The fingerprint hashes the page size, its text layer, the type and
+        position of every page object and the raw data of embedded images, so
+        any visible change to the page changes it, without rendering the page.
+
+        Args:
+            pdf_source (Path | bytes): The PDF file.
+            start_page (int, optional): The first page (1-based, inclusive).
+            end_page (int, optional): The last page (1-based, inclusive).
+
+        Returns:
+            dict: The hex fingerprint keyed by page number (1-based).
+        """
+        pdf = pdfium.PdfDocument(pdf_source)
+        fingerprints = {}
+
+        try:
+            first_page = start_page or 1
+            last_page = end_page or len(pdf)
+
+            for page_no in range(first_page, min(last_page, len(pdf)) + 1):
+                page = pdf[page_no - 1]
+                digest = hashlib.sha256()
+
+                digest.update(repr(page.get_size()).encode())
+
+                textpage = page.get_textpage()
+                digest.update(textpage.get_text_bounded().encode('utf-8'))
+                textpage.close()
+
+                for page_object in page.get_objects():
+                    bounds = tuple(round(v, 1) for v in page_object.get_pos())
+                    digest.update(repr((page_object.type, bounds)).encode())
+
+                    if isinstance(page_object, pdfium.PdfImage):
+                        digest.update(bytes(page_object.get_data(decode_simple=False)))
+
+                fingerprints[page_no] = digest.hexdigest()
+                page.close()
+        finally:
+            pdf.close()
+
+        return fingerprints
+
+    def load(self) -> dict:
+        """Returns the cached pages keyed by page number, or {} when there is no usable manifest."""
+        try:
+            manifest = json.loads(self.supabase_service.download_file_from_s3(
+                self.bucket, self.manifest_path))
+        except Exception:
+            return {}
+
+        if manifest.get('signature') != self.signature:
+            self.logger.info(
+                f'{self.manifest_path} was written with other pipeline options, ignoring it')
+            return {}
+
+        return {int(page_no): page for page_no, page in manifest.get('pages', {}).items()}
+
+    def save(self, pages: dict):
+        """Uploads the manifest with the given pages, replacing the previous one."""
+        manifest = {
+            'signature': self.signature,
+            'pages': {str(page_no): page for page_no, page in sorted(pages.items())},
+        }
+
+        self.supabase_service.client.storage.from_(self.bucket).upload(
+            path=self.manifest_path,
+            file=json.dumps(manifest).encode('utf-8'),
+            file_options={"content-type": "application/json", "upsert": "true"}
+        )
+
+        self.logger.info(f'Page manifest uploaded to {self.manifest_path}')
@@ -0,0 +1,94 @@
+from enum import Enum
+from typing import TYPE_CHECKING
+
+# Docling and pdfium are imported on first use, so importing the profiles
+# (e.g. by the router) does not load them
+if TYPE_CHECKING:
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+
+
+class PipelineProfile(str, Enum):
+    """Named Docling pipeline configurations, from cheapest to most expensive.
+
+    - text: the embedded text layer only (no OCR, no table structure, no pictures)
+    - tables: text layer plus table structure recognition
+    - digital: text layer, table structure and picture extraction
+    - full: OCR, table structure and picture extraction
+    - auto: `digital` for pages with an embedded text layer, `full` for the others
+    """
+    TEXT = 'text'
+    TABLES = 'tables'
+    DIGITAL = 'digital'
+    FULL = 'full'
+    AUTO = 'auto'
+
+
+# Pages with fewer characters in their text layer are treated as scanned
+MIN_TEXT_LAYER_CHARS = 20
+
+
+def get_pipeline_options(profile: PipelineProfile) -> 'PdfPipelineOptions':
+    """Returns the Docling pipeline options of a concrete (non-auto) profile."""
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+
+    options = PdfPipelineOptions()
+
+    options.do_ocr = profile == PipelineProfile.FULL
+    options.do_table_structure = profile != PipelineProfile.TEXT
+    options.generate_picture_images = profile in (
+        PipelineProfile.DIGITAL, PipelineProfile.FULL)
+    options.images_scale = 2.0 if options.generate_picture_images else 1.0
+
+    return options
+
+
+def detect_text_layer(pdf_source, start_page: int = None, end_page: int = None) -> dict:
+    """Tells, for each page, whether the PDF has an embedded text layer.
+
+    Args:
+        pdf_source (Path | bytes): The PDF file.
+        start_page (int, optional): The first page (1-based, inclusive).
+        end_page (int, optional): The last page (1-based, inclusive).
+
+    Returns:
+        dict: True/False keyed by page number (1-based).
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(pdf_source)
+    text_layer = {}
+
+    try:
+        first_page = start_page or 1
+        last_page = end_page or len(pdf)
+
+        for page_no in range(first_page, min(last_page, len(pdf)) + 1):
+            page = pdf[page_no - 1]
+            textpage = page.get_textpage()
+
+            text_layer[page_no] = len(
+                textpage.get_text_bounded().strip()) >= MIN_TEXT_LAYER_CHARS
+
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+
+    return text_layer
+
+
+def resolve_page_profiles(pdf_source, profile: PipelineProfile, start_page: int = None, end_page: int = None) -> dict:
+    """Picks the concrete profile of every page of the requested range.
+
+    Returns:
+        dict: The PipelineProfile keyed by page number (1-based).
+    """
+    text_layer = detect_text_layer(pdf_source, start_page, end_page)
+
+    if profile != PipelineProfile.AUTO:
+        return {page_no: profile for page_no in text_layer}
+
+    return {
+        page_no: PipelineProfile.DIGITAL if has_text else PipelineProfile.FULL
+        for page_no, has_text in text_layer.items()
+    }
@@ -0,0 +1,82 @@
+import sys
+import time
+import logging
+
+from contextlib import contextmanager
+
+from app.metrics import observe_stage
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+
+class ProgressReporter:
+    """Times the stages of a conversion job and reports them as events.
+
+    Every event is a dict sent to `callback` (when given):
+
+        {'stage': 'convert', 'status': 'progress', 'elapsed': 12.3, 'current': 4, 'total': 10}
+
+    `status` is 'started', 'progress', 'finished' (with the stage `duration`)
+    or 'failed' (with the `error`); `elapsed` counts seconds since the job
+    started. The total time of each stage is kept in `timings` and observed in
+    the `docparser_stage_seconds` histogram. The callback must be cheap and
+    must not raise: it runs inline in the pipeline.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.timings = {}
+        self.started_at = time.perf_counter()
+        self.logger = logging.getLogger(__name__)
+
+    def emit(self, stage: str, status: str, **fields):
+        if self.callback is None:
+            return
+
+        event = {
+            'stage': stage,
+            'status': status,
+            'elapsed': round(time.perf_counter() - self.started_at, 3),
+            **fields,
+        }
+
+        try:
+            self.callback(event)
+        except Exception as e:
+            # Losing a progress event must never fail the conversion
+            self.logger.warning(f'Could not report progress: {e}')
+
+    def update(self, stage: str, current: int, total: int, **fields):
+        self.emit(stage, 'progress', current=current, total=total, **fields)
+
+    @contextmanager
+    def stage(self, name: str, **fields):
+        """Times a stage; a stage run several times accumulates its timing."""
+        self.emit(name, 'started', **fields)
+        start = time.perf_counter()
+
+        try:
+            yield self
+        except Exception as e:
+            self._record(name, start)
+            self.emit(name, 'failed', error=str(e))
+            raise
+
+        duration = self._record(name, start)
+        self.emit(name, 'finished', duration=round(duration, 3))
+
+    def _record(self, name: str, start: float) -> float:
+        duration = time.perf_counter() - start
+        self.timings[name] = self.timings.get(name, 0) + duration
+        observe_stage(name, duration)
+
+        return duration
+
+    def get_timings(self) -> dict:
+        """Returns the time spent in each stage, in seconds."""
+        return {name: round(duration, 3) for name, duration in self.timings.items()}
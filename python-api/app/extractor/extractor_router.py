@@ -1,19 +1,48 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.extractor.extractor_service import ExtractorService
+from fastapi import APIRouter, HTTPException, Query, Response
+from functools import lru_cache
+from contextlib import contextmanager
+from app.profiling import RunProfiler
 import json
 
 router = APIRouter(prefix="/extractor", tags=["extractor"])
 
-extractor_service = ExtractorService()
+
+@lru_cache(maxsize=1)
+def get_extractor_service():
+    """Provides the ExtractorService instance, created (with its Supabase and
+    OpenAI clients) on the first request and reused afterwards."""
+    from app.extractor.extractor_service import ExtractorService
+
+    return ExtractorService()
+
+
+@contextmanager
+def profiled(name: str, enabled: bool, response: Response):
+    """Profiles the enclosed call when `enabled`; the uploaded profile folder
+    is returned in the `X-Profile-Folder` header as `<bucket>/<folder>`."""
+    if not enabled:
+        yield
+        return
+
+    profiler = RunProfiler(name, get_extractor_service().supabase_service)
+
+    with profiler:
+        yield
+
+    if profiler.artifacts:
+        folder = profiler.artifacts['profile_prof'].rpartition('/')[0]
+        response.headers['X-Profile-Folder'] = f"{profiler.artifacts['bucket']}/{folder}"
 
 
 @router.get("/base-entities")
 def get_base_entities(
+    response: Response,
     file_bucket: str = Query(..., description="The S3 bucket name"),
     file_path: str = Query(..., description="The S3 file path"),
     header_filter: str = Query(None,
                                description="Header filters which contains relevant data"),
-    model: str = Query("deepseek-chat", description="The model to use for extraction")
+    model: str = Query("deepseek-chat", description="The model to use for extraction"),
+    profiling: bool = Query(False, description="Profile this run (see the X-Profile-Folder header)")
 ):
     """
     Extract base entities from the document.
@@ -22,8 +51,9 @@ def get_base_entities(
         header_filter = json.loads(header_filter)
 
     try:
-        result = extractor_service.populate_base_entities(
-            file_bucket, file_path, header_filter, model)
+        with profiled('base-entities', profiling, response):
+            result = get_extractor_service().populate_base_entities(
+                file_bucket, file_path, header_filter, model)
         return json.loads(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -31,6 +61,7 @@ def get_base_entities(
 
 @router.get("/exam-subtopics/{exam_id}")
 def get_exam_subtopics(
+    response: Response,
     exam_id: str,
     file_bucket: str = Query(..., description="The S3 bucket name"),
     file_key: str = Query(..., description="The S3 file key"),
@@ -38,7 +69,8 @@ def get_exam_subtopics(
                                   description="JSON string of identified exams"),
     header_filter: str = Query(None,
                                description="Header filters which contains relevant data"),
-    model: str = Query("deepseek-chat", description="The model to use for extraction")
+    model: str = Query("deepseek-chat", description="The model to use for extraction"),
+    profiling: bool = Query(False, description="Profile this run (see the X-Profile-Folder header)")
 ):
     """
     Extract exam subtopics for a specific exam index.
@@ -48,8 +80,9 @@ def get_exam_subtopics(
 
     try:
         identified_exams_parsed = json.loads(identified_exams)
-        result = extractor_service.populate_exam_subtopics(
-            file_bucket, file_key, identified_exams_parsed, exam_id, header_filter, model)
+        with profiled('exam-subtopics', profiling, response):
+            result = get_extractor_service().populate_exam_subtopics(
+                file_bucket, file_key, identified_exams_parsed, exam_id, header_filter, model)
         return json.loads(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -57,6 +90,7 @@ def get_exam_subtopics(
 
 @router.get("/job-roles/{exam_id}")
 def get_job_roles(
+    response: Response,
     exam_id: str,
     file_bucket: str = Query(..., description="The S3 bucket name"),
     file_key: str = Query(..., description="The S3 file key"),
@@ -64,7 +98,8 @@ def get_job_roles(
                                   description="JSON string of identified exams"),
     header_filter: str = Query(None,
                                description="Header filters which contains relevant data"),
-    model: str = Query("deepseek-chat", description="The model to use for extraction")
+    model: str = Query("deepseek-chat", description="The model to use for extraction"),
+    profiling: bool = Query(False, description="Profile this run (see the X-Profile-Folder header)")
 ):
     """
     Extract job roles for a specific exam index.
@@ -74,8 +109,9 @@ def get_job_roles(
 
     try:
         identified_exams_parsed = json.loads(identified_exams)
-        result = extractor_service.populate_job_roles(
-            file_bucket, file_key, identified_exams_parsed, exam_id, header_filter, model)
+        with profiled('job-roles', profiling, response):
+            result = get_extractor_service().populate_job_roles(
+                file_bucket, file_key, identified_exams_parsed, exam_id, header_filter, model)
         return json.loads(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -83,6 +119,7 @@ def get_job_roles(
 
 @router.get("/offices/{exam_id}")
 def get_offices(
+    response: Response,
     exam_id: str,
     file_bucket: str = Query(..., description="The S3 bucket name"),
     file_key: str = Query(..., description="The S3 file key"),
@@ -90,7 +127,8 @@ def get_offices(
                                   description="JSON string of identified exams"),
     header_filter: str = Query(None,
                                description="Header filters which contains relevant data"),
-    model: str = Query("deepseek-chat", description="The model to use for extraction")
+    model: str = Query("deepseek-chat", description="The model to use for extraction"),
+    profiling: bool = Query(False, description="Profile this run (see the X-Profile-Folder header)")
 ):
     """
     Extract offices for a specific exam index.
@@ -100,8 +138,9 @@ def get_offices(
 
     try:
         identified_exams_parsed = json.loads(identified_exams)
-        result = extractor_service.populate_offices(
-            file_bucket, file_key, identified_exams_parsed, exam_id, header_filter, model)
+        with profiled('offices', profiling, response):
+            result = get_extractor_service().populate_offices(
+                file_bucket, file_key, identified_exams_parsed, exam_id, header_filter, model)
         return json.loads(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,26 +1,217 @@
+import io
+import json
+import hashlib
+import logging
+import mimetypes
+import sys
+
+from datetime import datetime, timezone
 from google import genai
+from google.genai import types
 from pathlib import Path
+from pydantic import BaseModel
 from app.rate_limiter import RateLimiter
+from app.gemini_api.token_estimator import TokenEstimator
+from app.metrics import llm_call
+from app.llm_cassette import get_cassette
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+
+class ImageDescription(BaseModel):
+    image_id: str
+    description: str
 
 
 class GeminiApiService:
+    # Images up to this size are sent inline (the whole request is capped at 20MB)
+    INLINE_IMAGE_MAX_BYTES = 4 * 1024 * 1024
+    MAX_IMAGES_PER_REQUEST = 8
+
+    # Uploaded files keyed by content hash, shared by every instance of the process
+    _uploaded_files: dict = {}
+
     def __init__(self):
+        self.model = 'gemini-2.5-flash'
         self.client = genai.Client()
         self.rate_limiter = RateLimiter()
+        self.token_estimator = TokenEstimator(model=self.model)
+        self.cassette = get_cassette('gemini')
+        self.logger = logging.getLogger(__name__)
 
     def generate_image_description(self, image_path: Path):
-        image_file = self.client.files.upload(file=image_path)
         prompt = 'The following image has been extracted from an PDF file. It may be a relevant image that corresponds to part of the document`s content or it may be (less likely) a page decoration or a useless artifact. Please generate a brief description of the image. Only describe what is in the image. DO NOT try to predict what it means or in what context it is inserted.'
 
-        contents = [prompt, image_file]
+        def send():
+            contents = [prompt, self._get_image_part(image_path)]
 
-        token_count = self.client.models.count_tokens(
-            model='gemini-2.5-flash', contents=contents)
+            # Estimated locally, the remote count_tokens call costs a full round trip
+            raw_token_estimate = self.token_estimator.estimate_raw(
+                prompt, [image_path])
 
-        self.rate_limiter.wait_for_slot_gemini_free_tier(
-            tokens=token_count.total_tokens)
+            self.rate_limiter.wait_for_slot_gemini_free_tier(
+                tokens=self.token_estimator.correct(raw_token_estimate))
+
+            with llm_call('gemini', self.model) as call:
+                response = self.client.models.generate_content(
+                    model=self.model, contents=contents)
+                self._set_usage(call, response)
+
+            self.token_estimator.calibrate(
+                raw_token_estimate, response.usage_metadata)
+
+            return response
+
+        # Replayed responses skip the upload, the rate limiter and the request
+        request = {'model': self.model, 'contents': [prompt, self._read_image(image_path)]}
+        response = self.cassette.call(request, send, types.GenerateContentResponse)
 
-        response = self.client.models.generate_content(
-            model='gemini-2.5-flash', contents=contents)
-        
         return response.text
+
+    def generate_image_descriptions(self, image_paths: list) -> dict:
+        """Describes several images, packing up to `MAX_IMAGES_PER_REQUEST` per request.
+
+        Each image is introduced by its id in the prompt and the model answers
+        with a JSON array of `{image_id, description}` objects. Images the model
+        skipped in its answer are described individually.
+
+        Args:
+            image_paths (list[Path]): The images to describe. The file name is
+                used as the image id.
+
+        Returns:
+            dict: The descriptions keyed by image file name.
+        """
+        descriptions = {}
+
+        for i in range(0, len(image_paths), self.MAX_IMAGES_PER_REQUEST):
+            batch = [Path(p) for p in image_paths[i:i + self.MAX_IMAGES_PER_REQUEST]]
+            descriptions.update(self._describe_batch(batch))
+
+        for image_path in image_paths:
+            image_path = Path(image_path)
+
+            if image_path.name not in descriptions:
+                self.logger.info(
+                    f'{image_path.name} missing from the batched answer, describing it alone')
+                descriptions[image_path.name] = self.generate_image_description(
+                    image_path)
+
+        return descriptions
+
+    def _describe_batch(self, image_paths: list) -> dict:
+        prompt = f'The following {len(image_paths)} images have been extracted from an PDF file. Each image is preceded by its id. Each one may be a relevant image that corresponds to part of the document`s content or it may be (less likely) a page decoration or a useless artifact. For every image, generate a brief description of the image. Only describe what is in the image. DO NOT try to predict what it means or in what context it is inserted. Answer with one entry per image id.'
+
+        def send():
+            contents = [prompt]
+            for image_path in image_paths:
+                contents.append(f'Image id: {image_path.name}')
+                contents.append(self._get_image_part(image_path))
+
+            raw_token_estimate = self.token_estimator.estimate_raw(
+                '\n'.join(c for c in contents if isinstance(c, str)), image_paths)
+
+            self.rate_limiter.wait_for_slot_gemini_free_tier(
+                tokens=self.token_estimator.correct(raw_token_estimate))
+
+            with llm_call('gemini', self.model) as call:
+                response = self.client.models.generate_content(
+                    model=self.model,
+                    contents=contents,
+                    config=types.GenerateContentConfig(
+                        response_mime_type='application/json',
+                        response_schema=list[ImageDescription],
+                    ))
+                self._set_usage(call, response)
+
+            self.token_estimator.calibrate(
+                raw_token_estimate, response.usage_metadata)
+
+            return response
+
+        request = {
+            'model': self.model,
+            'contents': [prompt] + [[f'Image id: {p.name}', self._read_image(p)] for p in image_paths],
+            'response_schema': 'list[ImageDescription]',
+        }
+        response = self.cassette.call(request, send, types.GenerateContentResponse)
+
+        try:
+            answer = json.loads(response.text)
+        except (json.JSONDecodeError, TypeError):
+            self.logger.error('Batched description answer is not a valid JSON')
+            return {}
+
+        if not isinstance(answer, list):
+            self.logger.error('Batched description answer is not a list')
+            return {}
+
+        requested_ids = {p.name for p in image_paths}
+
+        return {
+            item['image_id']: item['description']
+            for item in answer
+            if isinstance(item, dict) and item.get('image_id') in requested_ids
+            and isinstance(item.get('description'), str)
+        }
+
+    def _set_usage(self, call, response):
+        if response.usage_metadata is not None:
+            call.set_usage(response.usage_metadata.prompt_token_count,
+                           response.usage_metadata.candidates_token_count)
+
+    def _read_image(self, image_path: Path) -> bytes:
+        with open(image_path, 'rb') as f:
+            return f.read()
+
+    def _get_image_part(self, image_path: Path):
+        """Returns the image as an inline part, or as a reused upload when it is large."""
+        data = self._read_image(image_path)
+
+        mime_type = mimetypes.guess_type(str(image_path))[0] or 'image/png'
+
+        if len(data) <= self.INLINE_IMAGE_MAX_BYTES:
+            return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+        return self._get_or_upload_file(data, mime_type)
+
+    def _get_or_upload_file(self, data: bytes, mime_type: str):
+        # The content hash doubles as the remote file name, so other processes
+        # (and later documents) find the same upload instead of creating a new one
+        digest = hashlib.sha256(data).hexdigest()
+        file_name = f'files/{digest[:40]}'
+
+        cached_file = self._uploaded_files.get(digest)
+        if cached_file is not None and not self._is_expired(cached_file):
+            return cached_file
+
+        try:
+            remote_file = self.client.files.get(name=file_name)
+
+            if not self._is_expired(remote_file):
+                self._uploaded_files[digest] = remote_file
+                return remote_file
+        except Exception:
+            pass
+
+        uploaded_file = self.client.files.upload(
+            file=io.BytesIO(data),
+            config=types.UploadFileConfig(name=file_name, mime_type=mime_type))
+        self._uploaded_files[digest] = uploaded_file
+
+        self.logger.info(f'Uploaded {file_name} ({len(data)} bytes)')
+
+        return uploaded_file
+
+    def _is_expired(self, file) -> bool:
+        expiration_time = getattr(file, 'expiration_time', None)
+
+        if expiration_time is None:
+            return False
+
+        return expiration_time <= datetime.now(timezone.utc)
@@ -0,0 +1,127 @@
+import math
+import logging
+import sys
+
+from collections import deque
+from pathlib import Path
+from PIL import Image
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+
+class TokenEstimator:
+    """Estimates Gemini prompt tokens locally instead of calling `count_tokens`.
+
+    Image tokens follow the published Gemini accounting: an image whose sides
+    are both at most 384px costs a flat 258 tokens, larger images are tiled
+    into 768x768 crops and each tile costs 258 tokens. Text is counted with the
+    SDK's local tokenizer when it is available and falls back to a
+    characters-per-token heuristic otherwise.
+
+    The raw estimate is multiplied by a correction factor that is recalibrated
+    every `calibration_interval` generations against the `prompt_token_count`
+    reported back in the response `usage_metadata`.
+    """
+
+    SMALL_IMAGE_MAX_EDGE = 384
+    IMAGE_TILE_SIZE = 768
+    TOKENS_PER_IMAGE_TILE = 258
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, model: str, calibration_interval: int = 10):
+        self.model = model
+        self.calibration_interval = calibration_interval
+        self.correction = 1.0
+
+        self._samples = deque(maxlen=calibration_interval)
+        self._pending_samples = 0
+        self._tokenizer = self._load_local_tokenizer()
+
+        self.logger = logging.getLogger(__name__)
+
+    def _load_local_tokenizer(self):
+        try:
+            from google.genai.local_tokenizer import LocalTokenizer
+
+            return LocalTokenizer(model_name=self.model)
+        except Exception:
+            return None
+
+    def estimate_text_tokens(self, text: str) -> int:
+        if self._tokenizer is not None:
+            try:
+                return self._tokenizer.count_tokens(text).total_tokens
+            except Exception:
+                # The local tokenizer downloads its vocabulary on first use, so
+                # offline containers fall back to the heuristic permanently.
+                self._tokenizer = None
+
+        return math.ceil(len(text) / self.CHARS_PER_TOKEN)
+
+    def estimate_image_tokens(self, width: int, height: int) -> int:
+        if width <= self.SMALL_IMAGE_MAX_EDGE and height <= self.SMALL_IMAGE_MAX_EDGE:
+            return self.TOKENS_PER_IMAGE_TILE
+
+        tiles = math.ceil(width / self.IMAGE_TILE_SIZE) * \
+            math.ceil(height / self.IMAGE_TILE_SIZE)
+
+        return tiles * self.TOKENS_PER_IMAGE_TILE
+
+    def estimate(self, prompt: str, images: list = None) -> int:
+        """Estimates the prompt tokens of a text prompt plus images.
+
+        Args:
+            prompt (str): The text part of the request.
+            images (list, optional): Image paths or PIL images. Only the image
+                header is read to get the dimensions.
+
+        Returns:
+            int: The calibrated token estimate.
+        """
+        return self.correct(self.estimate_raw(prompt, images))
+
+    def correct(self, raw_tokens: int) -> int:
+        return math.ceil(raw_tokens * self.correction)
+
+    def estimate_raw(self, prompt: str, images: list = None) -> int:
+        tokens = self.estimate_text_tokens(prompt)
+
+        for image in images or []:
+            if isinstance(image, Image.Image):
+                width, height = image.size
+            else:
+                with Image.open(Path(image)) as img:
+                    width, height = img.size
+
+            tokens += self.estimate_image_tokens(width, height)
+
+        return tokens
+
+    def calibrate(self, raw_estimate: int, usage_metadata) -> None:
+        """Records the real prompt token count of a finished generation.
+
+        Args:
+            raw_estimate (int): The uncorrected estimate (`estimate_raw`) of the request.
+            usage_metadata: The `usage_metadata` of the Gemini response.
+        """
+        actual_tokens = getattr(usage_metadata, 'prompt_token_count', None)
+
+        if not actual_tokens or raw_estimate <= 0:
+            return
+
+        self._samples.append(actual_tokens / raw_estimate)
+        self._pending_samples += 1
+
+        if self._pending_samples < self.calibration_interval:
+            return
+
+        self.correction = sum(self._samples) / len(self._samples)
+        self._pending_samples = 0
+
+        self.logger.info(
+            f'Token estimator recalibrated: correction factor = {self.correction:.3f}')
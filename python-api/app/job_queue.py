@@ -0,0 +1,573 @@
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import logging
+
+from abc import ABC, abstractmethod
+from contextlib import closing
+
+from app.dependencies import settings
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+
+class LeaseLostError(Exception):
+    """Raised when a worker reports on a job whose lease it no longer holds."""
+    pass
+
+
+class JobQueue(ABC):
+    """Work queue shared by the conversion workers of every node.
+
+    A worker `claim`s the oldest available job, which leases it for
+    `lease_seconds`, and keeps the lease alive with `heartbeat` while it runs.
+    A job whose lease expires (the worker crashed or its node went away) is put
+    back in the queue. A failed job is retried with exponential backoff until
+    it has been attempted `max_attempts` times, then it is dead-lettered: kept
+    with its last error until it is retried by hand.
+
+    Job states: queued -> running -> done | queued (retry) | dead.
+    """
+
+    def __init__(self, max_attempts: int = 3, retry_backoff: float = 30):
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.logger = logging.getLogger(__name__)
+
+    def retry_delay(self, attempts: int) -> float:
+        return self.retry_backoff * 2 ** (attempts - 1)
+
+    @abstractmethod
+    def enqueue(self, payload: dict, max_attempts: int = None) -> str:
+        ...
+
+    @abstractmethod
+    def claim(self, worker_id: str, lease_seconds: float) -> dict | None:
+        """Leases the next available job, returns None when there is none."""
+        ...
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float):
+        """Extends the lease of a running job, raises LeaseLostError if it expired."""
+        ...
+
+    @abstractmethod
+    def complete(self, job_id: str, worker_id: str, result: dict):
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: str, worker_id: str, error: str) -> str:
+        """Records a failed attempt, returns the new state ('queued' or 'dead')."""
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def dead_letters(self) -> list:
+        ...
+
+    @abstractmethod
+    def retry_dead_letter(self, job_id: str) -> bool:
+        """Puts a dead-lettered job back in the queue with a fresh attempt count."""
+        ...
+
+    @abstractmethod
+    def add_progress(self, job_id: str, event: dict):
+        """Appends a progress event (see ProgressReporter) to a job."""
+        ...
+
+    @abstractmethod
+    def count_by_status(self) -> dict:
+        """Returns the number of queued, running and dead jobs."""
+        ...
+
+    @abstractmethod
+    def get_progress(self, job_id: str, start: int = 0) -> list:
+        """Returns the progress events of a job, from the `start`-th one."""
+        ...
+
+
+class SQLiteJobQueue(JobQueue):
+    """JobQueue stored in a SQLite database.
+
+    Every state change runs in an immediate (write-locked) transaction, so
+    several worker processes, or containers sharing the database file on a
+    local volume, can claim jobs concurrently. It is also the stand-in broker
+    for running the whole pipeline on a single machine.
+    """
+
+    # Progress events of finished jobs are dropped a day after they finished
+    progress_ttl = 86400
+
+    def __init__(self, db_path: str = 'jobs.db', **kwargs):
+        super().__init__(**kwargs)
+        self.db_path = db_path
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+
+        return conn
+
+    def _init_db(self):
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    available_at REAL NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, available_at)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS job_progress (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    event TEXT NOT NULL
+                )
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_job_progress ON job_progress(job_id, seq)')
+
+    def _transaction(self, conn: sqlite3.Connection, operation):
+        conn.execute('BEGIN IMMEDIATE')
+
+        try:
+            value = operation()
+            conn.execute('COMMIT')
+            return value
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float):
+        """Gives back the jobs of workers that stopped sending heartbeats."""
+        expired = conn.execute(
+            "SELECT id, attempts, max_attempts FROM jobs WHERE status = 'running' AND lease_expires_at < ?",
+            (now,)
+        ).fetchall()
+
+        for job in expired:
+            status = 'dead' if job['attempts'] >= job['max_attempts'] else 'queued'
+            conn.execute(
+                '''UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL,
+                   available_at = ?, error = 'lease expired', updated_at = ? WHERE id = ?''',
+                (status, now, now, job['id'])
+            )
+
+            self.logger.warning(f"Lease of job {job['id']} expired, job {status}")
+
+    def _prune_progress(self, conn: sqlite3.Connection, now: float):
+        """Deletes the progress events of the jobs finished more than `progress_ttl` ago."""
+        conn.execute(
+            '''DELETE FROM job_progress WHERE job_id IN (
+                   SELECT id FROM jobs WHERE status IN ('done', 'dead') AND updated_at < ?)''',
+            (now - self.progress_ttl,)
+        )
+
+    def enqueue(self, payload: dict, max_attempts: int = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                '''INSERT INTO jobs (id, payload, status, max_attempts, available_at, created_at, updated_at)
+                   VALUES (?, ?, 'queued', ?, ?, ?, ?)''',
+                (job_id, json.dumps(payload), max_attempts or self.max_attempts, now, now, now)
+            )
+
+        return job_id
+
+    def claim(self, worker_id: str, lease_seconds: float) -> dict | None:
+        now = time.time()
+
+        with closing(self._connect()) as conn:
+            def claim_next():
+                self._requeue_expired(conn, now)
+
+                job = conn.execute(
+                    '''SELECT id FROM jobs WHERE status = 'queued' AND available_at <= ?
+                       ORDER BY available_at, created_at LIMIT 1''',
+                    (now,)
+                ).fetchone()
+
+                if job is None:
+                    return None
+
+                conn.execute(
+                    '''UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?,
+                       lease_expires_at = ?, updated_at = ? WHERE id = ?''',
+                    (worker_id, now + lease_seconds, now, job['id'])
+                )
+
+                return job['id']
+
+            job_id = self._transaction(conn, claim_next)
+
+        return self.get(job_id) if job_id is not None else None
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float):
+        now = time.time()
+
+        with closing(self._connect()) as conn:
+            updated = conn.execute(
+                '''UPDATE jobs SET lease_expires_at = ?, updated_at = ?
+                   WHERE id = ? AND status = 'running' AND lease_owner = ?''',
+                (now + lease_seconds, now, job_id, worker_id)
+            ).rowcount
+
+        if not updated:
+            raise LeaseLostError(f'Job {job_id} is no longer leased by {worker_id}')
+
+    def complete(self, job_id: str, worker_id: str, result: dict):
+        now = time.time()
+
+        with closing(self._connect()) as conn:
+            updated = conn.execute(
+                '''UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_owner = NULL,
+                   lease_expires_at = NULL, updated_at = ?
+                   WHERE id = ? AND status = 'running' AND lease_owner = ?''',
+                (json.dumps(result), now, job_id, worker_id)
+            ).rowcount
+
+            # Not this job's, its client may still be reading them
+            self._prune_progress(conn, now)
+
+        if not updated:
+            raise LeaseLostError(f'Job {job_id} is no longer leased by {worker_id}')
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> str:
+        now = time.time()
+
+        with closing(self._connect()) as conn:
+            def record_failure():
+                job = conn.execute(
+                    "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = 'running' AND lease_owner = ?",
+                    (job_id, worker_id)
+                ).fetchone()
+
+                if job is None:
+                    raise LeaseLostError(f'Job {job_id} is no longer leased by {worker_id}')
+
+                if job['attempts'] >= job['max_attempts']:
+                    status, available_at = 'dead', now
+                else:
+                    status, available_at = 'queued', now + self.retry_delay(job['attempts'])
+
+                conn.execute(
+                    '''UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires_at = NULL,
+                       available_at = ?, updated_at = ? WHERE id = ?''',
+                    (status, error, available_at, now, job_id)
+                )
+
+                if status == 'dead':
+                    self._prune_progress(conn, now)
+
+                return status
+
+            return self._transaction(conn, record_failure)
+
+    def _to_dict(self, row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+        return self._to_dict(row) if row is not None else None
+
+    def dead_letters(self) -> list:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'dead' ORDER BY updated_at").fetchall()
+
+        return [self._to_dict(row) for row in rows]
+
+    def retry_dead_letter(self, job_id: str) -> bool:
+        now = time.time()
+
+        with closing(self._connect()) as conn:
+            updated = conn.execute(
+                '''UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, updated_at = ?
+                   WHERE id = ? AND status = 'dead' ''',
+                (now, now, job_id)
+            ).rowcount
+
+        return bool(updated)
+
+    def add_progress(self, job_id: str, event: dict):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT INTO job_progress (job_id, event) VALUES (?, ?)', (job_id, json.dumps(event)))
+
+    def count_by_status(self) -> dict:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE status != 'done' GROUP BY status").fetchall()
+
+        return {status: count for status, count in rows}
+
+    def get_progress(self, job_id: str, start: int = 0) -> list:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT event FROM job_progress WHERE job_id = ? ORDER BY seq LIMIT -1 OFFSET ?',
+                (job_id, start)
+            ).fetchall()
+
+        return [json.loads(row['event']) for row in rows]
+
+
+# Moves the expired leases back to the queue (or to the dead letters), then
+# leases the oldest available job.
+# KEYS: queued zset, leases zset, dead zset. ARGV: now, worker id, lease expiry, job key prefix
+REDIS_CLAIM_SCRIPT = """
+local now = tonumber(ARGV[1])
+
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)) do
+    local key = ARGV[4] .. id
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('HDEL', key, 'lease_owner')
+
+    if tonumber(redis.call('HGET', key, 'attempts')) >= tonumber(redis.call('HGET', key, 'max_attempts')) then
+        redis.call('HSET', key, 'status', 'dead', 'error', 'lease expired', 'updated_at', now)
+        redis.call('ZADD', KEYS[3], now, id)
+    else
+        redis.call('HSET', key, 'status', 'queued', 'error', 'lease expired', 'updated_at', now)
+        redis.call('ZADD', KEYS[1], now, id)
+    end
+end
+
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, 1)
+
+if #ids == 0 then
+    return false
+end
+
+local id = ids[1]
+local key = ARGV[4] .. id
+redis.call('ZREM', KEYS[1], id)
+redis.call('ZADD', KEYS[2], ARGV[3], id)
+redis.call('HINCRBY', key, 'attempts', 1)
+redis.call('HSET', key, 'status', 'running', 'lease_owner', ARGV[2], 'updated_at', now)
+
+return id
+"""
+
+# Applies a state change only if the worker still holds the lease.
+# KEYS: job hash, leases zset, target zset (or the leases zset when unused).
+# ARGV: job id, worker id, now, new status, lease expiry or target score, field/value pairs...
+REDIS_UPDATE_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'running' or redis.call('HGET', KEYS[1], 'lease_owner') ~= ARGV[2] then
+    return 0
+end
+
+if ARGV[4] == 'running' then
+    redis.call('ZADD', KEYS[2], ARGV[5], ARGV[1])
+else
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('HDEL', KEYS[1], 'lease_owner')
+
+    if KEYS[3] ~= KEYS[2] then
+        redis.call('ZADD', KEYS[3], ARGV[5], ARGV[1])
+    end
+end
+
+redis.call('HSET', KEYS[1], 'status', ARGV[4], 'updated_at', ARGV[3])
+
+for i = 6, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+
+return 1
+"""
+
+# Moves a dead letter back to the queue with a fresh attempt count, so two
+# concurrent retries cannot both requeue it (or lose it in between).
+# KEYS: dead zset, queued zset, job hash. ARGV: job id, now.
+REDIS_RETRY_DEAD_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+
+redis.call('HSET', KEYS[3], 'status', 'queued', 'attempts', 0, 'updated_at', ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+
+return 1
+"""
+
+
+class RedisJobQueue(JobQueue):
+    """JobQueue stored in a Redis-compatible broker (Redis, Valkey, KeyDB...).
+
+    Jobs are hashes under `<prefix>:job:<id>`; the queued jobs (scored by the
+    time they become available), the leases (scored by their expiry) and the
+    dead letters are sorted sets. Claims and lease-guarded updates run as Lua
+    scripts, so they are atomic across nodes. Requires the `redis` package.
+    """
+
+    # Progress events are dropped a day after the last one
+    progress_ttl = 86400
+
+    def __init__(self, url: str, prefix: str = 'conversion', **kwargs):
+        super().__init__(**kwargs)
+
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.queued_key = f'{prefix}:queued'
+        self.leases_key = f'{prefix}:leases'
+        self.dead_key = f'{prefix}:dead'
+
+        self._claim = self.client.register_script(REDIS_CLAIM_SCRIPT)
+        self._update = self.client.register_script(REDIS_UPDATE_SCRIPT)
+        self._retry_dead = self.client.register_script(REDIS_RETRY_DEAD_SCRIPT)
+
+    def _job_key(self, job_id: str) -> str:
+        return f'{self.prefix}:job:{job_id}'
+
+    def enqueue(self, payload: dict, max_attempts: int = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+
+        pipeline = self.client.pipeline()
+        pipeline.hset(self._job_key(job_id), mapping={
+            'id': job_id,
+            'payload': json.dumps(payload),
+            'status': 'queued',
+            'attempts': 0,
+            'max_attempts': max_attempts or self.max_attempts,
+            'created_at': now,
+            'updated_at': now,
+        })
+        pipeline.zadd(self.queued_key, {job_id: now})
+        pipeline.execute()
+
+        return job_id
+
+    def claim(self, worker_id: str, lease_seconds: float) -> dict | None:
+        now = time.time()
+        job_id = self._claim(
+            keys=[self.queued_key, self.leases_key, self.dead_key],
+            args=[now, worker_id, now + lease_seconds, f'{self.prefix}:job:']
+        )
+
+        return self.get(job_id) if job_id else None
+
+    def _update_leased(self, job_id: str, worker_id: str, status: str, score: float, target_key: str = None, **fields) -> bool:
+        args = [job_id, worker_id, time.time(), status, score]
+
+        for field, value in fields.items():
+            args.extend([field, value])
+
+        return bool(self._update(
+            keys=[self._job_key(job_id), self.leases_key, target_key or self.leases_key],
+            args=args
+        ))
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float):
+        if not self._update_leased(job_id, worker_id, 'running', time.time() + lease_seconds):
+            raise LeaseLostError(f'Job {job_id} is no longer leased by {worker_id}')
+
+    def complete(self, job_id: str, worker_id: str, result: dict):
+        if not self._update_leased(job_id, worker_id, 'done', 0, result=json.dumps(result), error=''):
+            raise LeaseLostError(f'Job {job_id} is no longer leased by {worker_id}')
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> str:
+        job = self.get(job_id)
+        now = time.time()
+
+        if job is None:
+            raise LeaseLostError(f'Job {job_id} is no longer leased by {worker_id}')
+
+        if job['attempts'] >= job['max_attempts']:
+            status, target_key, score = 'dead', self.dead_key, now
+        else:
+            status, target_key, score = 'queued', self.queued_key, now + self.retry_delay(job['attempts'])
+
+        if not self._update_leased(job_id, worker_id, status, score, target_key, error=error):
+            raise LeaseLostError(f'Job {job_id} is no longer leased by {worker_id}')
+
+        return status
+
+    def get(self, job_id: str) -> dict | None:
+        job = self.client.hgetall(self._job_key(job_id))
+
+        if not job:
+            return None
+
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job.get('result') else None
+        job['attempts'] = int(job['attempts'])
+        job['max_attempts'] = int(job['max_attempts'])
+
+        return job
+
+    def dead_letters(self) -> list:
+        return [self.get(job_id) for job_id in self.client.zrange(self.dead_key, 0, -1)]
+
+    def retry_dead_letter(self, job_id: str) -> bool:
+        return bool(self._retry_dead(
+            keys=[self.dead_key, self.queued_key, self._job_key(job_id)],
+            args=[job_id, time.time()]
+        ))
+
+    def add_progress(self, job_id: str, event: dict):
+        key = f'{self.prefix}:progress:{job_id}'
+
+        pipeline = self.client.pipeline()
+        pipeline.rpush(key, json.dumps(event))
+        pipeline.expire(key, self.progress_ttl)
+        pipeline.execute()
+
+    def count_by_status(self) -> dict:
+        pipeline = self.client.pipeline()
+        pipeline.zcard(self.queued_key)
+        pipeline.zcard(self.leases_key)
+        pipeline.zcard(self.dead_key)
+        queued, running, dead = pipeline.execute()
+
+        return {'queued': queued, 'running': running, 'dead': dead}
+
+    def get_progress(self, job_id: str, start: int = 0) -> list:
+        return [json.loads(event) for event in
+                self.client.lrange(f'{self.prefix}:progress:{job_id}', start, -1)]
+
+
+def get_job_queue(url: str) -> JobQueue:
+    """Creates the JobQueue of a broker URL: `sqlite:///<path>` or `redis://...`."""
+    options = dict(max_attempts=settings.CONVERSION_MAX_ATTEMPTS,
+                   retry_backoff=settings.CONVERSION_RETRY_BACKOFF)
+
+    if url.startswith('sqlite:///'):
+        return SQLiteJobQueue(url[len('sqlite:///'):], **options)
+
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisJobQueue(url, **options)
+
+    raise ValueError(f'Unsupported job queue URL: {url}')
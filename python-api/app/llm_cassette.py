@@ -0,0 +1,157 @@
+import sys
+import json
+import hashlib
+import logging
+import threading
+
+from pathlib import Path
+from datetime import datetime, timezone
+
+from app.dependencies import settings
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+MODES = ('off', 'record', 'replay', 'auto')
+
+# One cassette per provider and process, shared by every service instance
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+class CassetteMissError(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+    pass
+
+
+class LLMCassette:
+    """Records LLM responses and replays them by request hash.
+
+    Each provider has one cassette, `<LLM_CASSETTE_DIR>/<provider>.jsonl`,
+    with one compact JSON line per recorded request:
+
+        {"key": "<sha256 of the request>", "model": "deepseek-chat", "recorded_at": "...", "response": {...}}
+
+    Only the hash of the request is stored, the response is the provider SDK
+    object dumped as JSON. `LLM_CASSETTE_MODE` picks the behaviour:
+
+    - off: every request goes to the provider (default)
+    - record: every request goes to the provider and its response is recorded
+    - replay: responses come from the cassette only, a request that was never
+      recorded raises CassetteMissError
+    - auto: replays the recorded requests and records the others
+
+    The SDK clients are still created when replaying, so the API keys must be
+    set (to any value).
+    """
+
+    def __init__(self, provider: str, mode: str = None, directory: str = None):
+        self.provider = provider
+        self.mode = mode or settings.LLM_CASSETTE_MODE
+        self.path = Path(directory or settings.LLM_CASSETTE_DIR) / f'{provider}.jsonl'
+
+        if self.mode not in MODES:
+            raise ValueError(f'LLM_CASSETTE_MODE must be one of {", ".join(MODES)}, not {self.mode!r}')
+
+        self._responses = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def request_key(request: dict) -> str:
+        """Hashes a request: its JSON with sorted keys (bytes are hashed first)."""
+        canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=_canonical_value)
+
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _load(self) -> dict:
+        if self._responses is None:
+            self._responses = {}
+
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._responses[entry['key']] = entry['response']
+
+                self.logger.info(f'{len(self._responses)} recorded {self.provider} responses loaded from {self.path}')
+
+        return self._responses
+
+    def lookup(self, key: str, response_type):
+        """Returns the recorded response as a `response_type` (a pydantic model),
+        or None when it must be requested from the provider."""
+        if self.mode not in ('replay', 'auto'):
+            return None
+
+        with self._lock:
+            response = self._load().get(key)
+
+        if response is None:
+            if self.mode == 'replay':
+                raise CassetteMissError(f'No recorded {self.provider} response for request {key} in {self.path}')
+
+            return None
+
+        return response_type.model_validate(response)
+
+    def record(self, key: str, response, model: str = None):
+        if self.mode not in ('record', 'auto'):
+            return
+
+        dumped = response.model_dump(mode='json', exclude_none=True)
+        line = json.dumps({
+            'key': key,
+            'model': model,
+            'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'response': dumped,
+        }, ensure_ascii=False, separators=(',', ':'))
+
+        with self._lock:
+            self._load()[key] = dumped
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            # A single append per entry, so processes sharing the cassette do not interleave lines
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def call(self, request: dict, send, response_type):
+        """Replays the response of `request`, or gets it from `send()` (and records it).
+
+            response = cassette.call(request, lambda: client.chat.completions.create(**request), ChatCompletion)
+        """
+        if self.mode == 'off':
+            return send()
+
+        key = self.request_key(request)
+        response = self.lookup(key, response_type)
+
+        if response is None:
+            response = send()
+            self.record(key, response, request.get('model'))
+
+        return response
+
+
+def _canonical_value(value):
+    if isinstance(value, bytes):
+        return hashlib.sha256(value).hexdigest()
+
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(mode='json', exclude_none=True)
+
+    return repr(value)
+
+
+def get_cassette(provider: str) -> LLMCassette:
+    """Returns the cassette of `provider`, shared by the whole process."""
+    with _cassettes_lock:
+        if provider not in _cassettes:
+            _cassettes[provider] = LLMCassette(provider)
+
+        return _cassettes[provider]
@@ -1,12 +1,79 @@
-from fastapi import FastAPI
+import sys
+import asyncio
+import logging
+import importlib
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
+from .dependencies import settings, get_supabase_client
+from .metrics import generate_metrics, set_queue_depth
 from .supabase.supabase_router import router as supabase_router
-from .document_processing.document_processing_router import router as document_processing_router
+from .supabase.entity_dictionary import preload_entity_dictionaries
+from .document_processing.document_processing_router import router as document_processing_router, get_conversion_queue
 from .extractor.extractor_router import router as extractor_router
+from .document_processing.conversion_worker import shutdown_conversion_pool
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+# Imported lazily by the routers, preloaded by the warm-up task
+WARMUP_MODULES = [
+    'app.document_processing.document_processing_service',
+    'app.extractor.extractor_service',
+]
+
+
+def warm_up():
+    logger = logging.getLogger(__name__)
+
+    modules = WARMUP_MODULES
+
+    # The conversion workers load the document processing service themselves
+    if settings.CONVERSION_WORKERS > 0:
+        modules = [m for m in modules if not m.startswith('app.document_processing')]
+
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.warning(f'Could not preload {module}: {e}')
+
+    logger.info('Heavy modules preloaded')
+
+    try:
+        preload_entity_dictionaries(get_supabase_client())
+        logger.info('Topics, offices and examining boards preloaded')
+    except Exception as e:
+        logger.warning(f'Could not preload the entity dictionaries: {e}')
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The metric files of a previous run are removed by docker-entrypoint.sh,
+    # before app.metrics creates the new ones
+
+    # Runs in the background so the server accepts requests right away
+    if settings.WARMUP_ON_STARTUP:
+        warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
+
+    yield
+
+    if settings.WARMUP_ON_STARTUP:
+        await warm_up_task
+
+    shutdown_conversion_pool()
+
 
 app = FastAPI(
     title="Modern File Processing API",
     description="API for processing files, interacting with Supabase, and calling LLMs.",
     version="0.0.1",
+    lifespan=lifespan,
 )
 
 
@@ -18,6 +85,18 @@ def read_root():
     return {"message": "Welcome to the File Processing API!"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: pipeline stage, job and LLM latencies, LLM tokens,
+    cache hits and misses, jobs in progress and job queue depth."""
+    if settings.CONVERSION_QUEUE_URL:
+        set_queue_depth(await run_in_threadpool(get_conversion_queue().count_by_status))
+
+    content, content_type = generate_metrics()
+
+    return Response(content=content, media_type=content_type)
+
+
 app.include_router(supabase_router)
 app.include_router(document_processing_router)
 app.include_router(extractor_router)
@@ -0,0 +1,72 @@
+import os
+import sys
+import logging
+import resource
+import threading
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+
+def get_rss_mb() -> float:
+    """Returns the current resident set size of the process, in MB."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        # No procfs (e.g. macOS): fall back to the lifetime peak
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MemoryMonitor:
+    """Samples the process RSS in a background thread while a job runs.
+
+    `ru_maxrss` only reports the lifetime peak of the process, so a sampler is
+    used to get the peak of a single job:
+
+        with MemoryMonitor() as monitor:
+            ...
+        monitor.peak_rss_mb
+    """
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.start_rss_mb = 0.0
+        self.peak_rss_mb = 0.0
+
+        self._stop = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger(__name__)
+
+    def sample(self) -> float:
+        rss_mb = get_rss_mb()
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+
+        return rss_mb
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.start_rss_mb = self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+        self.logger.info(
+            f'Peak RSS {self.peak_rss_mb:.0f} MB (started at {self.start_rss_mb:.0f} MB)')
+
+        return False
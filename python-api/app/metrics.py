@@ -0,0 +1,156 @@
+import os
+import time
+import contextvars
+
+from contextlib import contextmanager
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+
+# Metrics are recorded in the process doing the work (API, pool workers, worker
+# nodes). With PROMETHEUS_MULTIPROC_DIR set, the pool workers write them to
+# that folder and /metrics aggregates every process; worker nodes expose their
+# own endpoint (`python -m app.worker --metrics-port`).
+
+STAGE_SECONDS = Histogram(
+    'docparser_stage_seconds', 'Time spent in each conversion pipeline stage',
+    ['stage'], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+
+JOB_SECONDS = Histogram(
+    'docparser_job_seconds', 'Duration of conversion jobs',
+    ['status', 'cached'], buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200, 2400))
+
+JOBS_IN_PROGRESS = Gauge(
+    'docparser_jobs_in_progress', 'Conversion jobs submitted by the API and not finished yet',
+    multiprocess_mode='livesum')
+
+QUEUE_JOBS = Gauge(
+    'docparser_queue_jobs', 'Jobs in the shared job queue, by state',
+    ['status'], multiprocess_mode='livemax')
+
+LLM_REQUEST_SECONDS = Histogram(
+    'docparser_llm_request_seconds', 'Latency of LLM requests',
+    ['provider', 'model', 'status'], buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120))
+
+LLM_TOKENS = Counter(
+    'docparser_llm_tokens', 'Tokens used by LLM requests',
+    ['provider', 'model', 'kind'])
+
+CACHE_LOOKUPS = Counter(
+    'docparser_cache_lookups', 'Cache lookups, by cache and result',
+    ['cache', 'result'])
+
+# The JobMetrics of the conversion job running in the current context
+_job_metrics = contextvars.ContextVar('job_metrics', default=None)
+
+
+class JobMetrics:
+    """The LLM usage and cache lookups of a single job, attached to its result."""
+
+    def __init__(self):
+        self.llm = {}
+        self.cache = {}
+
+    def add_llm_call(self, provider: str, model: str, seconds: float, failed: bool, prompt_tokens: int, completion_tokens: int):
+        usage = self.llm.setdefault(f'{provider}/{model}', {
+            'calls': 0, 'errors': 0, 'seconds': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0})
+
+        usage['calls'] += 1
+        usage['errors'] += int(failed)
+        usage['seconds'] = round(usage['seconds'] + seconds, 3)
+        usage['prompt_tokens'] += prompt_tokens
+        usage['completion_tokens'] += completion_tokens
+
+    def add_cache_lookups(self, cache: str, hits: int, misses: int):
+        lookups = self.cache.setdefault(cache, {'hits': 0, 'misses': 0})
+        lookups['hits'] += hits
+        lookups['misses'] += misses
+
+    def to_dict(self) -> dict:
+        return {'llm': self.llm, 'cache': self.cache}
+
+
+@contextmanager
+def collect_job_metrics():
+    """Collects the metrics recorded in this context into a JobMetrics."""
+    job_metrics = JobMetrics()
+    token = _job_metrics.set(job_metrics)
+
+    try:
+        yield job_metrics
+    finally:
+        _job_metrics.reset(token)
+
+
+class LLMCall:
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def set_usage(self, prompt_tokens: int, completion_tokens: int):
+        self.prompt_tokens = prompt_tokens or 0
+        self.completion_tokens = completion_tokens or 0
+
+
+@contextmanager
+def llm_call(provider: str, model: str):
+    """Times an LLM request; report its token usage with `set_usage`.
+
+        with llm_call('deepseek', model) as call:
+            response = client.chat.completions.create(...)
+            call.set_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+    """
+    call = LLMCall()
+    failed = False
+    start = time.perf_counter()
+
+    try:
+        yield call
+    except Exception:
+        failed = True
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+
+        LLM_REQUEST_SECONDS.labels(provider, model, 'error' if failed else 'ok').observe(seconds)
+        LLM_TOKENS.labels(provider, model, 'prompt').inc(call.prompt_tokens)
+        LLM_TOKENS.labels(provider, model, 'completion').inc(call.completion_tokens)
+
+        job_metrics = _job_metrics.get()
+        if job_metrics is not None:
+            job_metrics.add_llm_call(provider, model, seconds, failed,
+                                     call.prompt_tokens, call.completion_tokens)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def observe_job(seconds: float, status: str, cached: bool):
+    JOB_SECONDS.labels(status, str(cached).lower()).observe(seconds)
+
+
+def record_cache_lookups(cache: str, hits: int = 0, misses: int = 0):
+    if hits:
+        CACHE_LOOKUPS.labels(cache, 'hit').inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, 'miss').inc(misses)
+
+    job_metrics = _job_metrics.get()
+    if job_metrics is not None:
+        job_metrics.add_cache_lookups(cache, hits, misses)
+
+
+def set_queue_depth(counts: dict):
+    for status in ('queued', 'running', 'dead'):
+        QUEUE_JOBS.labels(status).set(counts.get(status, 0))
+
+
+def generate_metrics() -> tuple:
+    """Returns the exposition of every metric and its content type."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
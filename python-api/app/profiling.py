@@ -0,0 +1,181 @@
+import io
+import sys
+import marshal
+import pstats
+import logging
+import cProfile
+import threading
+import contextvars
+import tracemalloc
+
+from datetime import datetime, timezone
+
+from app.dependencies import settings
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+# tracemalloc traces the whole process, so only one run at a time takes a memory snapshot
+_tracemalloc_lock = threading.Lock()
+
+# The RunProfiler of the run executing in the current context
+_active_profiler = contextvars.ContextVar('active_profiler', default=None)
+
+
+def profile_in_worker(function):
+    """Wraps a function handed to a worker thread so the RunProfiler of the
+    submitting run, if any, also profiles it.
+
+        executor.map(profile_in_worker(self.process_image), ...)
+    """
+    profiler = _active_profiler.get()
+
+    if profiler is None:
+        return function
+
+    def profiled(*args, **kwargs):
+        profile = profiler._worker_profile()
+        profile.enable()
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.disable()
+
+    return profiled
+
+
+class RunProfiler:
+    """Opt-in profiler for a single pipeline run.
+
+    Captures a cProfile trace of the calling thread, merged with the traces of
+    the worker threads it hands work to through `profile_in_worker` (the image
+    processing pool), and, when no other run is tracing memory, a tracemalloc
+    snapshot, then uploads them to
+    `PROFILING_BUCKET` under `_profiles/<timestamp>_<name>/`:
+
+    - profile.prof: the raw cProfile stats (snakeviz, `python -m pstats`...)
+    - profile.txt: the 60 most expensive calls by cumulative time
+    - memory.txt: the peak traced memory and the 30 biggest allocation sites
+
+    Other requests are not profiled: cProfile only hooks the calling thread,
+    and the threads started by libraries (Docling, HTTP clients) are not traced.
+
+        with RunProfiler('process-pdf_edital') as profiler:
+            ...
+        profiler.artifacts  # uploaded paths
+    """
+
+    folder = '_profiles'
+    top_calls = 60
+    top_allocations = 30
+
+    def __init__(self, name: str, supabase_service=None, bucket: str = None):
+        self.name = name
+        self.supabase_service = supabase_service
+        self.bucket = bucket or settings.PROFILING_BUCKET
+        self.artifacts = {}
+
+        self._profile = cProfile.Profile()
+        self._worker_profiles = {}  # thread id -> cProfile.Profile
+        self._worker_profiles_lock = threading.Lock()
+        self._context_token = None
+        self._traces_memory = False
+        self.logger = logging.getLogger(__name__)
+
+    def __enter__(self):
+        if _tracemalloc_lock.acquire(blocking=False):
+            if tracemalloc.is_tracing():
+                _tracemalloc_lock.release()
+            else:
+                tracemalloc.start(10)
+                self._traces_memory = True
+
+        self._context_token = _active_profiler.set(self)
+        self._profile.enable()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._profile.disable()
+        _active_profiler.reset(self._context_token)
+        files = {}
+
+        if self._traces_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            _tracemalloc_lock.release()
+
+            files['memory.txt'] = self._format_memory(snapshot, peak)
+
+        stats = self._merged_stats()
+
+        # Same content as Profile.dump_stats, without going through a file
+        files['profile.prof'] = marshal.dumps(stats.stats)
+        files['profile.txt'] = self._format_calls(stats)
+
+        try:
+            self.artifacts = self.upload(files)
+        except Exception as e:
+            # A lost profile must not fail the run
+            self.logger.error(f'Could not upload the profile of {self.name}: {e}')
+
+        return False
+
+    def _worker_profile(self) -> cProfile.Profile:
+        """Returns the profile of the calling worker thread."""
+        with self._worker_profiles_lock:
+            return self._worker_profiles.setdefault(threading.get_ident(), cProfile.Profile())
+
+    def _merged_stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self._profile)
+
+        with self._worker_profiles_lock:
+            worker_profiles = list(self._worker_profiles.values())
+
+        if worker_profiles:
+            stats.add(*worker_profiles)
+
+        return stats
+
+    def _format_calls(self, stats: pstats.Stats) -> bytes:
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats('cumulative').print_stats(self.top_calls)
+
+        return stream.getvalue().encode('utf-8')
+
+    def _format_memory(self, snapshot, peak: int) -> bytes:
+        lines = [f'Peak traced memory: {peak / (1024 * 1024):.1f} MB', '']
+        lines += [str(stat) for stat in snapshot.statistics('lineno')[:self.top_allocations]]
+
+        return '\n'.join(lines).encode('utf-8')
+
+    def upload(self, files: dict) -> dict:
+        if self.supabase_service is None:
+            from app.supabase.supabase_service import SupabaseService
+
+            self.supabase_service = SupabaseService()
+
+        timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+        run_folder = f'{self.folder}/{timestamp}_{self.name}'
+        artifacts = {'bucket': self.bucket}
+
+        for file_name, content in files.items():
+            path = f'{run_folder}/{file_name}'
+
+            self.supabase_service.client.storage.from_(self.bucket).upload(
+                path=path,
+                file=content,
+                file_options={"content-type": "application/octet-stream" if file_name.endswith('.prof') else "text/plain", "upsert": "true"}
+            )
+            artifacts[file_name.replace('.', '_')] = path
+
+        self.logger.info(f'Profile of {self.name} uploaded to {run_folder}')
+
+        return artifacts
@@ -2,8 +2,13 @@ import os
 import sys
 import logging
 import base64
+import json
 
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, APIStatusError
+from openai.types.chat import ChatCompletion
+
+from app.metrics import llm_call
+from app.llm_cassette import get_cassette
 
 logging.basicConfig(
     stream=sys.stdout,
@@ -14,12 +19,28 @@ logging.basicConfig(
 
 
 class QwenApiService:
+    # Batch limits, tuned at runtime between these bounds (see get_image_captions)
+    MIN_BATCH_BYTES = 512 * 1024
+    MAX_BATCH_BYTES = 8 * 1024 * 1024
+    MAX_BATCH_IMAGES = 10
+
+    # Failed or incomplete batches tolerated per call, the remaining images are
+    # then captioned one at a time
+    MAX_FAILED_BATCHES = 5
+
+    # Provider answers worth retrying with a smaller batch (payload too large,
+    # rate limited, server errors); any other error is raised
+    RETRYABLE_STATUS_CODES = (408, 413, 429)
+
     def __init__(self):
         self.client = OpenAI(
             api_key=os.getenv('OPEN_ROUTER_API_KEY'),
-            base_url="https://openrouter.ai/api/v1"
+            base_url=os.getenv('OPEN_ROUTER_BASE_URL', "https://openrouter.ai/api/v1")
         )
 
+        self.model = "qwen/qwen3-vl-8b-instruct"
+        self.batch_bytes = 2 * 1024 * 1024
+        self.cassette = get_cassette("openrouter")
         self.logger = logging.getLogger(__name__)
 
     def get_image_caption(self, image_path: str) -> str:
@@ -32,16 +53,224 @@ class QwenApiService:
         Returns:
             The model's caption response as a string
         """
+        try:
+            image_url = self._encode_image(image_path)
+            caption = self._caption_image_url(image_url)
+
+            self.logger.info(
+                f"Successfully generated caption for {image_path}")
+            return caption
+
+        except FileNotFoundError:
+            self.logger.error(f"Image file not found: {image_path}")
+            raise
+        except Exception as e:
+            self.logger.error(f"Error generating caption: {str(e)}")
+            raise
+
+    def get_image_captions(self, images: dict, on_progress=None) -> dict:
+        """
+        Get captions for several images, packing many images per chat completion.
+
+        Images are grouped in request order until the batch reaches
+        `self.batch_bytes` of image data (or `MAX_BATCH_IMAGES` images). The
+        model answers with a JSON object keyed by image id. When a batch fails
+        or comes back incomplete the byte budget is halved and the missing
+        images are retried in smaller batches; every successful batch grows the
+        budget again, so the size settles around what the provider accepts.
+        A batch at the smallest budget that yields no caption, or more than
+        `MAX_FAILED_BATCHES` failed batches, makes the remaining images go
+        one per request. Only transient provider errors are retried, others
+        (authentication, bad request...) are raised.
+
+        Args:
+            images: A dict mapping each image id to the image file path or to
+                an already encoded `(bytes, media_type)` tuple
+            on_progress: Optional callable receiving `(captioned, total)` after each batch
+
+        Returns:
+            A dict mapping each image id to its caption
+        """
+        encoded_images = {
+            image_id: self._encode_image(image) for image_id, image in images.items()
+        }
+
+        captions = {}
+        pending = list(encoded_images.keys())
+        failed_batches = 0
+        one_by_one = False
+
+        while pending:
+            batch = pending[:1] if one_by_one else self._next_batch(pending, encoded_images)
+
+            if len(batch) == 1:
+                captions[batch[0]] = self._caption_image_url(
+                    encoded_images[batch[0]])
+                pending.remove(batch[0])
+
+                if on_progress is not None:
+                    on_progress(len(captions), len(encoded_images))
+                continue
+
+            at_smallest_batch = self.batch_bytes <= self.MIN_BATCH_BYTES
+
+            try:
+                batch_captions = self._caption_batch(
+                    {image_id: encoded_images[image_id] for image_id in batch})
+            except (APIConnectionError, APIStatusError) as e:
+                if not self._is_retryable(e):
+                    raise
+
+                self.logger.error(f"Error generating batched captions: {str(e)}")
+                batch_captions = {}
+
+            captions.update(batch_captions)
+            pending = [i for i in pending if i not in captions]
+
+            if on_progress is not None:
+                on_progress(len(captions), len(encoded_images))
+
+            if len(batch_captions) == len(batch):
+                self.batch_bytes = min(
+                    int(self.batch_bytes * 1.5), self.MAX_BATCH_BYTES)
+                continue
+
+            failed_batches += 1
+            self.batch_bytes = max(
+                self.batch_bytes // 2, self.MIN_BATCH_BYTES)
+            self.logger.info(
+                f"Batch returned {len(batch_captions)}/{len(batch)} captions, batch size reduced to {self.batch_bytes} bytes")
+
+            # Smaller batches cannot help anymore, the same batch would be sent again
+            if (at_smallest_batch and not batch_captions) or failed_batches >= self.MAX_FAILED_BATCHES:
+                self.logger.info(
+                    f"Captioning the {len(pending)} remaining images one at a time")
+                one_by_one = True
+
+        return captions
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, APIStatusError):
+            return error.status_code in self.RETRYABLE_STATUS_CODES or error.status_code >= 500
+
+        # Connection errors and timeouts
+        return True
+
+    def _caption_image_url(self, image_url: str) -> str:
         prompt = 'The following image has been extracted from an PDF file. It may be a relevant image that corresponds to part of the document`s content or it may be (less likely) a page decoration or a useless artifact. Please generate a brief description of the image. Only describe what is in the image. DO NOT try to predict what it means or in what context it is inserted.'
 
+        request = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": image_url
+                            }
+                        },
+                        {
+                            "type": "text",
+                            "text": prompt
+                        }
+                    ]
+                }
+            ]
+        }
+
+        # Make the API request (or replay it)
+        response = self.cassette.call(
+            request, lambda: self._send(request), ChatCompletion)
+
+        return response.choices[0].message.content
+
+    def _send(self, request: dict):
+        with llm_call("openrouter", self.model) as call:
+            response = self.client.chat.completions.create(**request)
+            self._set_usage(call, response)
+
+        return response
+
+    def _set_usage(self, call, response):
+        if response.usage is not None:
+            call.set_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+
+    def _next_batch(self, pending: list, encoded_images: dict) -> list:
+        batch = []
+        batch_bytes = 0
+
+        for image_id in pending:
+            image_bytes = len(encoded_images[image_id])
+
+            if batch and (batch_bytes + image_bytes > self.batch_bytes
+                          or len(batch) >= self.MAX_BATCH_IMAGES):
+                break
+
+            batch.append(image_id)
+            batch_bytes += image_bytes
+
+        return batch
+
+    def _caption_batch(self, images: dict) -> dict:
+        prompt = f'The following {len(images)} images have been extracted from an PDF file. Each image is preceded by its id. Each one may be a relevant image that corresponds to part of the document`s content or it may be (less likely) a page decoration or a useless artifact. For every image, generate a brief description of the image. Only describe what is in the image. DO NOT try to predict what it means or in what context it is inserted. Answer ONLY with a JSON object mapping every image id to its description, e.g. {{"image_000001.png": "description"}}.'
+
+        content = []
+        for image_id, image_url in images.items():
+            content.append({"type": "text", "text": f"Image id: {image_id}"})
+            content.append(
+                {"type": "image_url", "image_url": {"url": image_url}})
+        content.append({"type": "text", "text": prompt})
+
+        request = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": content}],
+            "response_format": {"type": "json_object"}
+        }
+
+        response = self.cassette.call(
+            request, lambda: self._send(request), ChatCompletion)
+
+        # A filtered or empty completion has no content, it is a failed batch
+        answer = (response.choices[0].message.content or "").strip()
+        # Some providers still wrap the JSON in a markdown fence
+        answer = answer.removeprefix("```json").removeprefix("```").removesuffix("```")
+
         try:
-            # Read and encode the image
-            with open(image_path, "rb") as image_file:
-                image_data = base64.standard_b64encode(
-                    image_file.read()).decode("utf-8")
+            parsed = json.loads(answer)
+        except json.JSONDecodeError:
+            self.logger.error("Batched caption response is not a valid JSON")
+            return {}
+
+        if not isinstance(parsed, dict):
+            self.logger.error("Batched caption response is not a JSON object")
+            return {}
+
+        captions = {
+            image_id: caption for image_id, caption in parsed.items()
+            if image_id in images and isinstance(caption, str)
+        }
+
+        self.logger.info(
+            f"Successfully generated {len(captions)} captions in one request")
+
+        return captions
+
+    def _encode_image(self, image) -> str:
+        """Reads an image once and returns it as a base64 data URL.
+
+        Args:
+            image: Path to the image file, or a `(bytes, media_type)` tuple
+        """
+        if isinstance(image, tuple):
+            image_bytes, media_type = image
+        else:
+            with open(image, "rb") as image_file:
+                image_bytes = image_file.read()
 
             # Determine image type from file extension
-            image_ext = os.path.splitext(image_path)[1].lower()
+            image_ext = os.path.splitext(image)[1].lower()
             media_type_map = {
                 ".jpg": "image/jpeg",
                 ".jpeg": "image/jpeg",
@@ -51,36 +280,6 @@ class QwenApiService:
             }
             media_type = media_type_map.get(image_ext, "image/jpeg")
 
-            # Make the API request
-            response = self.client.chat.completions.create(
-                model="qwen/qwen3-vl-8b-instruct",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:{media_type};base64,{image_data}"
-                                }
-                            },
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ]
-            )
+        image_data = base64.standard_b64encode(image_bytes).decode("utf-8")
 
-            caption = response.choices[0].message.content
-            self.logger.info(
-                f"Successfully generated caption for {image_path}")
-            return caption
-
-        except FileNotFoundError:
-            self.logger.error(f"Image file not found: {image_path}")
-            raise
-        except Exception as e:
-            self.logger.error(f"Error generating caption: {str(e)}")
-            raise
+        return f"data:{media_type};base64,{image_data}"
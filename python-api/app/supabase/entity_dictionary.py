@@ -0,0 +1,183 @@
+import re
+import sys
+import time
+import difflib
+import logging
+import threading
+import unicodedata
+
+from app.dependencies import settings
+from app.metrics import record_cache_lookups
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+# Dictionary tables: one row per name, shared by every recruitment offer
+DICTIONARY_TABLES = ('topics', 'offices', 'examining_boards')
+
+# One dictionary per table and process
+_dictionaries = {}
+_dictionaries_lock = threading.Lock()
+
+
+def normalize_name(name: str) -> str:
+    """Accent, case and punctuation insensitive form of a name:
+    'Língua  Portuguesa:' -> 'lingua portuguesa'."""
+    decomposed = unicodedata.normalize('NFKD', name)
+    without_accents = ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+    return re.sub(r'[\W_]+', ' ', without_accents.casefold()).strip()
+
+
+class EntityDictionary:
+    """In-memory name -> id index of a dictionary table (topics, offices, examining boards).
+
+    The whole table is loaded on first use, then refreshed incrementally
+    (only the rows created since the last refresh) when it is older than
+    `ENTITY_CACHE_REFRESH_SECONDS`, and reloaded from scratch every
+    `ENTITY_CACHE_FULL_RELOAD_SECONDS` so deleted and renamed rows go away.
+
+    Names are matched on their normalized form. Fuzzy matching (the closest
+    normalized name with a similarity ratio of at least `ENTITY_FUZZY_CUTOFF`)
+    is only for lookups: close names such as 'Direito Administrativo I' and
+    'Direito Administrativo II' are different entities, so the writes resolve
+    exact matches only.
+    """
+
+    PAGE_SIZE = 1000
+
+    def __init__(self, table: str, client, refresh_seconds: float = None, full_reload_seconds: float = None,
+                 fuzzy_cutoff: float = None):
+        self.table = table
+        self.client = client
+        self.refresh_seconds = settings.ENTITY_CACHE_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self.full_reload_seconds = settings.ENTITY_CACHE_FULL_RELOAD_SECONDS \
+            if full_reload_seconds is None else full_reload_seconds
+        self.fuzzy_cutoff = settings.ENTITY_FUZZY_CUTOFF if fuzzy_cutoff is None else fuzzy_cutoff
+
+        self.ids = {}  # normalized name -> id
+        self.refreshed_at = None
+        self.loaded_at = None
+        self._last_created_at = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def refresh(self, force: bool = False) -> int:
+        """Loads the rows created since the last refresh, or the whole table when
+        the last full load is too old (or `force` is set); returns the requests sent."""
+        with self._lock:
+            now = time.monotonic()
+
+            if not force and self.refreshed_at is not None and now - self.refreshed_at < self.refresh_seconds:
+                return 0
+
+            full_reload = force or self.loaded_at is None or now - self.loaded_at >= self.full_reload_seconds
+
+            previous = self.ids, self._last_created_at
+
+            if full_reload:
+                self.ids = {}
+                self._last_created_at = None
+
+            # The cursor is read once: _add() moves it forward while the pages are read
+            since = self._last_created_at
+            requests = 0
+            start = 0
+
+            try:
+                while True:
+                    query = self.client.table(self.table).select('id, name, created_at')
+
+                    # Rows created in the same instant as the last one are read again, add() is idempotent
+                    if since is not None:
+                        query = query.gte('created_at', since)
+
+                    rows = query.order('created_at').order('id').range(
+                        start, start + self.PAGE_SIZE - 1).execute().data
+                    requests += 1
+
+                    self._add(rows)
+
+                    if len(rows) < self.PAGE_SIZE:
+                        break
+
+                    start += self.PAGE_SIZE
+            except Exception:
+                # Keep serving the previous index rather than a partial one
+                if full_reload:
+                    self.ids, self._last_created_at = previous
+                raise
+
+            self.refreshed_at = now
+            if full_reload:
+                self.loaded_at = now
+
+        return requests
+
+    def _add(self, rows: list):
+        for row in rows:
+            self.ids.setdefault(normalize_name(row['name']), row['id'])
+
+            if row.get('created_at') and (self._last_created_at is None or row['created_at'] > self._last_created_at):
+                self._last_created_at = row['created_at']
+
+    def add(self, rows: list):
+        """Adds rows written by this process, so they resolve before the next refresh."""
+        with self._lock:
+            self._add(rows)
+
+    def match(self, name: str, fuzzy: bool = False):
+        """Returns the id of `name`, or None when no known name matches it.
+
+        With `fuzzy` (and a cutoff above 0), a name without an exact match gets
+        the id of the closest known name. Never use it to link rows.
+        """
+        normalized = normalize_name(name)
+
+        with self._lock:
+            if normalized in self.ids:
+                return self.ids[normalized]
+
+            if not fuzzy or self.fuzzy_cutoff <= 0:
+                return None
+
+            closest = difflib.get_close_matches(normalized, self.ids.keys(), n=1, cutoff=self.fuzzy_cutoff)
+
+        if closest:
+            self.logger.info(f'{self.table}: {name!r} matched {closest[0]!r}')
+            return self.ids[closest[0]]
+
+        return None
+
+    def resolve(self, names, fuzzy: bool = False) -> dict:
+        """Maps every name to its id (None for the unknown ones), refreshing the
+        dictionary first when it is stale."""
+        self.refresh()
+
+        ids = {name: self.match(name, fuzzy) for name in dict.fromkeys(names)}
+        hits = sum(entity_id is not None for entity_id in ids.values())
+        record_cache_lookups(f'entities_{self.table}', hits=hits, misses=len(ids) - hits)
+
+        return ids
+
+
+def get_entity_dictionary(table: str, client) -> EntityDictionary:
+    """Returns the dictionary of `table`, shared by the whole process."""
+    if table not in DICTIONARY_TABLES:
+        raise ValueError(f'{table} is not a dictionary table')
+
+    with _dictionaries_lock:
+        if table not in _dictionaries:
+            _dictionaries[table] = EntityDictionary(table, client)
+
+        return _dictionaries[table]
+
+
+def preload_entity_dictionaries(client):
+    """Loads every dictionary table, so the first persisted offer resolves in memory."""
+    for table in DICTIONARY_TABLES:
+        get_entity_dictionary(table, client).refresh(force=True)
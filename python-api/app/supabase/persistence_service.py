@@ -0,0 +1,295 @@
+import sys
+import logging
+
+from collections import Counter
+
+from .supabase_service import SupabaseService
+from .entity_dictionary import get_entity_dictionary, normalize_name
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+
+class BulkWriter:
+    """Batched PostgREST reads and writes, counting the requests sent.
+
+    `in` filters are sent in chunks of `IN_CHUNK` values (they travel in the
+    URL) and inserts in chunks of `WRITE_CHUNK` rows.
+    """
+
+    IN_CHUNK = 100
+    WRITE_CHUNK = 500
+
+    def __init__(self, client):
+        self.client = client
+        self.requests = 0
+        self.counts = Counter()
+
+    def select_in(self, table: str, column: str, values, columns: str = '*', **filters) -> list:
+        rows = []
+        values = list(dict.fromkeys(values))
+
+        for i in range(0, len(values), self.IN_CHUNK):
+            query = self.client.table(table).select(columns).in_(column, values[i:i + self.IN_CHUNK])
+
+            # `eq.null` never matches, a missing value is filtered with `is.null`
+            for key, value in filters.items():
+                query = query.is_(key, 'null') if value is None else query.eq(key, value)
+
+            rows += query.execute().data
+            self.requests += 1
+
+        return rows
+
+    def insert(self, table: str, rows: list, on_conflict: str = None) -> list:
+        """Inserts the rows; with `on_conflict` (unique columns), a row that already
+        exists is merged into the stored one and returned instead of failing."""
+        inserted = []
+
+        for i in range(0, len(rows), self.WRITE_CHUNK):
+            chunk = rows[i:i + self.WRITE_CHUNK]
+            query = self.client.table(table).upsert(chunk, on_conflict=on_conflict) if on_conflict \
+                else self.client.table(table).insert(chunk)
+            inserted += query.execute().data
+            self.requests += 1
+
+        self.counts[f'{table}.inserted'] += len(inserted)
+
+        return inserted
+
+    def update(self, table: str, rows: list) -> list:
+        """Updates existing rows (with their `id`) in one upsert per chunk."""
+        updated = []
+
+        for i in range(0, len(rows), self.WRITE_CHUNK):
+            updated += self.client.table(table).upsert(rows[i:i + self.WRITE_CHUNK]).execute().data
+            self.requests += 1
+
+        self.counts[f'{table}.updated'] += len(updated)
+
+        return updated
+
+    def resolve_names(self, table: str, names) -> dict:
+        """Returns the id of every name of a dictionary table (topics, offices,
+        examining_boards), creating the missing ones.
+
+        Names are resolved in memory against the process-wide EntityDictionary
+        (accent and case insensitive, see entity_dictionary.py), so the only
+        round trips are its refresh, when stale, and one insert of the names it
+        does not know. Only exact normalized matches are linked: fuzzy matching
+        would attach e.g. 'Direito Administrativo II' to 'Direito Administrativo I'.
+
+        The names are inserted with an upsert on the unique `name` column
+        (supabase/migrations), so a name created meanwhile by another worker,
+        or since the last refresh, resolves to its existing row.
+        """
+        names = list(dict.fromkeys(name for name in names if name))
+        dictionary = get_entity_dictionary(table, self.client)
+
+        self.requests += dictionary.refresh()
+        ids = dictionary.resolve(names)
+
+        # Spellings of the same missing name are created once
+        missing = {}
+        for name in names:
+            if ids[name] is None:
+                missing.setdefault(normalize_name(name), name)
+
+        self.counts[f'{table}.existing'] += sum(entity_id is not None for entity_id in ids.values())
+
+        if missing:
+            inserted = self.insert(table, [{'name': name} for name in missing.values()], on_conflict='name')
+            dictionary.add(inserted)
+
+            created = {normalize_name(row['name']): row['id'] for row in inserted}
+            ids.update({name: created[normalize_name(name)] for name in names if ids[name] is None})
+
+        return ids
+
+    def link(self, table: str, parent_column: str, child_column: str, pairs) -> int:
+        """Creates the missing (parent, child) rows of a link table: two round trips."""
+        pairs = list(dict.fromkeys(pairs))
+        existing = {(row[parent_column], row[child_column]) for row in self.select_in(
+            table, parent_column, [parent for parent, _ in pairs], f'{parent_column}, {child_column}')}
+        missing = [{parent_column: parent, child_column: child} for parent, child in pairs if (parent, child) not in existing]
+
+        self.counts[f'{table}.existing'] += len(pairs) - len(missing)
+
+        if missing:
+            self.insert(table, missing)
+
+        return len(missing)
+
+
+class PersistenceService:
+    """Writes the extractor output of a recruitment offer in a few batched requests.
+
+    Replaces the row-by-row get / if-exists / create / link loops of the n8n
+    workflows: every table is read once (per chunk) and written once (per
+    chunk), whatever the number of exams, topics or job roles. Writes are
+    idempotent, running the same payload again only updates the changed
+    values, so a failed run can be retried as is:
+
+    - examining boards, topics (and subtopics) and offices are matched by
+      normalized name, in memory (see entity_dictionary.py)
+    - the recruitment offer by `pdf_file_path` (or by name and year without it)
+    - exams by name within the offer, job roles by name within the exam
+    - exam_topics, exam_subtopics and exam_offices links are only added when missing
+    """
+
+    OFFER_FIELDS = ('name', 'year', 'scope', 'city', 'state', 'status', 'tender_url', 'pdf_file_path')
+    JOB_ROLE_FIELDS = ('salary', 'openings', 'cr_openings')
+
+    def __init__(self, supabase_service: SupabaseService = None):
+        self.supabase_service = supabase_service or SupabaseService()
+        self.logger = logging.getLogger(__name__)
+
+    def persist_recruitment_offer(self, offer: dict) -> dict:
+        """Writes a recruitment offer with its exams, topics, subtopics, job roles and offices.
+
+        Args:
+            offer (dict): The `/extractor/base-entities` output (name,
+                examining_board, year, scope, city, state, exams) plus
+                `tender_url`, `pdf_file_path` and `status`. Each exam may carry
+                `exam_topics` ([{name, subtopics: [str]}]), `job_roles` and
+                `offices` ([{name}]) as returned by the extractor endpoints.
+
+        Returns:
+            dict: The recruitment offer id, the id of each exam by name, the
+            rows inserted/updated/found per table and the number of requests sent.
+        """
+        writer = BulkWriter(self.supabase_service.client)
+        exams = self._named_exams(offer.get('exams'))
+
+        board_ids = writer.resolve_names('examining_boards', [offer.get('examining_board')])
+        offer_id = self._write_offer(writer, offer, board_ids.get(offer.get('examining_board')))
+        exam_ids = self._write_exams(writer, offer_id, exams)
+
+        # One dictionary lookup for the topics and the subtopics of every exam
+        topic_names = [topic['name'] for exam in exams for topic in exam.get('exam_topics') or []]
+        subtopic_names = [subtopic for exam in exams for topic in exam.get('exam_topics') or []
+                          for subtopic in topic.get('subtopics') or []]
+        topic_ids = writer.resolve_names('topics', topic_names + subtopic_names)
+
+        writer.link('exam_topics', 'exam_id', 'topic_id', [
+            (exam_ids[exam['name']], topic_ids[topic['name']])
+            for exam in exams for topic in exam.get('exam_topics') or []])
+
+        self._write_subtopics(writer, exams, exam_ids, topic_ids)
+        self._write_job_roles(writer, exams, exam_ids)
+
+        office_ids = writer.resolve_names('offices', [
+            office['name'] for exam in exams for office in exam.get('offices') or []])
+        writer.link('exam_offices', 'exam_id', 'office_id', [
+            (exam_ids[exam['name']], office_ids[office['name']])
+            for exam in exams for office in exam.get('offices') or []])
+
+        self.logger.info(
+            f'Recruitment offer {offer_id} persisted in {writer.requests} requests: {dict(writer.counts)}')
+
+        return {
+            'recruitment_offer_id': offer_id,
+            'exam_ids': exam_ids,
+            'rows': dict(sorted(writer.counts.items())),
+            'requests': writer.requests,
+        }
+
+    @staticmethod
+    def _named(items) -> list:
+        """The items with a name: the extractions may leave it out or empty."""
+        return [item for item in items or [] if isinstance(item, dict) and (item.get('name') or '').strip()]
+
+    def _named_exams(self, exams) -> list:
+        """Copies of the named exams, keeping only their named topics, subtopics,
+        job roles and offices."""
+        return [{
+            **exam,
+            'exam_topics': [
+                {**topic, 'subtopics': [subtopic for subtopic in topic.get('subtopics') or []
+                                        if isinstance(subtopic, str) and subtopic.strip()]}
+                for topic in self._named(exam.get('exam_topics'))],
+            'job_roles': self._named(exam.get('job_roles')),
+            'offices': self._named(exam.get('offices')),
+        } for exam in self._named(exams)]
+
+    def _write_offer(self, writer: BulkWriter, offer: dict, examining_board_id) -> str:
+        row = {field: offer.get(field) for field in self.OFFER_FIELDS if offer.get(field) is not None}
+
+        # An unresolved board must not unlink the board of an existing offer
+        if examining_board_id is not None:
+            row['examining_board_id'] = examining_board_id
+
+        if offer.get('pdf_file_path'):
+            existing = writer.select_in('recruitment_offers', 'pdf_file_path', [offer['pdf_file_path']], 'id')
+        else:
+            existing = writer.select_in('recruitment_offers', 'name', [offer['name']], 'id', year=offer.get('year'))
+
+        if existing:
+            return writer.update('recruitment_offers', [{**row, 'id': existing[0]['id']}])[0]['id']
+
+        return writer.insert('recruitment_offers', [row])[0]['id']
+
+    def _write_exams(self, writer: BulkWriter, offer_id: str, exams: list) -> dict:
+        existing = {row['name']: row['id'] for row in writer.select_in(
+            'exams', 'recruitment_offer_id', [offer_id], 'id, name')}
+        rows = {exam['name']: {'recruitment_offer_id': offer_id, 'name': exam['name'],
+                               'education_level': exam.get('education_level')} for exam in exams}
+
+        updated = [{**row, 'id': existing[name]} for name, row in rows.items() if name in existing]
+        created = [row for name, row in rows.items() if name not in existing]
+
+        exam_ids = {name: existing[name] for name in rows if name in existing}
+
+        if updated:
+            writer.update('exams', updated)
+        if created:
+            exam_ids.update({row['name']: row['id'] for row in writer.insert('exams', created)})
+
+        return exam_ids
+
+    def _write_subtopics(self, writer: BulkWriter, exams: list, exam_ids: dict, topic_ids: dict):
+        pairs = [(exam_ids[exam['name']], topic_ids[topic['name']], topic_ids[subtopic])
+                 for exam in exams for topic in exam.get('exam_topics') or []
+                 for subtopic in topic.get('subtopics') or []]
+
+        if not pairs:
+            return
+
+        # The exam_topics ids, created by the previous link
+        exam_topic_ids = {(row['exam_id'], row['topic_id']): row['id'] for row in writer.select_in(
+            'exam_topics', 'exam_id', list(exam_ids.values()), 'id, exam_id, topic_id')}
+
+        writer.link('exam_subtopics', 'exam_topic_id', 'exam_subtopic_id', [
+            (exam_topic_ids[(exam_id, topic_id)], subtopic_id) for exam_id, topic_id, subtopic_id in pairs])
+
+    def _write_job_roles(self, writer: BulkWriter, exams: list, exam_ids: dict):
+        rows = {}
+
+        for exam in exams:
+            for job_role in exam.get('job_roles') or []:
+                row = {'exam_id': exam_ids[exam['name']], 'name': job_role['name']}
+                row.update({field: job_role.get(field) for field in self.JOB_ROLE_FIELDS})
+
+                # The extractor answers `has_cr_openings`
+                if row['cr_openings'] is None:
+                    row['cr_openings'] = job_role.get('has_cr_openings')
+
+                rows[(row['exam_id'], row['name'])] = row
+
+        if not rows:
+            return
+
+        existing = {(row['exam_id'], row['name']): row['id'] for row in writer.select_in(
+            'job_roles', 'exam_id', [exam_id for exam_id, _ in rows], 'id, exam_id, name')}
+
+        updated = [{**row, 'id': existing[key]} for key, row in rows.items() if key in existing]
+        created = [row for key, row in rows.items() if key not in existing]
+
+        if updated:
+            writer.update('job_roles', updated)
+        if created:
+            writer.insert('job_roles', created)
@@ -1,7 +1,12 @@
-from fastapi import File, UploadFile, APIRouter, Query
-from fastapi.responses import StreamingResponse
+from fastapi import File, UploadFile, APIRouter, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse, JSONResponse
+from pydantic import BaseModel
 from .supabase_service import SupabaseService
-from typing import Annotated
+from .persistence_service import PersistenceService
+from .entity_dictionary import DICTIONARY_TABLES, get_entity_dictionary
+from ..cache import TTLCache, etag_matches
+from ..dependencies import settings
+from typing import Annotated, Any
 import io
 
 router = APIRouter(
@@ -9,6 +14,9 @@ router = APIRouter(
     tags=["Supabase"]
 )
 
+# Responses of the results dashboard endpoints, keyed by (endpoint, id)
+results_cache = TTLCache("results", settings.RESULTS_CACHE_TTL_SECONDS)
+
 
 def get_storage_service():
     """Provides the SupabaseService instance."""
@@ -25,15 +33,27 @@ async def get_bucket_list(
 
 
 @router.get("/storage/{bucket}")
-async def get_files_by_bucket(
+def get_files_by_bucket(
+    response: Response,
     bucket: str,
     path: str = None,
-    search: str = None
+    search: str = None,
+    limit: int = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    refresh: bool = False
 ):
-    """Endpoint to retrieve a file from Supabase S3."""
+    """Lists a folder of a bucket, every page of it unless `limit` is set.
+
+    Listings are cached for `STORAGE_LISTING_TTL_SECONDS` (`refresh=true`
+    lists the bucket again). The number of matching entries is returned in
+    the `X-Total-Count` header.
+    """
     service: SupabaseService = get_storage_service()
 
-    return service.get_files_from_bucket(bucket, path, search)
+    entries, total = service.list_folder_page(bucket, path, search, limit, offset, refresh)
+    response.headers["X-Total-Count"] = str(total)
+
+    return entries
 
 
 @router.get("/storage/download-file/{bucket}")
@@ -78,6 +98,64 @@ async def get_signed_url(
     return service.create_signed_url(bucket, path, expires_in)
 
 
+# Names may be missing in the extractions, PersistenceService skips those items
+class ExamTopicPayload(BaseModel):
+    name: str | None = None
+    subtopics: list[str | None] = []
+
+
+class JobRolePayload(BaseModel):
+    name: str | None = None
+    salary: float | None = None
+    openings: int | None = None
+    cr_openings: Any = None
+    has_cr_openings: bool | None = None
+
+
+class OfficePayload(BaseModel):
+    name: str | None = None
+
+
+class ExamPayload(BaseModel):
+    name: str | None = None
+    education_level: str | None = None
+    exam_topics: list[ExamTopicPayload] = []
+    job_roles: list[JobRolePayload] = []
+    offices: list[OfficePayload] = []
+
+
+class RecruitmentOfferPayload(BaseModel):
+    name: str
+    examining_board: str | None = None
+    year: str | None = None
+    scope: str | None = None
+    city: str | None = None
+    state: str | None = None
+    status: str = 'CONCLUDED'
+    tender_url: str | None = None
+    pdf_file_path: str | None = None
+    exams: list[ExamPayload] = []
+
+
+@router.post("/recruitment-offers")
+def persist_recruitment_offer(offer: RecruitmentOfferPayload):
+    """Writes a recruitment offer and its whole extracted tree with batched upserts.
+
+    The payload is the `/extractor/base-entities` output plus `tender_url` and
+    `pdf_file_path`, each exam carrying the `exam_topics` (with their
+    `subtopics`), `job_roles` and `offices` extracted for it. Sending the same
+    payload again updates the existing rows instead of duplicating them.
+    """
+    try:
+        result = PersistenceService(get_storage_service()).persist_recruitment_offer(offer.model_dump())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    results_cache.invalidate(("recruitment-offer-tree", result["recruitment_offer_id"]))
+
+    return result
+
+
 @router.get("/recruitment-offers/{offer_id}")
 async def get_recruitment_offer(offer_id: str):
     service: SupabaseService = get_storage_service()
@@ -85,6 +163,28 @@ async def get_recruitment_offer(offer_id: str):
     return service.get_recruitment_offer(offer_id)
 
 
+@router.get("/recruitment-offers/{offer_id}/tree")
+def get_recruitment_offer_tree(offer_id: str, request: Request, refresh: bool = False):
+    """Returns a recruitment offer with its exams and the job roles, offices,
+    topics and subtopics of each exam, read in a single query.
+
+    Responses are cached for `RESULTS_CACHE_TTL_SECONDS` (`refresh=true`
+    reads the database again) and carry an ETag: a request whose
+    `If-None-Match` matches it gets an empty 304 response.
+    """
+    offer, offer_etag = results_cache.get_or_set(
+        ("recruitment-offer-tree", offer_id),
+        lambda: get_storage_service().get_recruitment_offer_tree(offer_id),
+        refresh=refresh)
+
+    headers = {"ETag": offer_etag, "Cache-Control": "no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), offer_etag):
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(offer, headers=headers)
+
+
 @router.get("/exams")
 async def get_exams(offer_id: str = Query(...,
                                           description="The recruitment offer ID")):
@@ -125,3 +225,20 @@ async def get_job_roles(exam_id: str = Query(...,
     service: SupabaseService = get_storage_service()
 
     return service.get_job_roles(exam_id)
+
+
+@router.get("/entities/{table}/match")
+def match_entity(table: str,
+                 name: str = Query(..., description="The name to look up"),
+                 fuzzy: bool = Query(False, description="Fall back to the closest known name (ENTITY_FUZZY_CUTOFF)")):
+    """Looks a name up in a dictionary table (topics, offices, examining_boards).
+
+    Read-only: a fuzzy match is only a suggestion, offers are always linked by
+    exact (normalized) name.
+    """
+    if table not in DICTIONARY_TABLES:
+        raise HTTPException(status_code=404, detail=f"{table} is not a dictionary table")
+
+    dictionary = get_entity_dictionary(table, get_storage_service().client)
+
+    return {"name": name, "id": dictionary.resolve([name], fuzzy=fuzzy)[name]}
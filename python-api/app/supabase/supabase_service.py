@@ -1,6 +1,20 @@
+import httpx
+import bisect
+import tempfile
+
+from pathlib import Path
 from typing import List, Dict, Any
 from fastapi import UploadFile, HTTPException
-from ..dependencies import get_supabase_client
+from ..cache import TTLCache
+from ..dependencies import get_supabase_client, settings
+
+# Folder listings of the storage buckets, keyed by (bucket, folder)
+storage_listings = TTLCache("storage_listing", settings.STORAGE_LISTING_TTL_SECONDS)
+
+
+def invalidate_storage_listings(bucket: str = None):
+    """Drops the cached listings of `bucket` (of every bucket by default)."""
+    storage_listings.invalidate(prefix=(bucket,) if bucket else None)
 
 
 class SupabaseService:
@@ -12,6 +26,30 @@ class SupabaseService:
         res = self.client.storage.from_(bucket_name).download(file_path)
         return res
 
+    def download_file_to_temp(self, bucket_name: str, file_path: str) -> Path:
+        """Streams a file from Supabase Storage (S3) to a temporary file.
+
+        The file is never fully held in memory. The caller deletes the
+        returned file when done.
+        """
+        signed_url = self.create_signed_url(bucket_name, file_path, 300)
+        url = signed_url.get("signedUrl") or signed_url.get("signedURL")
+
+        temp_file = tempfile.NamedTemporaryFile(
+            suffix=Path(file_path).suffix, delete=False)
+
+        try:
+            with temp_file, httpx.stream("GET", url, timeout=60) as res:
+                res.raise_for_status()
+
+                for chunk in res.iter_bytes(chunk_size=1024 * 1024):
+                    temp_file.write(chunk)
+        except Exception:
+            Path(temp_file.name).unlink(missing_ok=True)
+            raise
+
+        return Path(temp_file.name)
+
     async def upload_file_to_s3(self, bucket: str, path: str, upload_file: UploadFile):
         content = await upload_file.read()
 
@@ -27,6 +65,8 @@ class SupabaseService:
 
         await upload_file.close()
 
+        invalidate_storage_listings(bucket)
+
         return res
 
     def list_buckets(self):
@@ -34,9 +74,84 @@ class SupabaseService:
         return res
 
     def get_files_from_bucket(self, bucket: str, path: str = None, search: str = None):
-        res = self.client.storage.from_(
-            bucket).list(path, {"search": search})
-        return res
+        return self.list_folder_page(bucket, path, search)[0]
+
+    def list_folder_page(self, bucket: str, path: str = None, search: str = None,
+                         limit: int = None, offset: int = 0, refresh: bool = False) -> tuple:
+        """Lists one folder level of a bucket, from its cached index.
+
+        The whole folder is listed once (every page) and kept sorted by name
+        for `STORAGE_LISTING_TTL_SECONDS`, or until a file is uploaded through
+        the API. `search` keeps the names starting with it (case insensitive,
+        like Storage) with a binary search on the index, and `limit` and
+        `offset` page through the result.
+
+        Returns:
+            tuple: The entries of the requested page and the number of matching entries.
+        """
+        index, _ = storage_listings.get_or_set(
+            (bucket, (path or "").strip("/")),
+            lambda: self._index_folder(bucket, path),
+            refresh=refresh)
+
+        start, end = 0, len(index["keys"])
+
+        if search:
+            search = search.casefold()
+            start = bisect.bisect_left(index["keys"], search)
+            end = bisect.bisect_left(index["keys"], search + "\U0010ffff", lo=start)
+
+        total = end - start
+        start += offset
+        end = end if limit is None else min(end, start + limit)
+
+        return index["entries"][start:end], total
+
+    def _index_folder(self, bucket: str, folder: str = None) -> dict:
+        entries = sorted(self.list_folder(bucket, folder), key=lambda entry: entry["name"].casefold())
+
+        return {"keys": [entry["name"].casefold() for entry in entries], "entries": entries}
+
+    def list_folder(self, bucket: str, folder: str = None, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """Lists every entry of one folder level of a bucket, page by page."""
+        entries = []
+        offset = 0
+
+        while True:
+            page = self.client.storage.from_(bucket).list(
+                (folder or "").strip("/"),
+                {"limit": page_size, "offset": offset, "sortBy": {"column": "name", "order": "asc"}})
+
+            entries += page
+
+            if len(page) < page_size:
+                return entries
+
+            offset += page_size
+
+    def list_files_recursive(self, bucket: str, prefix: str = '', page_size: int = 100) -> List[Dict[str, Any]]:
+        """Lists every file under a folder of a bucket, subfolders included.
+
+        Storage lists one folder level per call and at most `page_size`
+        entries, so the folders are walked page by page. Each returned entry
+        gets a `path` key with its full path in the bucket.
+        """
+        files = []
+        folders = [prefix.strip('/')]
+
+        while folders:
+            folder = folders.pop()
+
+            for entry in self.list_folder(bucket, folder, page_size):
+                path = f"{folder}/{entry['name']}" if folder else entry['name']
+
+                # Folders have no id
+                if entry.get('id') is None:
+                    folders.append(path)
+                else:
+                    files.append({**entry, 'path': path})
+
+        return files
 
     def create_signed_url(self, bucket: str, path: str, expires_in: int = 3600):
         """Creates a signed URL for a file in Supabase Storage."""
@@ -53,6 +168,48 @@ class SupabaseService:
             raise HTTPException(status_code=404, detail="Offer not found")
         return response.data
 
+    RECRUITMENT_OFFER_TREE = """
+        *,
+        examining_boards(*),
+        exams(
+            *,
+            job_roles(*),
+            exam_offices(offices(id, name, created_at)),
+            exam_topics(
+                topics(id, name, created_at),
+                exam_subtopics(topics(id, name, created_at))
+            )
+        )
+    """
+
+    def get_recruitment_offer_tree(self, offer_id: str):
+        """Returns a recruitment offer with its exams, and the job roles, offices,
+        topics and subtopics of each exam, in a single embedded select.
+
+        Each exam carries `job_roles`, `offices` and `topics`, each topic its
+        `subtopics`, shaped like the /job-roles, /offices, /topics and
+        /subtopics responses.
+        """
+        response = self.client.table("recruitment_offers") \
+            .select(self.RECRUITMENT_OFFER_TREE) \
+            .eq("id", offer_id) \
+            .execute()
+
+        if not response.data:
+            raise HTTPException(status_code=404, detail="Offer not found")
+
+        offer = response.data[0]
+
+        for exam in offer.get("exams") or []:
+            exam["offices"] = [item["offices"] for item in exam.pop("exam_offices", None) or []
+                               if item.get("offices")]
+            exam["topics"] = [
+                {**item["topics"], "subtopics": [subtopic["topics"] for subtopic in item.get("exam_subtopics") or []
+                                                 if subtopic.get("topics")]}
+                for item in exam.pop("exam_topics", None) or [] if item.get("topics")]
+
+        return offer
+
     def get_exams(self, recruitment_offer_id: str):
         response = self.client.table("exams").select(
             "*").eq("recruitment_offer_id", recruitment_offer_id).execute()
@@ -68,24 +225,14 @@ class SupabaseService:
         return [item['topics'] for item in response.data if item.get('topics')]
 
     def get_subtopics(self, exam_id: str, topic_id: str):
-        exam_topic = self.client.table("exam_topics") \
-            .select("id") \
-            .eq("exam_id", exam_id) \
-            .eq("topic_id", topic_id) \
-            .single() \
-            .execute()
-
-        exam_topic_id = exam_topic.data['id']
-
-        if not exam_topic_id:
-            return []
-
+        # Filters on the embedded exam_topics, a single round trip
         response = self.client.table("exam_subtopics") \
-            .select("*, topics!inner(*)") \
-            .eq("exam_topic_id", exam_topic_id) \
+            .select("topics!inner(*), exam_topics!inner(exam_id, topic_id)") \
+            .eq("exam_topics.exam_id", exam_id) \
+            .eq("exam_topics.topic_id", topic_id) \
             .execute()
 
-        return [{**item.pop("topics")} for item in response.data]
+        return [item["topics"] for item in response.data]
 
     def get_offices(self, exam_id: str):
         # Joining exam_offices with the offices table
@@ -0,0 +1,175 @@
+"""Conversion worker node.
+
+Claims `process_pdf_to_markdown_and_upload` jobs from the shared job queue and
+runs them with warm Docling converters. Start as many as the node has room
+for, on as many nodes as needed:
+
+    CONVERSION_QUEUE_URL=redis://broker:6379/0 python -m app.worker
+    python -m app.worker --queue-url sqlite:///queue/jobs.db --once
+    python -m app.worker --dead-letters
+    python -m app.worker --retry <job id>
+
+Each worker serves its Prometheus metrics on `--metrics-port`.
+"""
+import os
+import sys
+import json
+import signal
+import socket
+import logging
+import argparse
+import threading
+
+from app.dependencies import settings
+from app.job_queue import JobQueue, LeaseLostError, get_job_queue
+from app.document_processing.pipeline_profiles import PipelineProfile
+from app.document_processing.progress import ProgressReporter
+
+logging.basicConfig(
+    stream=sys.stdout,
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    datefmt='%d-%b-%y %H:%M:%S',
+    level=logging.INFO
+)
+
+
+class ConversionWorker:
+    """Runs conversion jobs from a JobQueue until it is asked to stop.
+
+    While a job runs, a background thread renews its lease every third of
+    `lease_seconds`; if the worker dies the lease expires and another node
+    picks the job up. SIGTERM/SIGINT let the current job finish before exiting.
+    """
+
+    def __init__(self, queue: JobQueue, worker_id: str = None, lease_seconds: float = None, poll_interval: float = None):
+        self.queue = queue
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+        self.lease_seconds = lease_seconds or settings.CONVERSION_LEASE_SECONDS
+        self.poll_interval = poll_interval or settings.CONVERSION_POLL_INTERVAL
+
+        self._stop = threading.Event()
+        self._service = None
+        self.logger = logging.getLogger(__name__)
+
+    def get_service(self):
+        if self._service is None:
+            from app.document_processing.document_processing_service import DocumentProcessingService
+
+            self._service = DocumentProcessingService()
+            self._service.warm_up([PipelineProfile(p.strip())
+                                   for p in settings.CONVERSION_WARM_PROFILES.split(',') if p.strip()])
+
+        return self._service
+
+    def stop(self, *_):
+        self.logger.info(f'Worker {self.worker_id} stopping after the current job')
+        self._stop.set()
+
+    def _keep_lease(self, job_id: str, done: threading.Event):
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds)
+            except LeaseLostError:
+                self.logger.error(f'Lost the lease of job {job_id}, its result will be discarded')
+                return
+            except Exception as e:
+                # A broker hiccup: keep trying until the lease really expires
+                self.logger.warning(f'Heartbeat of job {job_id} failed: {e}')
+
+    def process(self, job: dict):
+        job_id = job['id']
+        payload = dict(job['payload'])
+        payload['profile'] = PipelineProfile(payload.get('profile', PipelineProfile.AUTO))
+
+        self.logger.info(
+            f"Job {job_id} attempt {job['attempts']}/{job['max_attempts']}: {payload['file_path']}")
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._keep_lease, args=(job_id, done), daemon=True)
+        heartbeat.start()
+
+        try:
+            progress = ProgressReporter(lambda event: self.queue.add_progress(job_id, event))
+            result = self.get_service().process_pdf_to_markdown_and_upload(**payload, progress=progress)
+
+            # The service reports its own failures in the result
+            if result.get('status') == 'error':
+                raise RuntimeError(result.get('message'))
+        except Exception as e:
+            done.set()
+            heartbeat.join()
+
+            try:
+                status = self.queue.fail(job_id, self.worker_id, f'{type(e).__name__}: {e}')
+                self.logger.error(f'Job {job_id} failed ({status}): {e}')
+            except LeaseLostError:
+                self.logger.error(f'Job {job_id} failed after its lease was lost: {e}')
+
+            return
+
+        done.set()
+        heartbeat.join()
+
+        try:
+            self.queue.complete(job_id, self.worker_id, result)
+            self.logger.info(f'Job {job_id} done')
+        except LeaseLostError:
+            self.logger.error(f'Job {job_id} finished after its lease was lost, result discarded')
+
+    def run(self, once: bool = False):
+        """Processes jobs until stopped, or until the queue is empty with `once`."""
+        self.logger.info(f'Worker {self.worker_id} waiting for jobs')
+
+        while not self._stop.is_set():
+            job = self.queue.claim(self.worker_id, self.lease_seconds)
+
+            if job is None:
+                if once:
+                    break
+
+                self._stop.wait(self.poll_interval)
+                continue
+
+            self.process(job)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Conversion worker node')
+    parser.add_argument('--queue-url', default=settings.CONVERSION_QUEUE_URL or 'sqlite:///jobs.db')
+    parser.add_argument('--worker-id', default=None)
+    parser.add_argument('--once', action='store_true',
+                        help='Exit when the queue is empty')
+    parser.add_argument('--dead-letters', action='store_true',
+                        help='List the dead-lettered jobs and exit')
+    parser.add_argument('--retry', metavar='JOB_ID',
+                        help='Put a dead-lettered job back in the queue and exit')
+    parser.add_argument('--metrics-port', type=int, default=settings.WORKER_METRICS_PORT,
+                        help='Serve the Prometheus metrics of this worker on this port (0 disables it)')
+    args = parser.parse_args()
+
+    queue = get_job_queue(args.queue_url)
+
+    if args.dead_letters:
+        for job in queue.dead_letters():
+            print(json.dumps({k: job[k] for k in ('id', 'payload', 'attempts', 'error')}))
+        return
+
+    if args.retry:
+        requeued = queue.retry_dead_letter(args.retry)
+        print(f"{args.retry} {'requeued' if requeued else 'is not a dead-lettered job'}")
+        return
+
+    if args.metrics_port:
+        from prometheus_client import start_http_server
+
+        start_http_server(args.metrics_port)
+
+    worker = ConversionWorker(queue, args.worker_id)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+
+    worker.run(once=args.once)
+
+
+if __name__ == '__main__':
+    main()
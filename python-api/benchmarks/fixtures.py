@@ -0,0 +1,152 @@
+"""Deterministic synthetic inputs for the benchmarks: PDFs, images and markdown."""
+import io
+import zlib
+import random
+
+from PIL import Image, ImageEnhance
+
+WORDS = ('edital concurso publico cargo vaga salario inscricao prova objetiva discursiva '
+         'conhecimentos gerais especificos lingua portuguesa raciocinio logico legislacao '
+         'candidato banca examinadora etapa classificacao nomeacao posse remuneracao').split()
+
+
+def make_sentence(rng: random.Random, words: int = 14) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def make_image(seed: int, size: int = 256) -> Image.Image:
+    """A smooth random pattern: distinct seeds give distinct pHashes."""
+    rng = random.Random(seed)
+    base = Image.frombytes('RGB', (8, 8), rng.randbytes(8 * 8 * 3))
+
+    return base.resize((size, size), Image.Resampling.BICUBIC)
+
+
+def make_images(count: int, duplicate_ratio: float = 0.3, seed: int = 0) -> dict:
+    """PIL images keyed by file name; `duplicate_ratio` of them are near-copies
+    (brightness shifted) of earlier ones, like repeated logos and letterheads."""
+    rng = random.Random(seed)
+    images = {}
+
+    for index in range(count):
+        if images and rng.random() < duplicate_ratio:
+            original = images[rng.choice(list(images))]
+            image = ImageEnhance.Brightness(original).enhance(1.05)
+        else:
+            image = make_image(seed * 100_000 + index)
+
+        images[f'image_{index // 10 + 1:04d}_{index % 10:03d}.png'] = image
+
+    return images
+
+
+def make_markdown(placeholder: str, sections: int = 60, paragraphs: int = 6, images_per_section: int = 2, seed: int = 0) -> tuple:
+    """A Docling-like markdown export.
+
+    Returns:
+        tuple: (markdown, image_names), with one picture placeholder per image name.
+    """
+    rng = random.Random(seed)
+    lines = []
+    image_names = []
+
+    for section in range(sections):
+        level = '#' if section % 10 == 0 else '##'
+        lines.append(f'{level} {section + 1}. {make_sentence(rng, 4)[:-1].upper()}')
+        lines.append('')
+
+        for paragraph in range(paragraphs):
+            lines.append(' '.join(make_sentence(rng) for _ in range(4)))
+            lines.append('')
+
+            if paragraph < images_per_section:
+                image_names.append(f'image_{section + 1:04d}_{paragraph:03d}.png')
+                lines.append(placeholder)
+                lines.append('')
+
+        # Repeated headers (e.g. page headers) are skipped by get_markdown_headers
+        lines.append('## ANEXO')
+        lines.append('')
+
+    return '\n'.join(lines), image_names
+
+
+def make_header_filter(headers: list) -> list:
+    """Selects every other header, as the extractor workflows do."""
+    return [{'header': header, 'selected': index % 2 == 0} for index, header in enumerate(headers)]
+
+
+def _image_xobject(image: Image.Image) -> bytes:
+    data = zlib.compress(image.convert('RGB').tobytes())
+    header = (f'<< /Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} '
+              f'/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode /Length {len(data)} >>')
+
+    return header.encode() + b'\nstream\n' + data + b'\nendstream'
+
+
+def _stream(content: bytes) -> bytes:
+    return f'<< /Length {len(content)} >>'.encode() + b'\nstream\n' + content + b'\nendstream'
+
+
+def make_pdf(pages: int = 10, lines_per_page: int = 40, images_per_page: int = 1, seed: int = 0) -> bytes:
+    """A born-digital PDF with a text layer, a repeated logo on every page and
+    `images_per_page` unique pictures per page."""
+    rng = random.Random(seed)
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+    logo_id = add(_image_xobject(make_image(-1, 64)))
+    pages_id = add(b'')  # filled once the pages are known
+    page_ids = []
+
+    for page_no in range(pages):
+        image_ids = [add(_image_xobject(make_image(seed * 100_000 + page_no * 10 + i, 160)))
+                     for i in range(images_per_page)]
+
+        content = [b'q 48 0 0 48 500 770 cm /Logo Do Q',
+                   f'BT /F1 16 Tf 72 760 Td ({page_no + 1}. {make_sentence(rng, 4)[:-1].upper()}) Tj ET'.encode()]
+
+        y = 730
+        for _ in range(lines_per_page):
+            content.append(f'BT /F1 9 Tf 72 {y} Td ({make_sentence(rng, 12)}) Tj ET'.encode())
+            y -= 14
+
+            if y < 200:
+                break
+
+        for index in range(images_per_page):
+            content.append(f'q 120 0 0 120 {72 + index * 140} 60 cm /Im{index} Do Q'.encode())
+
+        content_id = add(_stream(b'\n'.join(content)))
+        xobjects = ' '.join([f'/Logo {logo_id} 0 R'] + [f'/Im{i} {image_id} 0 R' for i, image_id in enumerate(image_ids)])
+
+        page_ids.append(add(
+            f'<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 595 842] /Contents {content_id} 0 R '
+            f'/Resources << /Font << /F1 {font_id} 0 R >> /XObject << {xobjects} >> >> >>'.encode()))
+
+    kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids)
+    objects[pages_id - 1] = f'<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>'.encode()
+    catalog_id = add(f'<< /Type /Catalog /Pages {pages_id} 0 R >>'.encode())
+
+    pdf = io.BytesIO()
+    pdf.write(b'%PDF-1.7\n')
+    offsets = []
+
+    for number, body in enumerate(objects, start=1):
+        offsets.append(pdf.tell())
+        pdf.write(f'{number} 0 obj\n'.encode() + body + b'\nendobj\n')
+
+    xref_offset = pdf.tell()
+    pdf.write(f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode())
+
+    for offset in offsets:
+        pdf.write(f'{offset:010d} 00000 n \n'.encode())
+
+    pdf.write(f'trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\n'
+              f'startxref\n{xref_offset}\n%%EOF\n'.encode())
+
+    return pdf.getvalue()
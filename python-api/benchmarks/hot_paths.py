@@ -0,0 +1,306 @@
+"""Offline benchmarks of the document processing hot paths.
+
+Runs the pipeline steps against deterministic synthetic inputs (see
+`fixtures.py`), or against your own files, with Supabase and the LLM
+providers replaced by in-memory stubs, so no network or credential is needed:
+
+- parse_pdf_to_markdown: the Docling conversion of a PDF (the Docling models
+  must already be in the local cache)
+- get_repeated_images: the pHash deduplication of the page pictures
+- handle_image_references: the markdown placeholder rewrite
+- get_markdown_headers: the header index of a converted markdown
+- slice_content_by_headers: the header filter of the extractor workflows
+
+Each benchmark reports its throughput, its latency percentiles and its peak
+memory (the RSS growth sampled by MemoryMonitor and the peak traced by
+tracemalloc during one extra run).
+
+Usage (from the python-api folder):
+
+    python benchmarks/hot_paths.py                          # every benchmark
+    python benchmarks/hot_paths.py --only get_repeated_images --iterations 50
+    python benchmarks/hot_paths.py --pdf edital.pdf --markdown edital.md
+    python benchmarks/hot_paths.py --save                   # write hot_paths_baseline.json
+    python benchmarks/hot_paths.py --compare                # compare with the saved baseline
+
+With --compare, exits with status 1 when a benchmark's p50 latency is more
+than --tolerance (default 20%) slower than the baseline. Only compare runs of
+the same machine, inputs and options.
+"""
+import io
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+from pathlib import Path
+from unittest import mock
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+API_DIR = BENCHMARKS_DIR.parent
+BASELINE_PATH = BENCHMARKS_DIR / 'hot_paths_baseline.json'
+
+sys.path[:0] = [str(API_DIR), str(BENCHMARKS_DIR)]
+
+import fixtures  # noqa: E402
+
+from app.memory_monitor import MemoryMonitor  # noqa: E402
+
+BENCHMARKS = ('parse_pdf_to_markdown', 'get_repeated_images', 'handle_image_references',
+              'get_markdown_headers', 'slice_content_by_headers')
+
+
+class StubStorage:
+    """In-memory stand-in for SupabaseService: serves the benchmark inputs."""
+
+    def __init__(self):
+        self.files = {}
+
+    def add_file(self, bucket: str, path: str, content: bytes):
+        self.files[(bucket, path)] = content
+
+    def download_file_from_s3(self, bucket_name: str, file_path: str) -> bytes:
+        return self.files[(bucket_name, file_path)]
+
+    def download_file_to_temp(self, bucket_name: str, file_path: str) -> Path:
+        # The caller deletes the file, as with the real download
+        temp_file = tempfile.NamedTemporaryFile(suffix=Path(file_path).suffix, delete=False)
+
+        with temp_file:
+            shutil.copyfileobj(io.BytesIO(self.files[(bucket_name, file_path)]), temp_file)
+
+        return Path(temp_file.name)
+
+
+class StubCaptioner:
+    """Stand-in for QwenApiService: a fixed caption per image, no request."""
+
+    def get_image_captions(self, images: dict, on_progress=None) -> dict:
+        if on_progress:
+            on_progress(len(images), len(images))
+
+        return {image_name: f'Synthetic caption of {image_name}' for image_name in images}
+
+
+class StubChat:
+    """Stand-in for DeepSeekApiService; the benchmarks make no LLM request."""
+
+
+def create_services(storage: StubStorage) -> tuple:
+    """Builds the services with the stubs instead of their clients."""
+    from app.document_processing import document_processing_service
+    from app.extractor import extractor_service
+
+    with mock.patch.object(document_processing_service, 'SupabaseService', return_value=storage), \
+            mock.patch.object(document_processing_service, 'QwenApiService', return_value=StubCaptioner()), \
+            mock.patch.object(extractor_service, 'SupabaseService', return_value=storage), \
+            mock.patch.object(extractor_service, 'DeepSeekApiService', return_value=StubChat()):
+        return (document_processing_service.DocumentProcessingService(),
+                extractor_service.ExtractorService())
+
+
+def percentile(sorted_values: list, percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values) + 0.5) - 1))
+
+    return sorted_values[index]
+
+
+def measure(run, iterations: int, warmup: int, unit: str) -> dict:
+    """Times `run`, which returns the number of `unit`s it processed."""
+    for _ in range(warmup):
+        run()
+
+    latencies = []
+    units = 0
+
+    with MemoryMonitor(interval=0.01) as monitor:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            units += run()
+            latencies.append(time.perf_counter() - start)
+
+    # A separate run: tracemalloc slows the measured ones down
+    tracemalloc.start()
+    run()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+
+    return {
+        'iterations': iterations,
+        'ops_per_second': round(iterations / total, 3),
+        'unit': unit,
+        'units_per_second': round(units / total, 3),
+        'mean_ms': round(total / iterations * 1000, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'peak_rss_growth_mb': round(monitor.peak_rss_mb - monitor.start_rss_mb, 1),
+        'peak_traced_mb': round(traced_peak / (1024 * 1024), 1),
+    }
+
+
+def build_benchmarks(args, storage: StubStorage, document_service, extractor_service) -> dict:
+    """Prepares the inputs and returns {name: (run, unit, iterations)}."""
+    from app.document_processing.document_processing_service import IMAGE_PLACEHOLDER
+    from app.document_processing.pipeline_profiles import PipelineProfile
+
+    import pypdfium2
+
+    benchmarks = {}
+
+    if args.pdf:
+        pdf = Path(args.pdf).read_bytes()
+    else:
+        pdf = fixtures.make_pdf(pages=args.pages, images_per_page=2, seed=args.seed)
+
+    storage.add_file('pdf-files', 'benchmarks/document.pdf', pdf)
+    page_count = len(pypdfium2.PdfDocument(pdf))
+
+    def parse_pdf():
+        document_service.parse_pdf_to_markdown(
+            'benchmarks/document.pdf', profile=PipelineProfile(args.profile))
+        return page_count
+
+    benchmarks['parse_pdf_to_markdown'] = (parse_pdf, 'pages', max(1, args.iterations // 10))
+
+    images = fixtures.make_images(args.images, seed=args.seed)
+
+    def find_repeated_images():
+        document_service.get_repeated_images(images)
+        return len(images)
+
+    benchmarks['get_repeated_images'] = (find_repeated_images, 'images', args.iterations)
+
+    if args.markdown:
+        markdown = Path(args.markdown).read_text(encoding='utf-8')
+        image_names = [f'image_{index:04d}.png' for index in range(markdown.count(IMAGE_PLACEHOLDER))]
+    else:
+        markdown, image_names = fixtures.make_markdown(IMAGE_PLACEHOLDER, sections=args.sections, seed=args.seed)
+
+    lines = markdown.splitlines(keepends=True)
+    repeated_filenames = image_names[::5]
+    decorative_images = {image_name: 'small' for image_name in image_names[1::7]}
+    image_descriptions = StubCaptioner().get_image_captions(dict.fromkeys(image_names))
+
+    def rewrite_references():
+        rewritten = document_service.handle_image_references(
+            lines, image_names, 'document_artifacts', repeated_filenames=repeated_filenames,
+            decorative_images=decorative_images, image_descriptions=image_descriptions)
+        return sum(1 for _ in rewritten)
+
+    benchmarks['handle_image_references'] = (rewrite_references, 'lines', args.iterations)
+
+    storage.add_file('processed-files', 'benchmarks/document.md', markdown.encode('utf-8'))
+    headers = document_service.get_markdown_headers('processed-files', 'benchmarks/document.md')
+
+    def index_headers():
+        return len(document_service.get_markdown_headers('processed-files', 'benchmarks/document.md'))
+
+    benchmarks['get_markdown_headers'] = (index_headers, 'headers', args.iterations)
+
+    header_filter = fixtures.make_header_filter([item['header'] for item in headers])
+
+    def slice_content():
+        extractor_service.slice_content_by_headers(markdown, header_filter)
+        return len(header_filter)
+
+    benchmarks['slice_content_by_headers'] = (slice_content, 'headers', args.iterations)
+
+    return {name: benchmark for name, benchmark in benchmarks.items() if name in args.only}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Prints the change against the baseline and returns the regressions."""
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            print(f'{name:<26} not in the baseline')
+            continue
+
+        change = result['p50_ms'] / baseline[name]['p50_ms'] - 1 if baseline[name]['p50_ms'] else 0
+        throughput_change = result['units_per_second'] / baseline[name]['units_per_second'] - 1 \
+            if baseline[name]['units_per_second'] else 0
+
+        print(f"{name:<26} p50 {baseline[name]['p50_ms']:>10.3f} -> {result['p50_ms']:>10.3f} ms ({change:+.1%}), "
+              f"throughput {throughput_change:+.1%}")
+
+        if change > tolerance:
+            regressions.append(f'{name} p50 is {change:.1%} slower than the baseline')
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('--iterations', type=int, default=30,
+                        help='Runs per benchmark (a tenth of it for parse_pdf_to_markdown)')
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pages', type=int, default=10, help='Pages of the synthetic PDF')
+    parser.add_argument('--images', type=int, default=200, help='Images to deduplicate')
+    parser.add_argument('--sections', type=int, default=200, help='Sections of the synthetic markdown')
+    parser.add_argument('--profile', default='digital', help='Pipeline profile of the PDF conversion')
+    parser.add_argument('--pdf', help='Benchmark this PDF instead of the synthetic one')
+    parser.add_argument('--markdown', help='Benchmark this markdown instead of the synthetic one')
+    parser.add_argument('--save', action='store_true', help=f'Write the results to {BASELINE_PATH.name}')
+    parser.add_argument('--compare', action='store_true', help=f'Compare with {BASELINE_PATH.name}')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    # The pipeline logs every step; only the report is wanted here
+    logging.disable(logging.INFO)
+
+    storage = StubStorage()
+    document_service, extractor_service = create_services(storage)
+    benchmarks = build_benchmarks(args, storage, document_service, extractor_service)
+
+    results = {}
+
+    for name, (run, unit, iterations) in benchmarks.items():
+        results[name] = measure(run, iterations, args.warmup, unit)
+        result = results[name]
+
+        print(f"{name:<26} {result['units_per_second']:>12.1f} {unit}/s  "
+              f"p50 {result['p50_ms']:>9.3f} ms  p95 {result['p95_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms  "
+              f"rss +{result['peak_rss_growth_mb']:.1f} MB  traced {result['peak_traced_mb']:.1f} MB")
+
+    if args.save:
+        report = {
+            'environment': {'python': platform.python_version(), 'machine': platform.machine()},
+            'options': {key: value for key, value in vars(args).items()
+                        if key not in ('save', 'compare', 'baseline', 'tolerance', 'only')},
+            'results': results,
+        }
+
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        print(f'Baseline written to {args.baseline}')
+
+    if args.compare:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline['results'], args.tolerance)
+
+        for regression in regressions:
+            print(f'FAIL: {regression}')
+
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
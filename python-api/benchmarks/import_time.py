@@ -0,0 +1,134 @@
+"""Import-time profile of the API entry point.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and
+checks it against `import_time_budget.json`:
+
+- the total import time of `app.main` must stay under `max_total_ms`;
+- none of the `lazy_modules` (Docling, imagehash, PIL, OpenAI, ...) may be
+  imported at startup, they belong to the first request or the warm-up task.
+
+Usage (from the python-api folder):
+
+    python benchmarks/import_time.py            # check against the budget
+    python benchmarks/import_time.py --top 30   # also print the slowest imports
+    python benchmarks/import_time.py --save     # write the measured profile to import_time_profile.json
+
+Exits with status 1 when the budget is exceeded.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+API_DIR = BENCHMARKS_DIR.parent
+BUDGET_PATH = BENCHMARKS_DIR / 'import_time_budget.json'
+PROFILE_PATH = BENCHMARKS_DIR / 'import_time_profile.json'
+
+# import time: self [us] | cumulative | imported package
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def profile_imports(module: str = 'app.main', runs: int = 3) -> dict:
+    """Imports `module` in fresh interpreters and returns the fastest run.
+
+    Returns:
+        dict: {'total_ms': float, 'modules': {name: {'self_ms', 'cumulative_ms'}}}
+    """
+    best = None
+
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=API_DIR, capture_output=True, text=True,
+            env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+        )
+
+        if completed.returncode != 0:
+            raise RuntimeError(f'Could not import {module}:\n{completed.stderr[-2000:]}')
+
+        modules = {}
+
+        for line in completed.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+
+            if match is None:
+                continue
+
+            self_us, cumulative_us, _, name = match.groups()
+            modules[name] = {
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+            }
+
+        # The interpreter start-up imports (site, encodings...) are left out
+        run = {'total_ms': modules[module]['cumulative_ms'], 'modules': modules}
+
+        if best is None or run['total_ms'] < best['total_ms']:
+            best = run
+
+    return best
+
+
+def check_budget(profile: dict, budget: dict) -> list:
+    """Returns the budget violations of a profile (empty when it passes)."""
+    violations = []
+
+    if profile['total_ms'] > budget['max_total_ms']:
+        violations.append(
+            f"total import time {profile['total_ms']:.0f} ms exceeds the budget of {budget['max_total_ms']} ms")
+
+    for lazy_module in budget['lazy_modules']:
+        loaded = [name for name in profile['modules']
+                  if name == lazy_module or name.startswith(f'{lazy_module}.')]
+
+        if loaded:
+            violations.append(f'{lazy_module} is imported at startup')
+
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app.main')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=0,
+                        help='Print the N imports with the highest cumulative time')
+    parser.add_argument('--save', action='store_true',
+                        help=f'Write the profile to {PROFILE_PATH.name}')
+    args = parser.parse_args()
+
+    with open(BUDGET_PATH, 'r') as f:
+        budget = json.load(f)
+
+    profile = profile_imports(args.module, args.runs)
+
+    print(f"{args.module}: {profile['total_ms']:.0f} ms, {len(profile['modules'])} modules")
+
+    if args.top:
+        slowest = sorted(profile['modules'].items(),
+                         key=lambda item: item[1]['cumulative_ms'], reverse=True)
+
+        for name, times in slowest[:args.top]:
+            print(f"{times['cumulative_ms']:>10.1f} ms  {name}")
+
+    if args.save:
+        with open(PROFILE_PATH, 'w') as f:
+            json.dump(profile, f, indent=2, sort_keys=True)
+
+        print(f'Profile written to {PROFILE_PATH}')
+
+    violations = check_budget(profile, budget)
+
+    for violation in violations:
+        print(f'FAIL: {violation}')
+
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+#!/bin/sh
+set -e
+
+# Metric files of a previous run would be aggregated with the new ones. They
+# are removed before the process starts: prometheus_client creates the files of
+# some metrics (e.g. the livesum gauges) as soon as app.metrics is imported.
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+    rm -f "$PROMETHEUS_MULTIPROC_DIR"/*.db
+fi
+
+exec "$@"
@@ -0,0 +1,121 @@
+import time
+import random
+import asyncio
+
+from collections import Counter
+from dataclasses import dataclass, asdict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class FaultSettings:
+    """Degradations applied to every request of a mock server.
+
+    - latency_ms / jitter_ms: added delay, uniformly drawn in latency ± jitter
+    - error_rate: share of requests answered with `error_status`
+    - rate_limit: requests per second accepted (0 disables it), with bursts
+      up to `burst` requests; the others get a 429 with a Retry-After header
+    """
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    error_rate: float = 0
+    error_status: int = 503
+    rate_limit: float = 0
+    burst: int = 10
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """Takes a token; returns 0 when granted, else the seconds until the next one."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+
+        return (1 - self.tokens) / self.rate
+
+
+def add_fault_injection(app: FastAPI, faults: FaultSettings):
+    """Applies `faults` to every request of `app` and adds the control endpoints:
+
+    - GET /_mock/faults, PUT /_mock/faults: read or change the faults at runtime
+    - GET /_mock/stats: the requests received, by route and response status
+    """
+    state = {'faults': faults, 'bucket': TokenBucket(faults.rate_limit, faults.burst) if faults.rate_limit else None}
+    stats = Counter()
+
+    @app.middleware('http')
+    async def inject_faults(request: Request, call_next):
+        if request.url.path.startswith('/_mock/'):
+            return await call_next(request)
+
+        faults = state['faults']
+        # e.g. 'POST /storage/v1/object/list', 'GET /rest/v1/exams'
+        route = f"{request.method} {'/'.join(request.url.path.split('/')[:5])}"
+
+        if state['bucket'] is not None:
+            retry_after = state['bucket'].take()
+
+            if retry_after:
+                stats[(route, 429)] += 1
+                return JSONResponse({'error': 'rate_limited', 'message': 'Too many requests'}, status_code=429,
+                                    headers={'Retry-After': f'{max(1, round(retry_after))}'})
+
+        delay = faults.latency_ms + random.uniform(-faults.jitter_ms, faults.jitter_ms)
+
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        if faults.error_rate and random.random() < faults.error_rate:
+            stats[(route, faults.error_status)] += 1
+            return JSONResponse({'error': 'injected', 'message': 'Injected failure'}, status_code=faults.error_status)
+
+        response = await call_next(request)
+        stats[(route, response.status_code)] += 1
+
+        return response
+
+    @app.get('/_mock/faults')
+    def get_faults():
+        return asdict(state['faults'])
+
+    @app.put('/_mock/faults')
+    def set_faults(changes: dict):
+        state['faults'] = FaultSettings(**{**asdict(state['faults']), **changes})
+        state['bucket'] = TokenBucket(state['faults'].rate_limit, state['faults'].burst) \
+            if state['faults'].rate_limit else None
+
+        return asdict(state['faults'])
+
+    @app.get('/_mock/stats')
+    def get_stats():
+        return [{'route': route, 'status': status, 'requests': count}
+                for (route, status), count in sorted(stats.items())]
+
+
+def add_fault_arguments(parser):
+    defaults = FaultSettings()
+
+    parser.add_argument('--latency-ms', type=float, default=defaults.latency_ms)
+    parser.add_argument('--jitter-ms', type=float, default=defaults.jitter_ms)
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate)
+    parser.add_argument('--error-status', type=int, default=defaults.error_status)
+    parser.add_argument('--rate-limit', type=float, default=defaults.rate_limit,
+                        help='Requests per second accepted (0 disables the limit)')
+    parser.add_argument('--burst', type=int, default=defaults.burst)
+
+
+def faults_from_arguments(args) -> FaultSettings:
+    return FaultSettings(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                         error_status=args.error_status, rate_limit=args.rate_limit, burst=args.burst)
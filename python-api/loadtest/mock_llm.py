@@ -0,0 +1,131 @@
+"""OpenAI-compatible chat completions stand-in for DeepSeek and OpenRouter.
+
+Answers `POST /v1/chat/completions` (and `/chat/completions`) without any
+model: batched caption requests ("Image id: ..." parts with a JSON response
+format) get a JSON object with a caption per image id, single image requests a
+caption, other JSON requests the `--json-response` file (an empty object by
+default) and plain requests a fixed sentence. Token usage is estimated at four
+characters per token. Point the API at it with:
+
+    DEEPSEEK_BASE_URL=http://localhost:8100/v1 OPEN_ROUTER_BASE_URL=http://localhost:8100/v1
+
+Usage (from the python-api folder):
+
+    python -m loadtest.mock_llm --port 8100 --latency-ms 800 --jitter-ms 400 --rate-limit 5
+    python -m loadtest.mock_llm --tokens-per-second 60 --json-response base_entities.json
+
+`--tokens-per-second` adds the generation time of the completion to the
+latency. See faults.py for the fault options and the /_mock control endpoints.
+"""
+import re
+import json
+import time
+import uuid
+import asyncio
+import argparse
+
+from pathlib import Path
+
+import uvicorn
+
+from fastapi import FastAPI
+
+from loadtest.faults import FaultSettings, add_fault_arguments, add_fault_injection, faults_from_arguments
+
+IMAGE_ID = re.compile(r'^Image id: (.+)$')
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def build_answer(messages: list, json_mode: bool, json_response: str) -> tuple:
+    """Returns the completion text and the prompt characters of a request."""
+    texts = []
+    image_ids = []
+    images = 0
+
+    for message in messages:
+        content = message.get('content')
+        parts = content if isinstance(content, list) else [{'type': 'text', 'text': content or ''}]
+
+        for part in parts:
+            if part.get('type') == 'image_url':
+                images += 1
+            elif part.get('type') == 'text':
+                texts.append(part['text'])
+                match = IMAGE_ID.match(part['text'])
+
+                if match:
+                    image_ids.append(match.group(1))
+
+    # Images are billed as a fixed amount of tokens
+    prompt_chars = sum(len(text) for text in texts) + images * 1000
+
+    if image_ids and json_mode:
+        return json.dumps({image_id: f'Mock description of {image_id}' for image_id in image_ids}), prompt_chars
+
+    if images:
+        return 'Mock description of the image.', prompt_chars
+
+    if json_mode:
+        return json_response, prompt_chars
+
+    return 'Mock completion.', prompt_chars
+
+
+def create_app(faults: FaultSettings = None, tokens_per_second: float = 0, json_response: str = '{}') -> FastAPI:
+    app = FastAPI(title='Mock LLM')
+
+    add_fault_injection(app, faults or FaultSettings())
+
+    @app.post('/v1/chat/completions')
+    @app.post('/chat/completions')
+    async def chat_completions(body: dict):
+        json_mode = (body.get('response_format') or {}).get('type') == 'json_object'
+        answer, prompt_chars = build_answer(body.get('messages', []), json_mode, json_response)
+        completion_tokens = estimate_tokens(answer)
+        prompt_tokens = max(1, prompt_chars // 4)
+
+        if tokens_per_second:
+            await asyncio.sleep(completion_tokens / tokens_per_second)
+
+        return {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': answer},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--tokens-per-second', type=float, default=0,
+                        help='Generation speed added to the latency (0 disables it)')
+    parser.add_argument('--json-response', type=Path,
+                        help='File answered to the JSON requests that are not caption batches')
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    json_response = args.json_response.read_text() if args.json_response else '{}'
+
+    uvicorn.run(create_app(faults_from_arguments(args), args.tokens_per_second, json_response),
+                host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
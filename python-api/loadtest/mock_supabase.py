@@ -0,0 +1,339 @@
+"""In-memory stand-in for the Supabase Storage and PostgREST APIs.
+
+Implements the endpoints the supabase-py client calls from SupabaseService:
+bucket and object listing, upload, download, signed URLs, and table
+select/insert/upsert with `eq`, `in`, `gte` and `is` filters, `order`, `range()`,
+`single()` and embedded resources (e.g. `select=topic_id,topics(id,name)`
+joins `topics` on `topic_id`, `select=*,exams(*)` the `exams` rows on
+`recruitment_offer_id`). Point the API at it with:
+
+    SUPABASE_URL=http://localhost:54321 SUPABASE_KEY=<any JWT-shaped string>
+
+Usage (from the python-api folder):
+
+    python -m loadtest.mock_supabase --port 54321 --latency-ms 40 --jitter-ms 20 --error-rate 0.01
+    python -m loadtest.mock_supabase --seed-dir ./seed --tables tables.json
+
+`--seed-dir` loads every file of `<seed-dir>/<bucket>/...`; `--tables` loads a
+JSON object of rows keyed by table name. See faults.py for the fault options
+and the /_mock control endpoints.
+"""
+import csv
+import json
+import time
+import uuid
+import hashlib
+import argparse
+
+from pathlib import Path
+from urllib.parse import quote
+from datetime import datetime, timezone
+
+import uvicorn
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from loadtest.faults import FaultSettings, add_fault_arguments, add_fault_injection, faults_from_arguments
+
+DEFAULT_BUCKETS = ('pdf-files', 'processed-files')
+SINGLE_OBJECT = 'application/vnd.pgrst.object+json'
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class MockStorage:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = {bucket: {} for bucket in buckets}
+        self.tokens = {}
+
+    def put(self, bucket: str, path: str, content: bytes, content_type: str = 'application/octet-stream'):
+        self.buckets.setdefault(bucket, {})[path] = {
+            'id': str(uuid.uuid4()),
+            'content': content,
+            'metadata': {
+                'eTag': f'"{hashlib.md5(content).hexdigest()}"',
+                'size': len(content),
+                'mimetype': content_type,
+                'cacheControl': 'max-age=3600',
+                'lastModified': now_iso(),
+            },
+            'created_at': now_iso(),
+        }
+
+    def list(self, bucket: str, prefix: str, limit: int, offset: int, search: str) -> list:
+        """One folder level, like Storage: sub-folders come back without an id."""
+        prefix = prefix.strip('/')
+        entries = {}
+
+        for path, stored in self.buckets.get(bucket, {}).items():
+            if prefix and not path.startswith(f'{prefix}/'):
+                continue
+
+            name, _, rest = path[len(prefix) + 1 if prefix else 0:].partition('/')
+
+            if search and search not in name:
+                continue
+
+            if rest:
+                entries.setdefault(name, {'name': name, 'id': None, 'metadata': None,
+                                          'created_at': None, 'updated_at': None})
+            else:
+                entries[name] = {'name': name, 'id': stored['id'], 'metadata': stored['metadata'],
+                                 'created_at': stored['created_at'], 'updated_at': stored['metadata']['lastModified']}
+
+        return [entries[name] for name in sorted(entries)][offset:offset + limit]
+
+
+class MockDatabase:
+    def __init__(self, tables: dict = None):
+        self.tables = {name: list(rows) for name, rows in (tables or {}).items()}
+
+    def select(self, table: str, columns: str, filters: dict, order: str = None,
+               offset: int = 0, limit: int = None) -> list:
+        """`filters` maps each column to a predicate of its value (see parse_filter),
+        `embedded.column` filters apply to the embedded resources."""
+        embedded_filters = {column: accepts for column, accepts in filters.items() if '.' in column}
+        rows = [row for row in self.tables.get(table, [])
+                if all(accepts(row.get(column)) for column, accepts in filters.items() if '.' not in column)]
+
+        for key in reversed((order or '').split(',')):
+            if key:
+                column, _, direction = key.partition('.')
+                rows.sort(key=lambda row: str(row.get(column) or ''), reverse=direction.startswith('desc'))
+
+        projected = [self._project(table, row, columns) for row in rows]
+
+        for column, accepts in embedded_filters.items():
+            resource, _, embedded_column = column.partition('.')
+
+            for row in projected:
+                if isinstance(row.get(resource), list):
+                    row[resource] = [item for item in row[resource] if accepts(item.get(embedded_column))]
+                elif row.get(resource) is not None and not accepts(row[resource].get(embedded_column)):
+                    row[resource] = None
+
+        # `resource!inner(...)` drops the rows without a matching resource
+        inner = [column.split('!')[0].split(':')[-1] for column in split_columns(columns or '*')
+                 if '!inner(' in column]
+        projected = [row for row in projected if all(row.get(resource) for resource in inner)]
+
+        return projected[offset:None if limit is None else offset + limit]
+
+    def _project(self, table: str, row: dict, columns: str) -> dict:
+        projected = {}
+
+        for column in split_columns(columns or '*'):
+            if '(' in column:
+                # Embedded resource: `topics(id,name)`, `topics!inner(*)` or `exams(*,job_roles(*))`
+                name, _, inner = column.partition('(')
+                related_table = name.split('!')[0].split(':')[-1]
+                projected[related_table] = self._embed(table, row, related_table, inner[:-1])
+            elif column == '*':
+                projected.update(row)
+            else:
+                projected[column] = row.get(column)
+
+        return projected
+
+    def _embed(self, table: str, row: dict, related_table: str, columns: str):
+        """Many-to-one when `row` has a foreign key to `related_table` (`topic_id`,
+        or `exam_subtopic_id` for topics), one-to-many otherwise."""
+        singular = related_table.removesuffix('s')
+        other_tables = set(self.tables) - {table}
+        foreign_key = next((column for column in row if column.endswith(f'{singular}_id')
+                            and (column == f'{singular}_id' or f'{column[:-3]}s' not in other_tables)), None)
+
+        if foreign_key is not None:
+            related = next((r for r in self.tables.get(related_table, []) if r.get('id') == row[foreign_key]), None)
+            return self._project(related_table, related, columns) if related else None
+
+        back_key = f'{table.removesuffix("s")}_id'
+
+        return [self._project(related_table, r, columns) for r in self.tables.get(related_table, [])
+                if r.get(back_key) == row.get('id')]
+
+    def insert(self, table: str, rows: list, on_conflict: str = None) -> list:
+        stored = self.tables.setdefault(table, [])
+        keys = [key for key in (on_conflict or '').split(',') if key]
+        inserted = []
+
+        for row in rows:
+            row = {'id': str(uuid.uuid4()), 'created_at': now_iso(), **row}
+            existing = next((r for r in stored if keys and all(r.get(k) == row.get(k) for k in keys)), None)
+
+            if existing is not None:
+                existing.update({k: v for k, v in row.items() if k not in ('id', 'created_at')})
+                inserted.append(existing)
+            else:
+                stored.append(row)
+                inserted.append(row)
+
+        return inserted
+
+
+def split_columns(columns: str) -> list:
+    """Splits a PostgREST select on the commas outside parentheses."""
+    parts, depth, current = [], 0, ''
+
+    for char in columns.replace(' ', ''):
+        if char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+            continue
+
+        depth += (char == '(') - (char == ')')
+        current += char
+
+    return parts + [current] if current else parts
+
+
+FILTERS = ('eq.', 'in.(', 'gte.', 'is.')
+
+
+def parse_filter(value: str):
+    """Returns the predicate of an `eq`, `in`, `gte` or `is` filter."""
+    if value.startswith('is.'):
+        return lambda column: column is {'null': None, 'true': True, 'false': False}[value[len('is.'):]]
+
+    if value.startswith('eq.'):
+        return lambda column: str(column) == value[len('eq.'):]
+
+    if value.startswith('gte.'):
+        return lambda column: column is not None and str(column) >= value[len('gte.'):]
+
+    # in.(a,"b, with comma")
+    values = set(next(csv.reader([value[len('in.('):-1]], escapechar='\\')))
+    return lambda column: str(column) in values
+
+
+def create_app(faults: FaultSettings = None, storage: MockStorage = None, database: MockDatabase = None) -> FastAPI:
+    app = FastAPI(title='Mock Supabase')
+    storage = storage or MockStorage()
+    database = database or MockDatabase()
+
+    add_fault_injection(app, faults or FaultSettings())
+
+    @app.get('/storage/v1/bucket')
+    def list_buckets():
+        return [{'id': bucket, 'name': bucket, 'owner': '', 'public': False, 'created_at': now_iso(),
+                 'updated_at': now_iso(), 'file_size_limit': None, 'allowed_mime_types': None}
+                for bucket in storage.buckets]
+
+    @app.post('/storage/v1/object/list/{bucket}')
+    def list_objects(bucket: str, body: dict):
+        return storage.list(bucket, body.get('prefix', ''), int(body.get('limit', 100)),
+                            int(body.get('offset', 0)), body.get('search') or '')
+
+    @app.post('/storage/v1/object/sign/{bucket}/{path:path}')
+    def sign_object(bucket: str, path: str, body: dict):
+        if path not in storage.buckets.get(bucket, {}):
+            return JSONResponse({'statusCode': '404', 'error': 'not_found', 'message': 'Object not found'}, status_code=400)
+
+        token = uuid.uuid4().hex
+        storage.tokens[token] = (bucket, path, time.time() + int(body.get('expiresIn', 60)))
+
+        return {'signedURL': f'/object/sign/{bucket}/{quote(path)}?token={token}'}
+
+    @app.get('/storage/v1/object/sign/{bucket}/{path:path}')
+    def download_signed(bucket: str, path: str, token: str):
+        signed = storage.tokens.get(token)
+
+        if signed is None or signed[:2] != (bucket, path) or signed[2] < time.time():
+            return JSONResponse({'statusCode': '400', 'error': 'InvalidSignature', 'message': 'Invalid signature'}, status_code=400)
+
+        stored = storage.buckets[bucket][path]
+
+        return Response(stored['content'], media_type=stored['metadata']['mimetype'])
+
+    @app.get('/storage/v1/object/{bucket}/{path:path}')
+    def download_object(bucket: str, path: str):
+        stored = storage.buckets.get(bucket, {}).get(path)
+
+        if stored is None:
+            return JSONResponse({'statusCode': '404', 'error': 'not_found', 'message': 'Object not found'}, status_code=400)
+
+        return Response(stored['content'], media_type=stored['metadata']['mimetype'])
+
+    @app.api_route('/storage/v1/object/{bucket}/{path:path}', methods=['POST', 'PUT'])
+    async def upload_object(bucket: str, path: str, request: Request):
+        upsert = request.method == 'PUT' or request.headers.get('x-upsert') == 'true'
+
+        if not upsert and path in storage.buckets.get(bucket, {}):
+            return JSONResponse({'statusCode': '409', 'error': 'Duplicate', 'message': 'The resource already exists'}, status_code=400)
+
+        if request.headers.get('content-type', '').startswith('multipart/form-data'):
+            form = await request.form()
+            upload = form['file']
+            storage.put(bucket, path, await upload.read(), upload.content_type or 'application/octet-stream')
+        else:
+            storage.put(bucket, path, await request.body(), request.headers.get('content-type', 'application/octet-stream'))
+
+        return {'Key': f'{bucket}/{path}', 'Id': storage.buckets[bucket][path]['id']}
+
+    @app.delete('/storage/v1/object/{bucket}')
+    def remove_objects(bucket: str, body: dict):
+        removed = [storage.buckets.get(bucket, {}).pop(path, None) for path in body.get('prefixes', [])]
+
+        return [{'name': path} for path, stored in zip(body.get('prefixes', []), removed) if stored]
+
+    @app.get('/rest/v1/{table}')
+    def select_rows(table: str, request: Request):
+        params = dict(request.query_params)
+        columns = params.pop('select', '*')
+        filters = {column: parse_filter(value) for column, value in params.items()
+                   if value.startswith(FILTERS)}
+        rows = database.select(table, columns, filters, params.get('order'), int(params.get('offset', 0)),
+                               int(params['limit']) if 'limit' in params else None)
+
+        if SINGLE_OBJECT in request.headers.get('accept', ''):
+            if len(rows) != 1:
+                return JSONResponse({'code': 'PGRST116', 'message': 'JSON object requested, multiple (or no) rows returned',
+                                     'details': f'The result contains {len(rows)} rows', 'hint': None}, status_code=406)
+            return rows[0]
+
+        return rows
+
+    @app.post('/rest/v1/{table}')
+    async def insert_rows(table: str, request: Request, on_conflict: str = None):
+        body = await request.json()
+        rows = body if isinstance(body, list) else [body]
+        upsert = 'merge-duplicates' in request.headers.get('prefer', '')
+
+        return JSONResponse(database.insert(table, rows, (on_conflict or 'id') if upsert else None), status_code=201)
+
+    return app
+
+
+def load_seed(storage: MockStorage, seed_dir: Path):
+    for file in sorted(seed_dir.rglob('*')):
+        if file.is_file():
+            bucket, *path = file.relative_to(seed_dir).parts
+            content_type = 'application/pdf' if file.suffix == '.pdf' else 'text/markdown' \
+                if file.suffix == '.md' else 'application/octet-stream'
+            storage.put(bucket, '/'.join(path), file.read_bytes(), content_type)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--seed-dir', type=Path, help='Folder of <bucket>/<path> files to serve')
+    parser.add_argument('--tables', type=Path, help='JSON object of rows keyed by table name')
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    storage = MockStorage()
+
+    if args.seed_dir:
+        load_seed(storage, args.seed_dir)
+
+    database = MockDatabase(json.loads(args.tables.read_text()) if args.tables else None)
+
+    uvicorn.run(create_app(faults_from_arguments(args), storage, database), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
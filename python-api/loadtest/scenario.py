@@ -0,0 +1,265 @@
+"""Load generator driving the API end to end, against the mock upstreams.
+
+Start the mocks and an API pointed at them, then run the scenario:
+
+    python -m loadtest.mock_supabase --port 54321 --latency-ms 40 --jitter-ms 20 &
+    python -m loadtest.mock_llm --port 8100 --latency-ms 800 --jitter-ms 400 --rate-limit 5 &
+    SUPABASE_URL=http://localhost:54321 SUPABASE_KEY=<any JWT-shaped string> \\
+        DEEPSEEK_BASE_URL=http://localhost:8100/v1 OPEN_ROUTER_BASE_URL=http://localhost:8100/v1 \\
+        uvicorn app.main:app --port 8000 &
+    python -m loadtest.scenario --concurrency 1 4 16 64 --duration 30
+
+The setup uploads `--documents` synthetic PDFs through the API and converts
+the first one, then each step runs `--duration` seconds of closed-loop
+virtual users (each sends its next request when the previous one returns)
+picking requests from the weighted mix:
+
+- list_files, signed_url, download: the storage routes
+- file_headers: /document-processing/file-headers on the converted markdown
+- extract: /extractor/base-entities (one LLM request per call)
+- convert: /process-pdf with force=true (a full conversion)
+- convert_cached: /process-pdf answered by the conversion cache
+- metrics: /metrics
+
+Change the mix with e.g. `--mix convert=0 extract=20`. Every step reports
+its throughput, error count and latency percentiles per request kind; the
+requests received by the mocks are printed at the end. `--output` writes the
+whole report as JSON.
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from pathlib import Path
+from collections import defaultdict
+
+import httpx
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent.parent / 'benchmarks'
+
+DEFAULT_MIX = {
+    'list_files': 20,
+    'signed_url': 20,
+    'download': 10,
+    'file_headers': 20,
+    'extract': 10,
+    'convert': 2,
+    'convert_cached': 10,
+    'metrics': 5,
+}
+
+
+def percentile(sorted_values: list, percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values) + 0.5) - 1))
+
+    return sorted_values[index]
+
+
+class Scenario:
+    def __init__(self, client: httpx.AsyncClient, documents: list, markdown_path: str = None, profile: str = 'digital'):
+        self.client = client
+        self.documents = documents
+        self.markdown_path = markdown_path
+        self.profile = profile
+
+    def request(self, kind: str):
+        """Returns the coroutine sending one request of `kind`."""
+        document = random.choice(self.documents)
+
+        if kind == 'list_files':
+            return self.client.get('/supabase/storage/pdf-files', params={'path': 'loadtest'})
+        if kind == 'signed_url':
+            return self.client.get('/supabase/storage/signed-url/pdf-files', params={'path': document})
+        if kind == 'download':
+            return self.client.get('/supabase/storage/download-file/pdf-files', params={'path': document})
+        if kind == 'file_headers':
+            return self.client.get('/document-processing/file-headers',
+                                   params={'bucket': 'processed-files', 'file_path': self.markdown_path})
+        if kind == 'extract':
+            return self.client.get('/extractor/base-entities',
+                                   params={'file_bucket': 'processed-files', 'file_path': self.markdown_path})
+        if kind == 'convert':
+            return self.client.post('/document-processing/process-pdf',
+                                    params={'file_path': document, 'force': True, 'profile': self.profile})
+        if kind == 'convert_cached':
+            return self.client.post('/document-processing/process-pdf',
+                                    params={'file_path': self.documents[0], 'profile': self.profile})
+        if kind == 'metrics':
+            return self.client.get('/metrics')
+
+        raise ValueError(f'Unknown request kind: {kind}')
+
+
+async def setup(client: httpx.AsyncClient, documents: int, pages: int, profile: str) -> tuple:
+    """Uploads the synthetic PDFs through the API and converts the first one.
+
+    Returns:
+        tuple: (document paths, markdown path of the first one or None)
+    """
+    sys.path.insert(0, str(BENCHMARKS_DIR))
+    import fixtures
+
+    paths = []
+
+    for index in range(documents):
+        path = f'loadtest/document_{index:03d}.pdf'
+        pdf = fixtures.make_pdf(pages=pages, images_per_page=1, seed=index)
+
+        response = await client.post('/supabase/storage/upload-file/pdf-files', params={'path': path},
+                                     files={'file': (path.split('/')[-1], pdf, 'application/pdf')})
+
+        # A second run finds the files already uploaded
+        if response.status_code != 200:
+            print(f'Upload of {path} returned {response.status_code}, assuming it already exists')
+
+        paths.append(path)
+
+    response = await client.post('/document-processing/process-pdf', params={'file_path': paths[0], 'profile': profile})
+    result = response.json() if response.status_code == 200 else {}
+
+    if result.get('status') != 'success':
+        print(f'The conversion of {paths[0]} failed ({response.status_code}): file_headers and extract are skipped')
+        return paths, None
+
+    return paths, result['markdown_path']
+
+
+async def virtual_user(scenario: Scenario, kinds: list, weights: list, deadline: float, samples: dict):
+    while time.monotonic() < deadline:
+        kind = random.choices(kinds, weights)[0]
+        start = time.perf_counter()
+
+        try:
+            response = await scenario.request(kind)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+
+        samples[kind].append((time.perf_counter() - start, status))
+
+
+async def run_step(scenario: Scenario, mix: dict, concurrency: int, duration: float) -> dict:
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    samples = defaultdict(list)
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+
+    await asyncio.gather(*(virtual_user(scenario, kinds, weights, deadline, samples) for _ in range(concurrency)))
+
+    elapsed = time.perf_counter() - start
+    report = {}
+
+    for kind, kind_samples in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in kind_samples)
+        statuses = defaultdict(int)
+
+        for _, status in kind_samples:
+            statuses[str(status)] += 1
+
+        report[kind] = {
+            'requests': len(kind_samples),
+            'requests_per_second': round(len(kind_samples) / elapsed, 2),
+            'errors': sum(count for status, count in statuses.items() if not status.startswith('2')),
+            'statuses': dict(statuses),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1),
+        }
+
+    return report
+
+
+def print_step(concurrency: int, report: dict):
+    total = sum(kind['requests_per_second'] for kind in report.values())
+    errors = sum(kind['errors'] for kind in report.values())
+
+    print(f'\n== {concurrency} virtual users: {total:.1f} requests/s, {errors} errors')
+    print(f"{'request':<16}{'req/s':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+
+    for kind, stats in report.items():
+        print(f"{kind:<16}{stats['requests_per_second']:>9.2f}{stats['errors']:>8}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+
+
+async def get_mock_stats(url: str) -> list:
+    async with httpx.AsyncClient(base_url=url, timeout=10) as client:
+        response = await client.get('/_mock/stats')
+        response.raise_for_status()
+
+        return response.json()
+
+
+def parse_mix(values: list) -> dict:
+    mix = dict(DEFAULT_MIX)
+
+    for value in values or []:
+        kind, _, weight = value.partition('=')
+
+        if kind not in DEFAULT_MIX:
+            raise SystemExit(f'Unknown request kind {kind!r}, expected one of {", ".join(DEFAULT_MIX)}')
+
+        mix[kind] = float(weight)
+
+    return {kind: weight for kind, weight in mix.items() if weight > 0}
+
+
+async def main_async(args):
+    mix = parse_mix(args.mix)
+    report = {'mix': mix, 'steps': {}}
+
+    async with httpx.AsyncClient(base_url=args.api_url, timeout=args.timeout) as client:
+        documents, markdown_path = await setup(client, args.documents, args.pages, args.profile)
+
+        if markdown_path is None:
+            mix = {kind: weight for kind, weight in mix.items() if kind not in ('file_headers', 'extract')}
+
+        scenario = Scenario(client, documents, markdown_path, args.profile)
+
+        for concurrency in args.concurrency:
+            step = await run_step(scenario, mix, concurrency, args.duration)
+            report['steps'][concurrency] = step
+            print_step(concurrency, step)
+
+    for name, url in (('supabase', args.supabase_url), ('llm', args.llm_url)):
+        if not url:
+            continue
+
+        report[f'{name}_requests'] = await get_mock_stats(url)
+        print(f'\n== Requests received by the {name} mock')
+
+        for row in report[f'{name}_requests']:
+            print(f"{row['requests']:>8}  {row['status']}  {row['route']}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f'\nReport written to {args.output}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--api-url', default='http://localhost:8000')
+    parser.add_argument('--supabase-url', default='http://localhost:54321',
+                        help='Mock Supabase, for its request counts (empty to skip)')
+    parser.add_argument('--llm-url', default='http://localhost:8100',
+                        help='Mock LLM, for its request counts (empty to skip)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per concurrency step')
+    parser.add_argument('--documents', type=int, default=5)
+    parser.add_argument('--pages', type=int, default=5, help='Pages of each synthetic PDF')
+    parser.add_argument('--profile', default='digital')
+    parser.add_argument('--mix', nargs='*', metavar='KIND=WEIGHT')
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--output', type=Path)
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
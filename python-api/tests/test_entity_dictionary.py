@@ -0,0 +1,39 @@
+from app.dependencies import get_supabase_client
+from app.supabase.entity_dictionary import EntityDictionary
+
+
+def test_refresh_indexes_every_page(database):
+    rows = EntityDictionary.PAGE_SIZE * 2 + 500
+    database.tables['topics'] = [
+        {'id': f'id-{i}', 'name': f'Topic {i}', 'created_at': f'2026-01-01T00:00:{i // 100:02d}.{i:06d}+00:00'}
+        for i in range(rows)]
+
+    dictionary = EntityDictionary('topics', get_supabase_client(), refresh_seconds=0)
+
+    assert dictionary.refresh(force=True) == 3
+    assert len(dictionary.ids) == rows
+    assert dictionary.match('topic 2499') == 'id-2499'
+
+
+def test_incremental_refresh_reads_only_new_rows(database):
+    database.tables['topics'] = [{'id': '1', 'name': 'Direito Administrativo I', 'created_at': '2026-01-01'}]
+    dictionary = EntityDictionary('topics', get_supabase_client(), refresh_seconds=0, fuzzy_cutoff=0.9)
+    dictionary.refresh()
+
+    database.tables['topics'].append({'id': '2', 'name': 'Língua Portuguesa', 'created_at': '2026-01-02'})
+
+    assert dictionary.refresh() == 1
+    assert dictionary.match('LINGUA portuguesa:') == '2'
+    assert dictionary.match('Direito Administrativo II') is None
+    assert dictionary.match('Direito Administrativo II', fuzzy=True) == '1'
+
+
+def test_full_reload_drops_deleted_rows(database):
+    database.tables['topics'] = [{'id': '1', 'name': 'Old', 'created_at': '2026-01-01'}]
+    dictionary = EntityDictionary('topics', get_supabase_client(), refresh_seconds=0, full_reload_seconds=0)
+    dictionary.refresh()
+
+    database.tables['topics'].clear()
+    dictionary.refresh()
+
+    assert dictionary.match('Old') is None
@@ -0,0 +1,41 @@
+from app.supabase.supabase_service import SupabaseService
+from app.supabase.persistence_service import PersistenceService
+from app.supabase.entity_dictionary import get_entity_dictionary
+
+OFFER = {
+    'name': 'Concurso Prefeitura',
+    'examining_board': 'Banca X',
+    'exams': [{
+        'name': 'Analista',
+        'exam_topics': [{'name': 'Direito Administrativo', 'subtopics': ['Atos administrativos']}],
+        'job_roles': [{'name': 'Analista', 'salary': 5000}],
+        'offices': [{'name': 'Secretaria'}],
+    }],
+}
+
+
+def test_persisting_twice_creates_no_duplicates(database):
+    service = PersistenceService(SupabaseService())
+
+    first = service.persist_recruitment_offer(OFFER)
+    second = service.persist_recruitment_offer(OFFER)
+
+    assert second['recruitment_offer_id'] == first['recruitment_offer_id']
+    assert second['exam_ids'] == first['exam_ids']
+
+    for table in ('recruitment_offers', 'exams', 'examining_boards', 'topics', 'exam_topics',
+                  'exam_subtopics', 'job_roles', 'offices', 'exam_offices'):
+        assert len(database.tables[table]) == 1 + (table == 'topics'), table
+
+
+def test_names_created_by_another_worker_are_reused(database):
+    service = PersistenceService(SupabaseService())
+    get_entity_dictionary('offices', service.supabase_service.client).refresh(force=True)
+
+    # Created after the dictionary was loaded, within its refresh window
+    database.tables.setdefault('offices', []).append({'id': 'office-1', 'name': 'Secretaria', 'created_at': '2026-01-01'})
+
+    service.persist_recruitment_offer(OFFER)
+
+    assert [row['id'] for row in database.tables['offices']] == ['office-1']
+    assert database.tables['exam_offices'][0]['office_id'] == 'office-1'
@@ -0,0 +1,16 @@
+from openai.types.chat import ChatCompletion
+
+from app.qwen_api.qwen_api_service import QwenApiService
+
+
+def completion(content) -> ChatCompletion:
+    return ChatCompletion(id='1', created=0, model='qwen', object='chat.completion', choices=[{
+        'index': 0, 'finish_reason': 'content_filter', 'message': {'role': 'assistant', 'content': content}}])
+
+
+def test_empty_completion_is_a_failed_batch(monkeypatch):
+    monkeypatch.setenv('OPEN_ROUTER_API_KEY', 'key')
+    service = QwenApiService()
+    service.cassette.call = lambda request, send, response_type: completion(None)
+
+    assert service._caption_batch({'image_000001.png': 'data:image/png;base64,AA=='}) == {}
@@ -0,0 +1,22 @@
+-- The missing topics, offices and examining boards are created with an upsert
+-- on `name` (BulkWriter.resolve_names in python-api), which needs a unique
+-- constraint on the column. Duplicated names must be merged before applying it.
+DO $$
+DECLARE
+    dictionary_table text;
+BEGIN
+    FOREACH dictionary_table IN ARRAY ARRAY['topics', 'offices', 'examining_boards'] LOOP
+        IF NOT EXISTS (
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE i.indrelid = format('public.%I', dictionary_table)::regclass
+              AND i.indisunique
+              AND i.indnatts = 1
+              AND a.attname = 'name'
+        ) THEN
+            EXECUTE format('ALTER TABLE public.%I ADD CONSTRAINT %I UNIQUE (name)',
+                           dictionary_table, dictionary_table || '_name_key');
+        END IF;
+    END LOOP;
+END $$;